@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк швидкості та точності UniversalAddressComparator на розмічених парах
+
+Розмічені пари будуються з дампу migrations/DATA-TrinitY-3.txt:
+  - street: назви вулиць ek_addr ("Моніторна") та bld_local ("ШЕВЧЕНКА") у тому
+    вигляді, в якому їх валідують мігратори, проти довідника rtg_addr;
+    збіг - та сама назва з точністю до регістру, латинських двійників літер
+    та пробілів; незбіги - найближчі за триграмами інші вулиці довідника
+    (складні негативи);
+  - street_rename: нова та стара назва вулиці з bld_local (adres_n_uk / adres_o_uk);
+  - district: райони ek_addr та bld_local проти районів міста rtg_addr
+    (розмітка - DISTRICT_LABELS);
+  - building: номер з adres_n_uk проти номера з adres_o_uk того самого рядка
+    (збіг) та сусідніх будинків тієї ж вулиці (незбіг).
+
+Для кожного типу звітуються:
+  - pairs: пар/с для calculate_comprehensive_similarity, precision/recall
+    при порозі --threshold;
+  - lookups: затримка validate_object_universally (p50/p90/p99, мс) проти знімка
+    довідника та precision/recall рекомендацій use_existing/review;
+  - parallel (з --workers N): назв/с для validate_many в одному процесі та
+    через ParallelComparator з N воркерами, прискорення між ними.
+Кеші мемоізації компаратора вимкнені - вимірюється вартість обчислення, а не словника.
+
+Результат зберігається в JSON (migrations/reports/) для порівняння між запусками:
+    python benchmark_comparator.py
+    python benchmark_comparator.py --compare migrations/reports/benchmark_20261019_120000.json
+    python benchmark_comparator.py --workers 4
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from src.processors.source_adapters import BldLocalAdapter, clean_value
+from src.utils.building_numbers import LATIN_TO_CYRILLIC
+from src.utils.candidate_snapshot import CandidateSnapshot
+from src.utils.lru_cache import LRUCache
+from src.utils.parallel_comparator import ParallelComparator
+from src.utils.trigram_index import TrigramIndex
+from src.utils.validators import UniversalAddressComparator
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_PATH = os.path.join(BASE_DIR, 'migrations', 'DATA-TrinitY-3.txt')
+DEFAULT_REPORT_DIR = os.path.join(BASE_DIR, 'migrations', 'reports')
+
+# Заголовок секції дампу: "-----------   таблиця =   addr.rtg_addr;"
+SECTION_PATTERN = re.compile(r'^-+\s*таблиця\s*=?\s*([\w.]+)\s*;', re.IGNORECASE)
+
+# Райони міста в ek_addr / bld_local -> район міста в rtg_addr (None - відповідника немає)
+DISTRICT_LABELS = {
+    'Індустріальна': 'Індустріальний',
+    'Амур-Нижньодніпровська': 'Амур-Нижньодніпровський',
+    'Соборна': 'Соборний',
+    'Центральний': 'Центральний',
+    'Чечелівська': 'Чечелівський',
+    'Шевченківська': 'Шевченківський',
+    'Дніпровська': None,
+    'НОВОКОДА': 'Новокодацький',
+}
+
+# Рекомендації validate_object_universally, що означають "це існуючий об'єкт"
+MATCH_RECOMMENDATIONS = ('use_existing', 'review')
+
+
+class LabelledPair(NamedTuple):
+    """Пара назв з відомою відповіддю: той самий об'єкт чи ні"""
+    object_type: str
+    first: str
+    second: str
+    label: bool
+    origin: str
+
+
+class LookupCase(NamedTuple):
+    """Пошуковий запит до довідника з очікуваною назвою (None - об'єкта в довіднику немає)"""
+    object_type: str
+    query: str
+    expected: Optional[str]
+    origin: str
+
+
+def name_key(name: str) -> str:
+    """Ключ розмітки: верхній регістр, кирилиця замість латинських двійників, одинарні пробіли"""
+    text = str(name).upper().translate(LATIN_TO_CYRILLIC).replace("'", '’')
+    return ' '.join(text.split())
+
+
+def read_dump_sections(path: str) -> Dict[str, List[dict]]:
+    """Розбір дампу: таблиця -> рядки (словники колонка -> очищене значення)"""
+    sections = {}
+    table, headers = None, None
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.rstrip('\n')
+            match = SECTION_PATTERN.match(line)
+            if match:
+                table, headers = match.group(1), None
+                sections[table] = []
+                continue
+            if table is None or not line.strip():
+                continue
+            values = line.split('|')
+            if headers is None:
+                headers = [value.strip() for value in values]
+                continue
+            if len(values) == len(headers):
+                sections[table].append({header: clean_value(value) for header, value in zip(headers, values)})
+    return sections
+
+
+def _hard_negatives(index: TrigramIndex, query: str, count: int) -> List[str]:
+    """Найближчі за триграмами назви довідника з іншим ключем"""
+    key = name_key(query)
+    return [name for name, _ in index.search(query, limit=count + 5) if name_key(name) != key][:count]
+
+
+def build_dataset(sections: Dict[str, List[dict]], negatives_per_query: int = 3, seed: int = 42) -> dict:
+    """Розмічені пари, пошукові запити та довідники з секцій дампу"""
+    rng = random.Random(seed)
+    bld_adapter = BldLocalAdapter()
+    rtg_rows = sections.get('addr.rtg_addr', [])
+    bld_rows = sections.get('bld_local', [])
+    ek_rows = sections.get('ek_addr', [])
+
+    references = {
+        'street': sorted({row['street'] for row in rtg_rows if row.get('street')}),
+        'district': sorted({row['city_district'] for row in rtg_rows if row.get('city_district')}),
+    }
+    street_by_key = {name_key(name): name for name in references['street']}
+    street_index = TrigramIndex(references['street'])
+    pairs, lookups = [], []
+
+    # Вулиці: назви ek_addr та bld_local (як їх валідують мігратори) проти довідника rtg_addr
+    street_queries = {}
+    for row in ek_rows:
+        if row.get('street'):
+            street_queries.setdefault(row['street'], 'ek_addr')
+    for row in bld_rows:
+        for address, origin in (('adres_n_uk', 'bld_local'), ('adres_o_uk', 'bld_local_old')):
+            name = bld_adapter.extract_street_from_address(row.get(address))
+            if name and not name.isdigit():
+                street_queries.setdefault(name, origin)
+
+    for query, origin in street_queries.items():
+        expected = street_by_key.get(name_key(query))
+        lookups.append(LookupCase('street', query, expected, origin))
+        if expected:
+            pairs.append(LabelledPair('street', query, expected, True, origin))
+        for negative in _hard_negatives(street_index, query, negatives_per_query):
+            pairs.append(LabelledPair('street', query, negative, False, origin))
+
+    # Перейменування: нова та стара назва вулиці одного будинку bld_local
+    renames = {}
+    for row in bld_rows:
+        new_name = bld_adapter.extract_street_from_address(row.get('adres_n_uk'))
+        old_name = bld_adapter.extract_street_from_address(row.get('adres_o_uk'))
+        if new_name and old_name:
+            renames.setdefault(new_name, set()).add(old_name)
+    all_old = sorted({old for olds in renames.values() for old in olds})
+    for new_name, olds in sorted(renames.items()):
+        for old_name in sorted(olds):
+            pairs.append(LabelledPair('street_rename', new_name, old_name, True, 'bld_local'))
+        others = [old for old in all_old if old not in olds]
+        for old_name in rng.sample(others, min(len(others), negatives_per_query)):
+            pairs.append(LabelledPair('street_rename', new_name, old_name, False, 'bld_local'))
+
+    # Райони міста: розмітка DISTRICT_LABELS
+    district_queries = {}
+    for row in ek_rows:
+        # У дампі ek_addr назва району стоїть у колонці rada
+        district = row.get('district') or row.get('rada')
+        if district:
+            district_queries.setdefault(district, 'ek_addr')
+    for row in bld_rows:
+        if row.get('raion'):
+            district_queries.setdefault(row['raion'], 'bld_local')
+    for query, origin in district_queries.items():
+        if query not in DISTRICT_LABELS:
+            continue
+        expected = DISTRICT_LABELS[query]
+        lookups.append(LookupCase('district', query, expected, origin))
+        for reference in references['district']:
+            pairs.append(LabelledPair('district', query, reference, reference == expected, origin))
+
+    # Будівлі: номер у новій та старій адресі того самого рядка; незбіг - інші номери тієї ж вулиці
+    numbers_by_street = defaultdict(list)
+    for row in bld_rows:
+        new_address, old_address = row.get('adres_n_uk'), row.get('adres_o_uk')
+        if not new_address or not old_address or not row.get('l'):
+            continue
+        new_number, old_number = new_address.split()[0], old_address.split()[0]
+        pairs.append(LabelledPair('building', new_number, old_number, True, 'bld_local'))
+        numbers_by_street[row.get('street_ukr')].append((row['l'], new_number, old_number))
+    for rows in numbers_by_street.values():
+        for position, (number, new_number, _) in enumerate(rows):
+            others = [old for other, _, old in rows[position + 1:] if other != number]
+            for old_number in others[:negatives_per_query]:
+                pairs.append(LabelledPair('building', new_number, old_number, False, 'bld_local'))
+
+    return {'pairs': pairs, 'lookups': lookups, 'references': references}
+
+
+def create_comparator() -> UniversalAddressComparator:
+    """Компаратор без БД, з власним знімком та вимкненими кешами мемоізації"""
+    comparator = UniversalAddressComparator(connect=False)
+    comparator.snapshot = CandidateSnapshot(ttl=float('inf'), preparer=comparator.prepare_candidate)
+    comparator.validation_cache = LRUCache(0)
+    comparator.pair_cache = LRUCache(0)
+    return comparator
+
+
+def classification(tp: int, fp: int, fn: int) -> dict:
+    """Precision, recall та F1 (None, якщо знаменник нульовий)"""
+    precision = tp / (tp + fp) if tp + fp else None
+    recall = tp / (tp + fn) if tp + fn else None
+    f1 = (2 * precision * recall / (precision + recall)
+          if precision is not None and recall is not None and precision + recall else None)
+    return {'tp': tp, 'fp': fp, 'fn': fn,
+            'precision': round(precision, 4) if precision is not None else None,
+            'recall': round(recall, 4) if recall is not None else None,
+            'f1': round(f1, 4) if f1 is not None else None}
+
+
+def percentiles(latencies: List[float]) -> dict:
+    """Перцентилі затримки в мілісекундах"""
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1000, 3)
+
+    return {'p50_ms': at(0.5), 'p90_ms': at(0.9), 'p99_ms': at(0.99), 'max_ms': round(ordered[-1] * 1000, 3),
+            'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3)}
+
+
+def measure_pairs(comparator: UniversalAddressComparator, pairs: List[LabelledPair],
+                  threshold: float, repeat: int = 1) -> Dict[str, dict]:
+    """Пар/с та якість рішення "оцінка >= threshold" для кожного типу"""
+    by_type = defaultdict(list)
+    for pair in pairs:
+        by_type[pair.object_type].append(pair)
+
+    results = {}
+    for object_type, type_pairs in sorted(by_type.items()):
+        scoring_type = 'street' if object_type == 'street_rename' else object_type
+        started = time.perf_counter()
+        for _ in range(repeat):
+            scores = [comparator.calculate_comprehensive_similarity(pair.first, pair.second, scoring_type)
+                      for pair in type_pairs]
+        elapsed = time.perf_counter() - started
+
+        tp = sum(1 for pair, score in zip(type_pairs, scores) if pair.label and score >= threshold)
+        fp = sum(1 for pair, score in zip(type_pairs, scores) if not pair.label and score >= threshold)
+        fn = sum(1 for pair, score in zip(type_pairs, scores) if pair.label and score < threshold)
+        results[object_type] = {
+            'pairs': len(type_pairs),
+            'positives': sum(1 for pair in type_pairs if pair.label),
+            'pairs_per_sec': round(len(type_pairs) * repeat / elapsed, 1) if elapsed else None,
+            'threshold': threshold,
+            **classification(tp, fp, fn),
+        }
+    return results
+
+
+def measure_lookups(comparator: UniversalAddressComparator, lookups: List[LookupCase],
+                    references: Dict[str, List[str]]) -> Dict[str, dict]:
+    """Затримка validate_object_universally та якість рекомендацій для кожного типу"""
+    by_type = defaultdict(list)
+    for case in lookups:
+        by_type[case.object_type].append(case)
+
+    results = {}
+    for object_type, cases in sorted(by_type.items()):
+        comparator.snapshot.install(object_type, references.get(object_type, []))
+        latencies, tp, fp, fn = [], 0, 0, 0
+        for case in cases:
+            started = time.perf_counter()
+            result = comparator.validate_object_universally(case.query, object_type)
+            latencies.append(time.perf_counter() - started)
+
+            matched = result['recommendation'] in MATCH_RECOMMENDATIONS
+            found = result['similar_objects'][0][0] if result['similar_objects'] else None
+            correct = matched and case.expected is not None and name_key(found) == name_key(case.expected)
+            if correct:
+                tp += 1
+            elif matched:
+                fp += 1
+            if case.expected is not None and not correct:
+                fn += 1
+
+        results[object_type] = {
+            'lookups': len(cases),
+            'expected_matches': sum(1 for case in cases if case.expected is not None),
+            'candidates': len(references.get(object_type, [])),
+            **percentiles(latencies),
+            **classification(tp, fp, fn),
+        }
+    return results
+
+
+def measure_parallel(comparator: UniversalAddressComparator, lookups: List[LookupCase],
+                     references: Dict[str, List[str]], workers: int, repeat: int = 1) -> Dict[str, dict]:
+    """Назв/с для validate_many в одному процесі та через ParallelComparator з workers воркерами"""
+    by_type = defaultdict(list)
+    for case in lookups:
+        by_type[case.object_type].append(case.query)
+
+    results = {}
+    with ParallelComparator(comparator, workers=workers) as parallel:
+        for object_type, queries in sorted(by_type.items()):
+            comparator.snapshot.install(object_type, references.get(object_type, []))
+            names = list(dict.fromkeys(query for query in queries if query))
+            # Назви з номером повтору - унікальні, тож кожна оцінюється заново
+            batch = [f"{name} {round_}" if round_ else name for round_ in range(repeat) for name in names]
+
+            started = time.perf_counter()
+            serial = comparator.validate_many(batch, object_type)
+            serial_elapsed = time.perf_counter() - started
+
+            # Час пулу включає його старт - так само, як у мігратора
+            parallel.chunk_size = max(1, len(batch) // (workers * 4))
+            started = time.perf_counter()
+            pooled = parallel.validate_many(batch, object_type)
+            parallel_elapsed = time.perf_counter() - started
+
+            results[object_type] = {
+                'names': len(batch),
+                'workers': parallel.workers,
+                'serial_per_sec': round(len(serial) / serial_elapsed, 1) if serial_elapsed else None,
+                'parallel_per_sec': round(len(pooled) / parallel_elapsed, 1) if parallel_elapsed else None,
+                'speedup': round(serial_elapsed / parallel_elapsed, 2) if parallel_elapsed else None,
+                'same_results': serial == pooled,
+            }
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(data_path: str = DEFAULT_DATA_PATH, threshold: float = 0.8, repeat: int = 1,
+                  negatives_per_query: int = 3, seed: int = 42, workers: int = 0) -> dict:
+    """Повний прогін: побудова розмітки, вимірювання пар, пошукових запитів і (workers > 0) пулу воркерів"""
+    dataset = build_dataset(read_dump_sections(data_path), negatives_per_query, seed)
+    comparator = create_comparator()
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'data_path': os.path.relpath(data_path, BASE_DIR),
+            'threshold': threshold,
+            'repeat': repeat,
+            'negatives_per_query': negatives_per_query,
+            'seed': seed,
+            'workers': workers,
+            'cpu_count': os.cpu_count(),
+        },
+        'pairs': measure_pairs(comparator, dataset['pairs'], threshold, repeat),
+        'lookups': measure_lookups(comparator, dataset['lookups'], dataset['references']),
+        'pruning_rate': round(comparator.pruning_rate(), 4),
+    }
+    if workers:
+        report['parallel'] = measure_parallel(comparator, dataset['lookups'], dataset['references'],
+                                              workers, repeat)
+    return report
+
+
+def save_report(report: dict, report_dir: str = DEFAULT_REPORT_DIR) -> str:
+    """Збереження звіту в JSON; повертає шлях до файлу"""
+    os.makedirs(report_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(report_dir, f"benchmark_{stamp}.json")
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    return path
+
+
+# Метрики, які порівнюються між запусками
+COMPARED_METRICS = {
+    'pairs': ('pairs_per_sec', 'precision', 'recall', 'f1'),
+    'lookups': ('p50_ms', 'p99_ms', 'precision', 'recall', 'f1'),
+    'parallel': ('serial_per_sec', 'parallel_per_sec', 'speedup'),
+}
+
+
+def compare_reports(current: dict, previous: dict) -> List[str]:
+    """Рядки з різницею метрик поточного та попереднього звіту"""
+    lines = []
+    for section, metrics in COMPARED_METRICS.items():
+        for object_type, values in current.get(section, {}).items():
+            old_values = previous.get(section, {}).get(object_type, {})
+            for metric in metrics:
+                new, old = values.get(metric), old_values.get(metric)
+                if new is None or old is None:
+                    continue
+                lines.append(f"{section}.{object_type}.{metric}: {old} -> {new} ({new - old:+.4g})")
+    return lines
+
+
+def print_report(report: dict):
+    print(f"Поріг пар: {report['meta']['threshold']}, частка відсіяних каскадом: {report['pruning_rate']}")
+    for object_type, values in report['pairs'].items():
+        print(f"  pairs   {object_type:<14} {values['pairs']:>5} пар  {values['pairs_per_sec']:>10} пар/с  "
+              f"P={values['precision']} R={values['recall']} F1={values['f1']}")
+    for object_type, values in report['lookups'].items():
+        print(f"  lookups {object_type:<14} {values['lookups']:>5} запитів  p50={values.get('p50_ms')} мс  "
+              f"p99={values.get('p99_ms')} мс  P={values['precision']} R={values['recall']} F1={values['f1']}")
+    for object_type, values in report.get('parallel', {}).items():
+        print(f"  parallel {object_type:<13} {values['names']:>5} назв  1 процес: {values['serial_per_sec']} назв/с  "
+              f"{values['workers']} воркерів: {values['parallel_per_sec']} назв/с  x{values['speedup']}  "
+              f"результати однакові: {values['same_results']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк швидкості та точності компаратора адрес')
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH,
+                        help='Дамп з розміченими джерелами (migrations/DATA-TrinitY-3.txt)')
+    parser.add_argument('--output-dir', default=DEFAULT_REPORT_DIR,
+                        help='Каталог для JSON-звітів')
+    parser.add_argument('--threshold', type=float, default=0.8,
+                        help='Поріг оцінки схожості для рішення "той самий об\'єкт" у парах')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Скільки разів оцінювати кожну пару (стабільніший пар/с)')
+    parser.add_argument('--negatives', type=int, default=3,
+                        help='Кількість складних негативів на запит')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Зерно для вибірки негативів')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Виміряти прискорення validate_many через ParallelComparator з N воркерами')
+    parser.add_argument('--compare', help='Попередній JSON-звіт для порівняння')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.data, args.threshold, args.repeat, args.negatives, args.seed, args.workers)
+    print_report(report)
+    path = save_report(report, args.output_dir)
+    print(f"Звіт збережено: {path}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            previous = json.load(file)
+        print(f"Порівняння з {args.compare}:")
+        for line in compare_reports(report, previous):
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
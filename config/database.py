@@ -15,6 +15,26 @@ DATABASE_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'password')
 }
 
+# Пул з'єднань пошукової системи (src/utils/db_pool.py)
+POOL_CONFIG = {
+    'minconn': int(os.getenv('DB_POOL_MIN', '1')),
+    'maxconn': int(os.getenv('DB_POOL_MAX', '10')),
+    # Скільки секунд чекати вільне з'єднання, коли всі зайняті
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+    # З'єднання, що простояло довше (секунд), перевіряється SELECT 1 перед видачею
+    'health_check_interval': float(os.getenv('DB_POOL_HEALTH_CHECK', '30'))
+}
+
+# Кеш результатів пошуку (search_by_free_text) та перевірка версії даних (src/utils/data_version.py)
+CACHE_CONFIG = {
+    'size': int(os.getenv('SEARCH_CACHE_SIZE', '10000')),
+    'ttl': float(os.getenv('SEARCH_CACHE_TTL', '300')),
+    # Порожні результати живуть менше: адреса може з'явитися після міграції
+    'negative_ttl': float(os.getenv('SEARCH_CACHE_NEGATIVE_TTL', '60')),
+    # Як часто (секунд) перечитувати addrinity.data_versions
+    'data_version_check_interval': float(os.getenv('DATA_VERSION_CHECK_INTERVAL', '5'))
+}
+
 # Connection string для psycopg2
 CONNECTION_STRING = f"postgresql://{DATABASE_CONFIG['user']}:{DATABASE_CONFIG['password']}@{DATABASE_CONFIG['host']}:{DATABASE_CONFIG['port']}/{DATABASE_CONFIG['database']}"
 
@@ -0,0 +1,241 @@
+"""Спільні засоби тестів без підключення до БД
+
+FakeDB - з'єднання psycopg2, що відповідає рядками за текстом запиту і
+записує всі виконані запити; FakePool - пул пошукової системи над ним;
+FakeAsyncPool - пул asyncpg для асинхронної пошукової системи.
+make_search_engine / make_async_search_engine збирають пошукові системи
+зі знімком кандидатів у пам'яті, recorded_logs - повідомлення логера,
+run_tests - запуск тестів файлу напряму.
+"""
+
+import asyncio
+import logging
+from contextlib import contextmanager
+
+import psycopg2
+
+from src.utils.address_search import AddressSearchEngine
+from src.utils.address_search_async import AsyncAddressSearchEngine
+from src.utils.candidate_snapshot import CandidateSnapshot
+from src.utils.data_version import DataVersion
+from src.utils.validators import UniversalAddressComparator
+
+
+class PgError(psycopg2.ProgrammingError):
+    """Помилка psycopg2 з кодом PostgreSQL (errorcodes)"""
+
+    def __init__(self, message='', pgcode=None):
+        super().__init__(message)
+        self._pgcode = pgcode
+
+    @property
+    def pgcode(self):
+        return self._pgcode
+
+
+class FakeCursor:
+    """Курсор psycopg2 над FakeDB"""
+
+    def __init__(self, db):
+        self.db = db
+        self.connection = db
+        self.description = None
+        self._rows = []
+
+    def execute(self, query, params=None):
+        if isinstance(query, bytes):
+            query = query.decode()
+        self.db.queries.append((query, params))
+        if query in self.db.errors:
+            raise self.db.errors[query]
+
+        rows = self.db.answer(query, params)
+        # Рядки-словники задають і назви колонок (cursor.description)
+        if rows and isinstance(rows[0], dict):
+            self.description = [(column,) for column in rows[0]]
+            rows = [tuple(row.values()) for row in rows]
+        self._rows = list(rows)
+
+    def mogrify(self, query, params=None):
+        """Підстановка для execute_batch / execute_values: запит і параметри - в db.batches"""
+        if isinstance(query, bytes):
+            query = query.decode()
+        self.db.batches.append((' '.join(query.split()), params))
+        return query.encode()
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def close(self):
+        pass
+
+
+class FakeDB:
+    """З'єднання psycopg2: рядки за точним текстом запиту або з responder(query, params)"""
+
+    encoding = 'UTF8'
+
+    def __init__(self, rows=None, errors=None, responder=None):
+        self.rows = rows or {}
+        self.errors = errors or {}
+        self.responder = responder
+        self.queries = []
+        self.batches = []
+        self.events = []
+
+    def answer(self, query, params):
+        if query in self.rows:
+            return self.rows[query]
+        if self.responder:
+            return self.responder(query, params) or []
+        return []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.events.append('commit')
+
+    def rollback(self):
+        self.events.append('rollback')
+
+    def executed(self):
+        """Тексти виконаних запитів по порядку"""
+        return [query for query, _ in self.queries]
+
+    def count(self, query):
+        return self.executed().count(query)
+
+
+class FakePool:
+    """Пул з'єднань пошукової системи (src/utils/db_pool.py) з одним FakeDB"""
+
+    def __init__(self, db=None):
+        self.db = db or FakeDB()
+
+    @contextmanager
+    def cursor(self):
+        yield self.db.cursor()
+
+    def health_check(self):
+        return True
+
+    def metrics(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+def make_comparator(cities=('Дніпро',), streets=(), districts=()):
+    """Компаратор без БД зі знімком кандидатів у пам'яті"""
+    comparator = UniversalAddressComparator(connect=False)
+    comparator.snapshot = CandidateSnapshot(ttl=600, preparer=comparator.prepare_candidate)
+    comparator.snapshot.install('city', list(cities))
+    comparator.snapshot.install('street', list(streets))
+    comparator.snapshot.install('district', list(districts))
+    return comparator
+
+
+def make_search_engine(db=None, cities=('Дніпро',), streets=(), districts=(),
+                       check_interval=600, data_version=None):
+    """AddressSearchEngine над FakeDB; data_version - вже прочитана версія даних (без запиту)"""
+    engine = AddressSearchEngine(pool=FakePool(db))
+    engine.comparator = make_comparator(cities, streets, districts)
+    engine.data_version = DataVersion(check_interval=check_interval)
+    if data_version is not None:
+        engine.data_version.update(data_version)
+    return engine
+
+
+class FakeAsyncConnection:
+    """З'єднання asyncpg, що рахує паралельні запити пулу"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def _run(self, query, args):
+        self.pool.active += 1
+        self.pool.max_active = max(self.pool.max_active, self.pool.active)
+        try:
+            await asyncio.sleep(self.pool.delay)
+            self.pool.queries.append((query, args))
+            return self.pool.answer(query, args) if self.pool.answer else []
+        finally:
+            self.pool.active -= 1
+
+    async def fetch(self, query, *args):
+        return await self._run(query, args)
+
+    async def fetchrow(self, query, *args):
+        rows = await self._run(query, args)
+        return rows[0] if rows else None
+
+
+class FakeAcquire:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def __aenter__(self):
+        return FakeAsyncConnection(self.pool)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeAsyncPool:
+    """Пул asyncpg: answer(query, args) -> рядки, delay - тривалість кожного запиту"""
+
+    def __init__(self, answer=None, delay=0.01):
+        self.answer = answer
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.queries = []
+
+    def acquire(self):
+        return FakeAcquire(self)
+
+    async def close(self):
+        pass
+
+
+def make_async_search_engine(answer=None, streets=(), cities=('Дніпро',), districts=(), delay=0.01):
+    """AsyncAddressSearchEngine над FakeAsyncPool; версія даних уже перевірена"""
+    engine = AsyncAddressSearchEngine(pool=FakeAsyncPool(answer, delay),
+                                      comparator=make_comparator(cities, streets, districts))
+    engine.data_version = DataVersion(check_interval=600)
+    engine.data_version.update(1)
+    return engine
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self, records):
+        super().__init__(logging.DEBUG)
+        self.records = records
+
+    def emit(self, record):
+        self.records.append((record.levelname, record.getMessage()))
+
+
+@contextmanager
+def recorded_logs(logger):
+    """Записи логера (рівень, повідомлення) всередині блоку - без caplog pytest"""
+    records = []
+    handler = _ListHandler(records)
+    logger.addHandler(handler)
+    try:
+        yield records
+    finally:
+        logger.removeHandler(handler)
+
+
+def run_tests(namespace):
+    """Запуск тестів модуля без pytest (python test_xxx.py)"""
+    for name, func in list(namespace.items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -9,6 +9,7 @@ from src.utils.logger import migration_logger
 from src.migrators.bld_local import BldLocalMigrator
 from src.migrators.ek_addr import EkAddrMigrator
 from src.migrators.rtg_addr import RtgAddrMigrator
+from src.processors.street_entity_resolution import StreetEntityResolver
 
 def main():
     parser = argparse.ArgumentParser(description='Міграція даних до addrinity')
@@ -20,6 +21,18 @@ def main():
                        help='Тестовий запуск без збереження даних')
     parser.add_argument('--batch-size', type=int, default=1000,
                        help='Розмір батчу для обробки')
+    parser.add_argument('--delta', action='store_true',
+                       help='rtg_addr: лише записи, змінені після попередньої синхронізації')
+    parser.add_argument('--resolve-streets', action='store_true',
+                       help='Після міграції зіставити вулиці між джерелами (карта злиття)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Кількість процесів для нечіткого порівняння (валідація bld_local / ek_addr, --resolve-streets)')
+    parser.add_argument('--phonetic-keys', action='store_true',
+                       help='Заповнити phonetic_key для назв, створених до появи колонки')
+    parser.add_argument('--building-numbers', action='store_true',
+                       help='Заповнити канонічні номери будівель, створених до появи колонок')
+    parser.add_argument('--no-address-refresh', action='store_true',
+                       help='Не оновлювати addrinity.mv_full_address після міграції')
     
     args = parser.parse_args()
     
@@ -32,16 +45,56 @@ def main():
         
         # Міграція обраних таблиць
         if 'bld_local' in tables_to_migrate:
-            migrator = BldLocalMigrator()
+            migrator = BldLocalMigrator(workers=args.workers)
             migrator.migrate(dry_run=args.dry_run, batch_size=args.batch_size)
         
         if 'ek_addr' in tables_to_migrate:
-            migrator = EkAddrMigrator()
+            migrator = EkAddrMigrator(workers=args.workers)
             migrator.migrate(dry_run=args.dry_run, batch_size=args.batch_size)
         
         if 'rtg_addr' in tables_to_migrate:
             migrator = RtgAddrMigrator()
-            migrator.migrate(dry_run=args.dry_run, batch_size=args.batch_size)
+            migrator.migrate(dry_run=args.dry_run, batch_size=args.batch_size, delta=args.delta)
+        
+        if (args.phonetic_keys or args.building_numbers) and not args.dry_run:
+            import psycopg2
+            from config.database import CONNECTION_STRING
+            from src.processors.hierarchy_resolver import HierarchyResolver
+            connection = psycopg2.connect(CONNECTION_STRING)
+            try:
+                resolver = HierarchyResolver(connection, migration_logger)
+                if args.phonetic_keys:
+                    resolver.backfill_phonetic_keys()
+                if args.building_numbers:
+                    resolver.backfill_building_numbers()
+            finally:
+                connection.close()
+        
+        if args.resolve_streets:
+            import psycopg2
+            from config.database import CONNECTION_STRING
+            connection = psycopg2.connect(CONNECTION_STRING)
+            comparator = None
+            if args.workers > 1:
+                from src.utils.parallel_comparator import ParallelComparator
+                comparator = ParallelComparator(workers=args.workers)
+            try:
+                StreetEntityResolver(connection, migration_logger, comparator).run(dry_run=args.dry_run)
+            finally:
+                if comparator:
+                    comparator.close()
+                connection.close()
+        
+        if not args.dry_run and not args.no_address_refresh:
+            # Таблиця повних адрес для пошуку - після всіх змін даних
+            import psycopg2
+            from config.database import CONNECTION_STRING
+            from src.processors.full_address_index import FullAddressIndex
+            connection = psycopg2.connect(CONNECTION_STRING)
+            try:
+                FullAddressIndex(connection, migration_logger).refresh()
+            finally:
+                connection.close()
         
         migration_logger.info("Міграція завершена успішно!")
         
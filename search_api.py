@@ -1,15 +1,43 @@
-"""API для пошуку адрес по вільному тексту"""
+"""API для пошуку адрес по вільному тексту
+
+Обробники працюють з AsyncAddressSearchEngine (src/utils/address_search_async.py):
+запити до БД - через пул asyncpg (розміри - DB_POOL_MIN / DB_POOL_MAX), нечітке
+порівняння - в пулі потоків, тож повільний запит не блокує event loop.
+"""
+
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Query, HTTPException
 from typing import Optional, List
-from src.search.address_search import get_search_engine
+from src.utils.address_search_async import get_async_search_engine
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Пул з'єднань та індекси автодоповнення створюються при старті сервера, пул закривається при зупинці"""
+    searcher = get_async_search_engine()
+    try:
+        await searcher.connect()
+    except Exception:
+        # БД недоступна при старті - пул буде створено при першому запиті
+        pass
+    try:
+        await searcher.load_autocomplete()
+    except Exception:
+        # Індекси будуються при першому автодоповненні
+        pass
+    yield
+    await searcher.close()
 
-app = FastAPI(title="Addrinity Search API", version="1.0.0")
+
+app = FastAPI(title="Addrinity Search API", version="1.0.0", lifespan=lifespan)
 
 @app.get("/api/search")
 async def search_address(
     query: str = Query(..., description="Текст для пошуку адреси"),
-    limit: int = Query(50, description="Максимальна кількість результатів")
+    limit: int = Query(50, description="Максимальна кількість результатів"),
+    city: Optional[str] = Query(None, description="Місто: пошук лише серед його вулиць і районів"),
+    district: Optional[str] = Query(None, description="Район міста: пошук лише серед його вулиць")
 ):
     """
     Пошук адрес по вільному тексту
@@ -18,10 +46,11 @@ async def search_address(
     - /api/search?query=вулиця Хрещатик 15
     - /api/search?query=Дніпро, Старий Шлях 192
     - /api/search?query=Кірова вул., буд. 100
+    - /api/search?query=Старий Шлях 192&city=Дніпро
     """
     try:
-        searcher = get_search_engine()
-        results = searcher.search_by_free_text(query, limit)
+        searcher = get_async_search_engine()
+        results = await searcher.search_by_free_text(query, limit, city=city, district=district)
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -29,7 +58,9 @@ async def search_address(
 @app.get("/api/autocomplete")
 async def autocomplete(
     partial: str = Query(..., description="Частковий текст для автодоповнення"),
-    object_type: str = Query("street", description="Тип об'єкта: street, district")
+    object_type: str = Query("street", description="Тип об'єкта: street, district"),
+    city: Optional[str] = Query(None, description="Місто"),
+    district: Optional[str] = Query(None, description="Район міста")
 ):
     """
     Автодоповнення для пошуку
@@ -37,10 +68,11 @@ async def autocomplete(
     Приклади запитів:
     - /api/autocomplete?partial=Хрещ&object_type=street
     - /api/autocomplete?partial=Таром&object_type=district
+    - /api/autocomplete?partial=Хрещ&object_type=street&city=Дніпро
     """
     try:
-        searcher = get_search_engine()
-        suggestions = searcher.fuzzy_search(partial, object_type)
+        searcher = get_async_search_engine()
+        suggestions = await searcher.fuzzy_search(partial, object_type, city=city, district=district)
         return {"suggestions": suggestions}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -53,12 +85,26 @@ async def get_address_details(building_id: int):
     Приклад: /api/address/12345
     """
     try:
-        searcher = get_search_engine()
+        searcher = get_async_search_engine()
         # Реалізація отримання деталей адреси
         return {"building_id": building_id, "details": "Адресна інформація"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/health")
+async def health():
+    """
+    Стан БД, метрики пулу з'єднань та кешу результатів
+    
+    Приклад: /api/health
+    """
+    searcher = get_async_search_engine()
+    metrics = {'healthy': await searcher.health_check(), **searcher.pool_metrics(),
+               'result_cache': searcher.cache_metrics()}
+    if not metrics['healthy']:
+        raise HTTPException(status_code=503, detail=metrics)
+    return metrics
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -360,3 +360,103 @@ ADD CONSTRAINT uniq_rtg_premise_id UNIQUE (rtg_premise_id);
 
 
 
+-- ========================== 19.10.2026 ================================================= ++
+-- Дельта-міграція: high-water mark по date_modified для кожного джерела
+
+ALTER TABLE addrinity.data_sources ADD COLUMN IF NOT EXISTS high_water_mark TIMESTAMP;
+ALTER TABLE addrinity.data_sources ADD COLUMN IF NOT EXISTS last_sync_at TIMESTAMP;
+
+COMMENT ON COLUMN addrinity.data_sources.high_water_mark IS 'Найпізніша date_modified (або date_created) серед перенесених рядків джерела';
+COMMENT ON COLUMN addrinity.data_sources.last_sync_at IS 'Час останньої успішної дельта-синхронізації';
+
+-- Відбір змінених рядків без повного сканування addr.rtg_addr
+CREATE INDEX IF NOT EXISTS idx_rtg_addr_modified ON addr.rtg_addr ((COALESCE(date_modified, date_created)));
+
+
+-- ========================== 19.10.2026 ================================================= ++
+-- Карта злиття вулиць між джерелами (src/processors/street_entity_resolution.py)
+
+CREATE TABLE IF NOT EXISTS addrinity.street_entity_merges (
+    street_entity_id INT PRIMARY KEY REFERENCES addrinity.street_entities(id), -- Дублікат
+    canonical_id INT NOT NULL REFERENCES addrinity.street_entities(id), -- Канонічна вулиця
+    score NUMERIC(5, 4), -- Оцінка схожості назв
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+COMMENT ON TABLE addrinity.street_entity_merges IS 'Вулиці, визнані одним обєктом; будівлі та назви дубліката перенесено на canonical_id, мігратори привязують нові будівлі до canonical_id';
+
+CREATE INDEX IF NOT EXISTS idx_street_entity_merges_canonical ON addrinity.street_entity_merges(canonical_id);
+
+
+-- ========================== 19.10.2026 ================================================= ++
+-- Фонетичний ключ назв (src/utils/phonetics.py) для пошуку фонетично однакових назв за рівністю.
+-- Заповнюється міграторами; для вже існуючих рядків: python migrate.py --tables ... --phonetic-keys
+
+ALTER TABLE addrinity.street_names ADD COLUMN IF NOT EXISTS phonetic_key VARCHAR(255);
+ALTER TABLE addrinity.city_districts ADD COLUMN IF NOT EXISTS phonetic_key VARCHAR(255);
+ALTER TABLE addrinity.cities ADD COLUMN IF NOT EXISTS phonetic_key VARCHAR(255);
+
+COMMENT ON COLUMN addrinity.street_names.phonetic_key IS 'Фонетичний ключ назви без типу вулиці (слова відсортовані)';
+COMMENT ON COLUMN addrinity.city_districts.phonetic_key IS 'Фонетичний ключ назви району';
+COMMENT ON COLUMN addrinity.cities.phonetic_key IS 'Фонетичний ключ назви міста';
+
+CREATE INDEX IF NOT EXISTS idx_street_names_phonetic_key ON addrinity.street_names(phonetic_key);
+CREATE INDEX IF NOT EXISTS idx_city_districts_phonetic_key ON addrinity.city_districts(phonetic_key);
+CREATE INDEX IF NOT EXISTS idx_cities_phonetic_key ON addrinity.cities(phonetic_key);
+
+
+-- ========================== 19.10.2026 ================================================= ++
+-- Розширення для нечіткого пошуку (одноразово, адміністратором).
+-- UniversalAddressComparator більше не виконує CREATE EXTENSION при кожному створенні.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS fuzzystrmatch;
+
+
+-- ========================== 19.10.2026 ================================================= ++
+-- Канонічна форма номера будівлі (src/utils/building_numbers.py): 12А, 12/3, 12 корп. 2.
+-- Пошук будівлі на вулиці - рівністю за індексом; сортування - як чисел ("2" перед "100").
+-- Заповнюється міграторами; для вже існуючих будівель: python migrate.py --tables ... --building-numbers
+
+ALTER TABLE addrinity.buildings ADD COLUMN IF NOT EXISTS number_int INT;
+ALTER TABLE addrinity.buildings ADD COLUMN IF NOT EXISTS number_letter VARCHAR(10);
+ALTER TABLE addrinity.buildings ADD COLUMN IF NOT EXISTS number_fraction VARCHAR(20);
+ALTER TABLE addrinity.buildings ADD COLUMN IF NOT EXISTS number_corpus VARCHAR(20);
+ALTER TABLE addrinity.buildings ADD COLUMN IF NOT EXISTS number_canonical VARCHAR(50);
+
+COMMENT ON COLUMN addrinity.buildings.number_int IS 'Числова частина номера (12 для 12А/3)';
+COMMENT ON COLUMN addrinity.buildings.number_letter IS 'Літерний суфікс номера (А для 12А)';
+COMMENT ON COLUMN addrinity.buildings.number_fraction IS 'Дробова частина номера (3 для 12/3)';
+COMMENT ON COLUMN addrinity.buildings.number_corpus IS 'Корпус (з номера або колонки corpus)';
+COMMENT ON COLUMN addrinity.buildings.number_canonical IS 'Канонічний номер: 12А/3 к2';
+
+CREATE INDEX IF NOT EXISTS idx_buildings_street_number_canonical
+    ON addrinity.buildings(street_entity_id, number_canonical);
+CREATE INDEX IF NOT EXISTS idx_buildings_street_number_order
+    ON addrinity.buildings(street_entity_id, number_int, number_letter, number_fraction, number_corpus);
+
+
+-- ========================== 19.10.2026 ================================================= ++
+-- Знімки кандидатів в межах міста / району міста (src/utils/candidate_snapshot.py, SCOPED_CANDIDATE_QUERIES):
+-- місто та район шукаються за назвою без урахування регістру.
+
+CREATE INDEX IF NOT EXISTS idx_cities_name_lower ON addrinity.cities(lower(name_uk));
+CREATE INDEX IF NOT EXISTS idx_city_districts_name_lower ON addrinity.city_districts(lower(name_uk));
+
+
+-- ========================== 19.10.2026 ================================================= ++
+-- Версії даних для інвалідації кешу результатів пошуку (src/utils/data_version.py).
+-- Мігратори збільшують версію 'addresses' в транзакції кожної пачки;
+-- пошукові системи перечитують її не частіше DATA_VERSION_CHECK_INTERVAL секунд.
+
+CREATE TABLE IF NOT EXISTS addrinity.data_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE addrinity.data_versions IS 'Лічильники версій даних для інвалідації кешів';
+COMMENT ON COLUMN addrinity.data_versions.version IS 'Збільшується після кожної зміни даних';
+
+INSERT INTO addrinity.data_versions (name, version) VALUES ('addresses', 0)
+ON CONFLICT (name) DO NOTHING;
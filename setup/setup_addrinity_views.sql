@@ -79,4 +79,93 @@ FROM addrinity.buildings bld
 LEFT JOIN addrinity.street_entities ste ON bld.street_entity_id = ste.id
 LEFT JOIN addrinity.street_names stn ON stn.street_entity_id = ste.id AND stn.is_current = TRUE AND stn.is_official = TRUE
 LEFT JOIN addrinity.cities ct ON ste.city_id = ct.id
-WHERE bld.latitude IS NOT NULL AND bld.longitude IS NOT NULL;
\ No newline at end of file
+WHERE bld.latitude IS NOT NULL AND bld.longitude IS NOT NULL;
+
+-- ================================
+-- MATERIALIZED VIEW: Денормалізовані повні адреси для пошуку
+-- Один рядок на будівлю (premise_id IS NULL) та на кожне її приміщення.
+-- Повна адреса збирається один раз при оновленні, а не JOIN-ами в кожному
+-- запиті пошуку (get_full_address, search_full_address у src/utils/address_search.py).
+--   normalized_address - нижній регістр без розділових знаків (GIN-триграмний індекс);
+--   phonetic_address   - фонетичні ключі міста та вулиці (phonetic_key) і канонічний номер.
+-- Оновлюється після міграцій (migrate.py, src/processors/full_address_index.py):
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY не блокує читання (потрібен унікальний індекс address_key).
+-- ================================
+CREATE MATERIALIZED VIEW IF NOT EXISTS addrinity.mv_full_address AS
+WITH building_addresses AS (
+    SELECT
+        bld.id AS building_id,
+        ste.id AS street_entity_id,
+        ctd.id AS city_district_id,
+        ct.id AS city_id,
+        cm.id AS community_id,
+        dst.id AS district_id,
+        rgn.id AS region_id,
+        rgn.country_id,
+        ct.name_uk AS city,
+        ctd.name_uk AS city_district,
+        stn.name AS street,
+        stt.short_name_uk AS street_type,
+        bld.number AS building_number,
+        bld.corpus,
+        bld.number_canonical,
+        bld.postal_code,
+        concat_ws(', ', ct.name_uk, stn.name || COALESCE(' ' || stt.short_name_uk, ''),
+                  bld.number || COALESCE('/' || NULLIF(bld.corpus, ''), '')) AS full_address,
+        concat_ws(' ', ct.phonetic_key, stn.phonetic_key, bld.number_canonical) AS phonetic_address
+    FROM addrinity.buildings bld
+    JOIN addrinity.street_entities ste ON bld.street_entity_id = ste.id
+    LEFT JOIN LATERAL (
+        SELECT sn.name, sn.phonetic_key
+        FROM addrinity.street_names sn
+        WHERE sn.street_entity_id = ste.id AND sn.is_current = TRUE
+        ORDER BY sn.is_official DESC NULLS LAST, sn.id
+        LIMIT 1
+    ) stn ON TRUE
+    LEFT JOIN addrinity.street_types stt ON ste.type_id = stt.id
+    LEFT JOIN addrinity.city_districts ctd ON ste.city_district_id = ctd.id
+    LEFT JOIN addrinity.cities ct ON ste.city_id = ct.id
+    LEFT JOIN addrinity.communities cm ON ct.community_id = cm.id
+    LEFT JOIN addrinity.districts dst ON cm.district_id = dst.id
+    LEFT JOIN addrinity.regions rgn ON dst.region_id = rgn.id
+),
+addresses AS (
+    SELECT
+        'b' || ba.building_id AS address_key,
+        ba.building_id, NULL::INT AS premise_id,
+        ba.street_entity_id, ba.city_district_id, ba.city_id, ba.community_id,
+        ba.district_id, ba.region_id, ba.country_id,
+        ba.city, ba.city_district, ba.street, ba.street_type,
+        ba.building_number, ba.corpus, ba.number_canonical,
+        NULL::TEXT AS premise_number, NULL::TEXT AS premise_type, ba.postal_code,
+        ba.full_address, ba.phonetic_address
+    FROM building_addresses ba
+    UNION ALL
+    SELECT
+        'p' || prm.id AS address_key,
+        ba.building_id, prm.id AS premise_id,
+        ba.street_entity_id, ba.city_district_id, ba.city_id, ba.community_id,
+        ba.district_id, ba.region_id, ba.country_id,
+        ba.city, ba.city_district, ba.street, ba.street_type,
+        ba.building_number, ba.corpus, ba.number_canonical,
+        prm.number AS premise_number, prm.type AS premise_type, ba.postal_code,
+        ba.full_address || ', ' ||
+            CASE WHEN prm.type IS NULL OR prm.type = 'квартира' THEN 'кв.' ELSE prm.type END ||
+            ' ' || prm.number AS full_address,
+        concat_ws(' ', ba.phonetic_address, prm.number) AS phonetic_address
+    FROM addrinity.premises prm
+    JOIN building_addresses ba ON ba.building_id = prm.building_id
+)
+SELECT
+    addresses.*,
+    trim(regexp_replace(lower(full_address), '[^[:alnum:]]+', ' ', 'g')) AS normalized_address
+FROM addresses;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_full_address_key ON addrinity.mv_full_address(address_key);
+CREATE INDEX IF NOT EXISTS idx_mv_full_address_building ON addrinity.mv_full_address(building_id);
+CREATE INDEX IF NOT EXISTS idx_mv_full_address_street ON addrinity.mv_full_address(street_entity_id);
+CREATE INDEX IF NOT EXISTS idx_mv_full_address_city_lower ON addrinity.mv_full_address(lower(city));
+CREATE INDEX IF NOT EXISTS idx_mv_full_address_normalized_trgm
+    ON addrinity.mv_full_address USING GIN (normalized_address gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_mv_full_address_phonetic_trgm
+    ON addrinity.mv_full_address USING GIN (phonetic_address gin_trgm_ops);
@@ -22,6 +22,16 @@ try:
 except ImportError:
     HAS_TQDM = False
 
+try:
+    from src.processors.hierarchy_resolver import HierarchyResolver
+    from src.processors.source_adapters import RtgAddrAdapter
+    from src.processors.delta_sync import DeltaSync
+except ImportError:
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'processors'))
+    from hierarchy_resolver import HierarchyResolver
+    from source_adapters import RtgAddrAdapter
+    from delta_sync import DeltaSync
+
 try:
     from src.utils.logger import migration_logger
     from src.utils.migration_data_parser import MigrationDataParser
@@ -103,22 +113,14 @@ class RtgAddrMigrator:
             'created_streets': 0,
             'created_buildings': 0,
             'created_premises': 0,
-            'duplicates': 0,
             'validated': 0,
             'similar_found': 0,
-            'premises_created': 0
         }
         
-        # Кеші для оптимізації
-        self.cache = {
-            'countries': {},
-            'regions': {},
-            'districts': {},
-            'communities': {},
-            'cities': {},
-            'city_districts': {},
-            'street_types': {},
-        }
+        # Спільний пакетний резолвер ієрархії (кеші, пакетні SELECT/INSERT)
+        self.adapter = RtgAddrAdapter()
+        self.resolver = HierarchyResolver(self.connection, self.logger, self.stats)
+        self.delta_sync = DeltaSync('rtg_addr', self.connection, self.logger)
         
         # Ініціалізація валідатора (опціонально)
         try:
@@ -184,192 +186,37 @@ class RtgAddrMigrator:
         
         return text
     
-    def get_or_create_entity(self, table: str, search_field: str, search_value: str, 
-                           create_fields: dict, dry_run: bool = False) -> int:
-        """Універсальний метод створення сутності з ідемпотентністю"""
-        
-        cache_key = f"{table}_{search_value}"
-        if cache_key in self.cache.get(table, {}):
-            self.stats['duplicates'] += 1
-            return self.cache[table][cache_key]
-        
-        if dry_run or not self.cursor:
-            # Режим без БД або DRY RUN
-            entity_id = len(self.cache.get(table, {})) + 1
-            if table not in self.cache:
-                self.cache[table] = {}
-            self.cache[table][cache_key] = entity_id
-            self.stats[f'created_{table}'] = self.stats.get(f'created_{table}', 0) + 1
-            self.logger.debug(f"DRY RUN: створення {table} - {search_value}")
-            return entity_id
-        
-        try:
-            # Пошук існуючого
-            query = f"SELECT id FROM addrinity.{table} WHERE {search_field} = %s"
-            self.cursor.execute(query, (search_value,))
-            result = self.cursor.fetchone()
-            
-            if result:
-                entity_id = result['id']
-                if table not in self.cache:
-                    self.cache[table] = {}
-                self.cache[table][cache_key] = entity_id
-                self.stats['duplicates'] += 1
-                return entity_id
-            
-            # Створення нового
-            fields = ', '.join(create_fields.keys())
-            placeholders = ', '.join(['%s'] * len(create_fields))
-            values = list(create_fields.values())
-            
-            query = f"""
-                INSERT INTO addrinity.{table} ({fields})
-                VALUES ({placeholders})
-                RETURNING id
-            """
-            self.cursor.execute(query, values)
-            entity_id = self.cursor.fetchone()['id']
-            self.connection.commit()
-            
-            if table not in self.cache:
-                self.cache[table] = {}
-            self.cache[table][cache_key] = entity_id
-            self.stats[f'created_{table}'] = self.stats.get(f'created_{table}', 0) + 1
-            
-            return entity_id
-            
-        except Exception as e:
-            if self.connection:
-                self.connection.rollback()
-            self.logger.error(f"Помилка створення {table}: {e}")
-            raise
-    
     def process_record(self, record: dict, source_id: int, dry_run: bool = False) -> bool:
         """Обробка одного запису"""
         
+        if not self.parser:
+            self.logger.error("Парсер недоступний")
+            return False
+        
         try:
-            if not self.parser:
-                self.logger.error("Парсер недоступний")
-                return False
-                
-            # Нормалізація запису
             normalized = self.parser.normalize_record(record)
-            
-            # Базова валідація
-            if not normalized.get('path') or not normalized.get('city'):
-                self.logger.warning(f"Пропущено запис {normalized.get('id', 'unknown')}: немає path або міста")
-                self.stats['skipped'] += 1
-                return False
-            
-            # Парсинг ієрархії
-            hierarchy = self.parser.parse_path_hierarchy(normalized['path'])
-            
-            # Створення ієрархії адмінодиниць
-            try:
-                # Країна
-                country_id = self.get_or_create_entity(
-                    'countries', 'iso_code', 'UA',
-                    {
-                        'iso_code': 'UA',
-                        'name_uk': 'Україна',
-                        'rtg_country_id': hierarchy.get('country')
-                    },
-                    dry_run
-                )
-                
-                # Регіон
-                region_id = self.get_or_create_entity(
-                    'regions', 'name_uk', normalized['region'],
-                    {
-                        'country_id': country_id,
-                        'name_uk': normalized['region'],
-                        'rtg_region_id': hierarchy.get('region')
-                    },
-                    dry_run
-                )
-                
-                # Район
-                district_id = self.get_or_create_entity(
-                    'districts', 'name_uk', normalized['district'],
-                    {
-                        'region_id': region_id,
-                        'name_uk': normalized['district'],
-                        'rtg_district_id': hierarchy.get('district')
-                    },
-                    dry_run
-                )
-                
-                # Громада  
-                community_id = self.get_or_create_entity(
-                    'communities', 'name_uk', normalized['community'],
-                    {
-                        'district_id': district_id,
-                        'name_uk': normalized['community'],
-                        'type': 'міська' if 'міська' in normalized['community'].lower() else 'сільська',
-                        'rtg_community_id': hierarchy.get('community')
-                    },
-                    dry_run
-                )
-                
-                # Місто
-                city_id = self.get_or_create_entity(
-                    'cities', 'name_uk', normalized['city'],
-                    {
-                        'community_id': community_id,
-                        'name_uk': normalized['city'],
-                        'type': normalized.get('city_type', 'м.'),
-                        'rtg_city_id': hierarchy.get('city')
-                    },
-                    dry_run
-                )
-                
-                # Збереження зв'язку з джерелом
-                self.save_object_source('city', city_id, source_id, normalized, dry_run)
-                
-                self.stats['processed'] += 1
-                self.stats['validated'] += 1
-                return True
-                
-            except Exception as e:
-                self.logger.error(f"Помилка створення ієрархії для запису {normalized.get('id')}: {e}")
-                self.stats['errors'] += 1
-                return False
-                
         except Exception as e:
             self.stats['errors'] += 1
             self.logger.error(f"Помилка обробки запису {record.get('id', 'unknown')}: {e}")
             return False
-    
-    def save_object_source(self, object_type: str, object_id: int, source_id: int, 
-                          original_data: dict, dry_run: bool = False) -> bool:
-        """Збереження зв'язку об'єкта з джерелом"""
         
-        if dry_run or not self.cursor:
-            self.logger.debug(f"{'DRY RUN: ' if dry_run else ''}Збереження джерела для {object_type}:{object_id}")
+        skipped_before = self.stats['skipped']
+        if self.resolver.process_batch(self.adapter, [normalized], source_id, dry_run):
+            self.stats['validated'] += 1
             return True
         
-        try:
-            self.cursor.execute("""
-                INSERT INTO addrinity.object_sources 
-                (object_type, object_id, source_id, original_data)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (object_type, object_id, source_id) DO UPDATE SET
-                    original_data = EXCLUDED.original_data
-            """, (object_type, object_id, source_id, json.dumps(original_data, ensure_ascii=False)))
-            
-            self.connection.commit()
-            return True
-            
-        except Exception as e:
-            if self.connection:
-                self.connection.rollback()
-            self.logger.error(f"Помилка збереження джерела для {object_type}:{object_id}: {e}")
-            return False
+        if self.stats['skipped'] > skipped_before:
+            self.logger.warning(f"Пропущено запис {normalized.get('id', 'unknown')}: немає path або міста")
+        return False
     
-    def migrate(self, dry_run: bool = False, batch_size: int = 1000) -> dict:
-        """Головний метод міграції з підтримкою оригінального інтерфейсу"""
+    def migrate(self, dry_run: bool = False, batch_size: int = 1000, delta: bool = False) -> dict:
+        """Головний метод міграції з підтримкою оригінального інтерфейсу
+        
+        delta=True - обробляються лише записи, змінені після high-water mark,
+        а зміни існуючих об'єктів записуються на місці.
+        """
         
-        self.logger.info(f"{'DRY RUN: ' if dry_run else ''}Початок міграції rtg_addr")
+        self.logger.info(f"{'DRY RUN: ' if dry_run else ''}Початок {'дельта-' if delta else ''}міграції rtg_addr")
         
         if not self.parser:
             self.logger.error("Парсер міграційних даних недоступний")
@@ -385,6 +232,12 @@ class RtgAddrMigrator:
             total_records = len(records)
             self.logger.info(f"Завантажено {total_records} записів з файлу міграції")
             
+            if delta:
+                since = self.delta_sync.get_high_water_mark()
+                records = self.delta_sync.filter_changed(records, since)
+                total_records = len(records)
+                self.logger.info(f"Змінено після {since or 'початку'}: {total_records} записів")
+            
             if dry_run:
                 records = records[:min(100, total_records)]
                 self.logger.info(f"DRY RUN: Обробляємо лише {len(records)} записів")
@@ -393,23 +246,39 @@ class RtgAddrMigrator:
             self.logger.error(f"Помилка завантаження даних: {e}")
             return self.stats
         
-        # Обробка записів
+        # Нормалізація записів
+        normalized_records = []
+        for record in records:
+            try:
+                normalized_records.append(self.parser.normalize_record(record))
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.stats['invalid'] = self.stats.get('invalid', 0) + 1
+                self.logger.error(f"Помилка обробки запису {record.get('id', 'unknown')}: {e}")
+        
+        # Обробка записів пачками через спільний резолвер ієрархії
         progress_desc = f"{'DRY RUN: ' if dry_run else ''}Міграція rtg_addr"
         
         if HAS_TQDM:
-            progress_bar = tqdm(total=len(records), desc=progress_desc)
+            progress_bar = tqdm(total=len(normalized_records), desc=progress_desc)
         
-        for i, record in enumerate(records):
-            self.process_record(record, source_id, dry_run)
+        for i in range(0, len(normalized_records), batch_size):
+            batch = normalized_records[i:i + batch_size]
+            processed = self.resolver.process_batch(self.adapter, batch, source_id, dry_run, update=delta)
+            self.stats['validated'] += processed
             
             if HAS_TQDM:
-                progress_bar.update(1)
-            elif i % 50 == 0:
-                self.logger.info(f"Оброблено {i}/{len(records)} записів")
+                progress_bar.update(len(batch))
+            else:
+                self.logger.info(f"Оброблено {i + len(batch)}/{len(normalized_records)} записів")
         
         if HAS_TQDM:
             progress_bar.close()
         
+        # Позначка зсувається лише після запуску без збоїв запису (невалідні записи не враховуються)
+        if delta:
+            self.delta_sync.advance(normalized_records, since, self.stats, dry_run)
+        
         # Звіт про результати
         self._print_migration_summary(dry_run)
         return self.stats
@@ -422,16 +291,24 @@ class RtgAddrMigrator:
         self.logger.info(f"{prefix}ПІДСУМОК МІГРАЦІЇ RTG_ADDR")
         self.logger.info("=" * 60)
         
+        duplicates = sum(v for k, v in self.stats.items() if k.startswith('duplicate_'))
+        
         self.logger.info(f"Оброблено записів: {self.stats['processed']}")
         self.logger.info(f"Помилки: {self.stats['errors']}")
         self.logger.info(f"Пропущено: {self.stats['skipped']}")
-        self.logger.info(f"Дублікати: {self.stats['duplicates']}")
+        self.logger.info(f"Дублікати: {duplicates}")
         
         creation_stats = {k.replace('created_', ''): v for k, v in self.stats.items() if k.startswith('created_') and v > 0}
         if creation_stats:
             self.logger.info("\nСтворено нових об'єктів:")
             for key, value in creation_stats.items():
                 self.logger.info(f"  {key}: {value}")
+        
+        update_stats = {k.replace('updated_', ''): v for k, v in self.stats.items() if k.startswith('updated_') and v > 0}
+        if update_stats:
+            self.logger.info("\nОновлено на місці:")
+            for key, value in update_stats.items():
+                self.logger.info(f"  {key}: {value}")
 
 
 # Додаткові функції для підтримки
@@ -17,6 +17,14 @@ try:
 except ImportError:
     HAS_DEPENDENCIES = False
 
+try:
+    from src.processors.hierarchy_resolver import HierarchyResolver
+    from src.processors.source_adapters import RtgAddrAdapter
+except ImportError:
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'processors'))
+    from hierarchy_resolver import HierarchyResolver
+    from source_adapters import RtgAddrAdapter
+
 try:
     from src.utils.logger import migration_logger
     from src.utils.migration_data_parser import MigrationDataParser
@@ -77,18 +85,9 @@ class RefactoredRtgAddrMigrator:
             'duplicate_premises': 0,
         }
         
-        # Кеші для мінімізації запитів до БД
-        self.cache = {
-            'countries': {},
-            'regions': {},
-            'districts': {},
-            'communities': {},
-            'cities': {},
-            'city_districts': {},
-            'street_types': {},
-            'streets': {},
-            'buildings': {},
-        }
+        # Адаптер джерела та спільний пакетний резолвер ієрархії
+        self.adapter = RtgAddrAdapter()
+        self.resolver = HierarchyResolver(self.connection, self.logger, self.stats)
         
         # Ініціалізація валідатора
         try:
@@ -168,576 +167,16 @@ class RefactoredRtgAddrMigrator:
         
         return building
     
-    def get_or_create_country(self, path_country_id: str, region_name: str = None, dry_run: bool = False) -> int:
-        """Отримання або створення країни з ідемпотентністю"""
-        
-        cache_key = f"rtg_{path_country_id}"
-        if cache_key in self.cache['countries']:
-            self.stats['duplicate_countries'] += 1
-            return self.cache['countries'][cache_key]
-        
-        if dry_run:
-            self.logger.info(f"DRY RUN: Створення/перевірка країни з rtg_id: {path_country_id}")
-            country_id = len(self.cache['countries']) + 1
-            self.cache['countries'][cache_key] = country_id
-            self.stats['created_countries'] += 1
-            return country_id
-        
-        try:
-            # Спочатку шукаємо за оригінальним ID
-            self.cursor.execute("""
-                SELECT id FROM addrinity.countries 
-                WHERE rtg_country_id = %s
-            """, (path_country_id,))
-            
-            result = self.cursor.fetchone()
-            if result:
-                country_id = result['id']
-                self.cache['countries'][cache_key] = country_id
-                self.stats['duplicate_countries'] += 1
-                return country_id
-            
-            # Створення нової країни (завжди Україна для rtg_addr)
-            country_name = 'Україна'
-            self.cursor.execute("""
-                INSERT INTO addrinity.countries 
-                (iso_code, name_uk, rtg_country_id) 
-                VALUES (%s, %s, %s) 
-                ON CONFLICT (iso_code) DO UPDATE SET 
-                    rtg_country_id = COALESCE(countries.rtg_country_id, EXCLUDED.rtg_country_id)
-                RETURNING id
-            """, ('UA', country_name, path_country_id))
-            
-            country_id = self.cursor.fetchone()['id']
-            self.connection.commit()
-            
-            self.cache['countries'][cache_key] = country_id
-            self.stats['created_countries'] += 1
-            self.logger.debug(f"Створено країну: {country_name} (ID: {country_id})")
-            
-            return country_id
-            
-        except Exception as e:
-            if self.connection:
-                self.connection.rollback()
-            self.logger.error(f"Помилка створення країни: {e}")
-            raise
-    
-    def get_or_create_region(self, path_region_id: str, country_id: int, region_name: str, dry_run: bool = False) -> int:
-        """Отримання або створення регіону з ідемпотентністю"""
-        
-        if not region_name:
-            raise ValueError("Назва регіону обов'язкова")
-        
-        normalized_name = self.normalize_text(region_name)
-        cache_key = f"rtg_{path_region_id}_{normalized_name}"
-        
-        if cache_key in self.cache['regions']:
-            self.stats['duplicate_regions'] += 1
-            return self.cache['regions'][cache_key]
-        
-        if dry_run:
-            self.logger.info(f"DRY RUN: Створення/перевірка регіону: {normalized_name}")
-            region_id = len(self.cache['regions']) + 1
-            self.cache['regions'][cache_key] = region_id
-            self.stats['created_regions'] += 1
-            return region_id
-        
-        try:
-            # Пошук за rtg_region_id або назвою
-            self.cursor.execute("""
-                SELECT id FROM addrinity.regions 
-                WHERE rtg_region_id = %s OR (country_id = %s AND name_uk = %s)
-            """, (path_region_id, country_id, normalized_name))
-            
-            result = self.cursor.fetchone()
-            if result:
-                region_id = result['id']
-                self.cache['regions'][cache_key] = region_id
-                self.stats['duplicate_regions'] += 1
-                return region_id
-            
-            # Створення нового регіону
-            self.cursor.execute("""
-                INSERT INTO addrinity.regions 
-                (country_id, name_uk, rtg_region_id) 
-                VALUES (%s, %s, %s) 
-                RETURNING id
-            """, (country_id, normalized_name, path_region_id))
-            
-            region_id = self.cursor.fetchone()['id']
-            self.connection.commit()
-            
-            self.cache['regions'][cache_key] = region_id
-            self.stats['created_regions'] += 1
-            self.logger.debug(f"Створено регіон: {normalized_name} (ID: {region_id})")
-            
-            return region_id
-            
-        except Exception as e:
-            if self.connection:
-                self.connection.rollback()
-            self.logger.error(f"Помилка створення регіону {normalized_name}: {e}")
-            raise
-    
-    def get_or_create_district(self, path_district_id: str, region_id: int, district_name: str, dry_run: bool = False) -> int:
-        """Отримання або створення району з ідемпотентністю"""
-        
-        if not district_name:
-            raise ValueError("Назва району обов'язкова")
-        
-        normalized_name = self.normalize_text(district_name, 'district')
-        cache_key = f"rtg_{path_district_id}_{normalized_name}"
-        
-        if cache_key in self.cache['districts']:
-            self.stats['duplicate_districts'] += 1
-            return self.cache['districts'][cache_key]
-        
-        if dry_run:
-            self.logger.info(f"DRY RUN: Створення/перевірка району: {normalized_name}")
-            district_id = len(self.cache['districts']) + 1
-            self.cache['districts'][cache_key] = district_id
-            self.stats['created_districts'] += 1
-            return district_id
-        
-        try:
-            # Пошук за rtg_district_id або назвою в регіоні
-            self.cursor.execute("""
-                SELECT id FROM addrinity.districts 
-                WHERE rtg_district_id = %s OR (region_id = %s AND name_uk = %s)
-            """, (path_district_id, region_id, normalized_name))
-            
-            result = self.cursor.fetchone()
-            if result:
-                district_id = result['id']
-                self.cache['districts'][cache_key] = district_id
-                self.stats['duplicate_districts'] += 1
-                return district_id
-            
-            # Створення нового району
-            self.cursor.execute("""
-                INSERT INTO addrinity.districts 
-                (region_id, name_uk, rtg_district_id) 
-                VALUES (%s, %s, %s) 
-                RETURNING id
-            """, (region_id, normalized_name, path_district_id))
-            
-            district_id = self.cursor.fetchone()['id']
-            self.connection.commit()
-            
-            self.cache['districts'][cache_key] = district_id
-            self.stats['created_districts'] += 1
-            self.logger.debug(f"Створено район: {normalized_name} (ID: {district_id})")
-            
-            return district_id
-            
-        except Exception as e:
-            if self.connection:
-                self.connection.rollback()
-            self.logger.error(f"Помилка створення району {normalized_name}: {e}")
-            raise
-    
-    def get_or_create_community(self, path_community_id: str, district_id: int, community_name: str, dry_run: bool = False) -> int:
-        """Отримання або створення громади з ідемпотентністю"""
-        
-        if not community_name:
-            raise ValueError("Назва громади обов'язкова")
-        
-        normalized_name = self.normalize_text(community_name)
-        
-        # Визначення типу громади
-        community_type = 'міська' if 'міська' in normalized_name.lower() else 'сільська'
-        
-        cache_key = f"rtg_{path_community_id}_{normalized_name}"
-        
-        if cache_key in self.cache['communities']:
-            self.stats['duplicate_communities'] += 1
-            return self.cache['communities'][cache_key]
-        
-        if dry_run:
-            self.logger.info(f"DRY RUN: Створення/перевірка громади: {normalized_name}")
-            community_id = len(self.cache['communities']) + 1
-            self.cache['communities'][cache_key] = community_id
-            self.stats['created_communities'] += 1
-            return community_id
-        
-        try:
-            # Пошук за rtg_community_id або назвою в районі
-            self.cursor.execute("""
-                SELECT id FROM addrinity.communities 
-                WHERE rtg_community_id = %s OR (district_id = %s AND name_uk = %s)
-            """, (path_community_id, district_id, normalized_name))
-            
-            result = self.cursor.fetchone()
-            if result:
-                community_id = result['id']
-                self.cache['communities'][cache_key] = community_id
-                self.stats['duplicate_communities'] += 1
-                return community_id
-            
-            # Створення нової громади
-            self.cursor.execute("""
-                INSERT INTO addrinity.communities 
-                (district_id, name_uk, type, rtg_community_id) 
-                VALUES (%s, %s, %s, %s) 
-                RETURNING id
-            """, (district_id, normalized_name, community_type, path_community_id))
-            
-            community_id = self.cursor.fetchone()['id']
-            self.connection.commit()
-            
-            self.cache['communities'][cache_key] = community_id
-            self.stats['created_communities'] += 1
-            self.logger.debug(f"Створено громаду: {normalized_name} (ID: {community_id})")
-            
-            return community_id
-            
-        except Exception as e:
-            if self.connection:
-                self.connection.rollback()
-            self.logger.error(f"Помилка створення громади {normalized_name}: {e}")
-            raise
-    
-    def get_or_create_city(self, path_city_id: str, community_id: int, city_name: str, city_type: str = 'м.', dry_run: bool = False) -> int:
-        """Отримання або створення міста з ідемпотентністю"""
-        
-        if not city_name:
-            raise ValueError("Назва міста обов'язкова")
-        
-        normalized_name = self.normalize_text(city_name)
-        normalized_type = city_type or 'м.'
-        
-        cache_key = f"rtg_{path_city_id}_{normalized_name}"
-        
-        if cache_key in self.cache['cities']:
-            self.stats['duplicate_cities'] += 1
-            return self.cache['cities'][cache_key]
-        
-        if dry_run:
-            self.logger.info(f"DRY RUN: Створення/перевірка міста: {normalized_name} ({normalized_type})")
-            city_id = len(self.cache['cities']) + 1
-            self.cache['cities'][cache_key] = city_id
-            self.stats['created_cities'] += 1
-            return city_id
-        
-        try:
-            # Пошук за rtg_city_id або назвою в громаді
-            self.cursor.execute("""
-                SELECT id FROM addrinity.cities 
-                WHERE rtg_city_id = %s OR (community_id = %s AND name_uk = %s)
-            """, (path_city_id, community_id, normalized_name))
-            
-            result = self.cursor.fetchone()
-            if result:
-                city_id = result['id']
-                self.cache['cities'][cache_key] = city_id
-                self.stats['duplicate_cities'] += 1
-                return city_id
-            
-            # Створення нового міста
-            self.cursor.execute("""
-                INSERT INTO addrinity.cities 
-                (community_id, name_uk, type, rtg_city_id) 
-                VALUES (%s, %s, %s, %s) 
-                RETURNING id
-            """, (community_id, normalized_name, normalized_type, path_city_id))
-            
-            city_id = self.cursor.fetchone()['id']
-            self.connection.commit()
-            
-            self.cache['cities'][cache_key] = city_id
-            self.stats['created_cities'] += 1
-            self.logger.debug(f"Створено місто: {normalized_name} (ID: {city_id})")
-            
-            return city_id
-            
-        except Exception as e:
-            if self.connection:
-                self.connection.rollback()
-            self.logger.error(f"Помилка створення міста {normalized_name}: {e}")
-            raise
-    
-    def get_or_create_city_district(self, city_id: int, district_name: str, dry_run: bool = False) -> Optional[int]:
-        """Отримання або створення району міста з ідемпотентністю"""
-        
-        if not district_name:
-            return None
-        
-        normalized_name = self.normalize_text(district_name, 'district')
-        cache_key = f"city_{city_id}_{normalized_name}"
-        
-        if cache_key in self.cache['city_districts']:
-            self.stats['duplicate_city_districts'] += 1
-            return self.cache['city_districts'][cache_key]
-        
-        if dry_run:
-            self.logger.info(f"DRY RUN: Створення/перевірка району міста: {normalized_name}")
-            city_district_id = len(self.cache['city_districts']) + 1
-            self.cache['city_districts'][cache_key] = city_district_id
-            self.stats['created_city_districts'] += 1
-            return city_district_id
-        
-        try:
-            # Пошук за назвою в місті
-            self.cursor.execute("""
-                SELECT id FROM addrinity.city_districts 
-                WHERE city_id = %s AND name_uk = %s
-            """, (city_id, normalized_name))
-            
-            result = self.cursor.fetchone()
-            if result:
-                city_district_id = result['id']
-                self.cache['city_districts'][cache_key] = city_district_id
-                self.stats['duplicate_city_districts'] += 1
-                return city_district_id
-            
-            # Створення нового району міста
-            self.cursor.execute("""
-                INSERT INTO addrinity.city_districts 
-                (city_id, name_uk, type) 
-                VALUES (%s, %s, %s) 
-                RETURNING id
-            """, (city_id, normalized_name, 'адміністративний'))
-            
-            city_district_id = self.cursor.fetchone()['id']
-            self.connection.commit()
-            
-            self.cache['city_districts'][cache_key] = city_district_id
-            self.stats['created_city_districts'] += 1
-            self.logger.debug(f"Створено район міста: {normalized_name} (ID: {city_district_id})")
-            
-            return city_district_id
-            
-        except Exception as e:
-            if self.connection:
-                self.connection.rollback()
-            self.logger.error(f"Помилка створення району міста {normalized_name}: {e}")
-            raise
-    
-    def get_or_create_street_type(self, type_name: str, dry_run: bool = False) -> int:
-        """Отримання або створення типу вулиці з ідемпотентністю"""
-        
-        if not type_name:
-            type_name = "вулиця"
-        
-        normalized_type = self.normalize_text(type_name, 'street_type')
-        cache_key = normalized_type
-        
-        if cache_key in self.cache['street_types']:
-            self.stats['duplicate_street_types'] += 1
-            return self.cache['street_types'][cache_key]
-        
-        if dry_run:
-            self.logger.info(f"DRY RUN: Створення/перевірка типу вулиці: {normalized_type}")
-            street_type_id = len(self.cache['street_types']) + 1
-            self.cache['street_types'][cache_key] = street_type_id
-            self.stats['created_street_types'] += 1
-            return street_type_id
-        
-        try:
-            # Пошук за назвою
-            self.cursor.execute("""
-                SELECT id FROM addrinity.street_types 
-                WHERE name_uk = %s
-            """, (normalized_type,))
-            
-            result = self.cursor.fetchone()
-            if result:
-                street_type_id = result['id']
-                self.cache['street_types'][cache_key] = street_type_id
-                self.stats['duplicate_street_types'] += 1
-                return street_type_id
-            
-            # Створення нового типу вулиці
-            short_name = self._get_short_street_type(normalized_type)
-            self.cursor.execute("""
-                INSERT INTO addrinity.street_types 
-                (name_uk, short_name_uk, rtg_type_code) 
-                VALUES (%s, %s, %s) 
-                RETURNING id
-            """, (normalized_type, short_name, type_name))
-            
-            street_type_id = self.cursor.fetchone()['id']
-            self.connection.commit()
-            
-            self.cache['street_types'][cache_key] = street_type_id
-            self.stats['created_street_types'] += 1
-            self.logger.debug(f"Створено тип вулиці: {normalized_type} (ID: {street_type_id})")
-            
-            return street_type_id
-            
-        except Exception as e:
-            if self.connection:
-                self.connection.rollback()
-            self.logger.error(f"Помилка створення типу вулиці {normalized_type}: {e}")
-            raise
-    
-    def _get_short_street_type(self, full_type: str) -> str:
-        """Отримання скороченої назви типу вулиці"""
-        short_mapping = {
-            'вулиця': 'вул.',
-            'проспект': 'просп.',
-            'бульвар': 'бул.',
-            'провулок': 'пров.',
-            'шосе': 'ш.',
-            'тупик': 'туп.',
-            'майдан': 'майд.',
-            'алея': 'ал.',
-            'набережна': 'наб.',
-            'площа': 'пл.'
-        }
-        return short_mapping.get(full_type.lower(), full_type[:4] + '.')
-    
-    def save_object_source(self, object_type: str, object_id: int, source_id: int, original_data: dict, dry_run: bool = False) -> bool:
-        """Збереження зв'язку об'єкта з джерелом"""
-        
-        if dry_run:
-            self.logger.debug(f"DRY RUN: Збереження джерела для {object_type}:{object_id}")
-            return True
-        
-        try:
-            self.cursor.execute("""
-                INSERT INTO addrinity.object_sources 
-                (object_type, object_id, source_id, original_data)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (object_type, object_id, source_id) DO UPDATE SET
-                    original_data = EXCLUDED.original_data
-            """, (object_type, object_id, source_id, json.dumps(original_data, ensure_ascii=False)))
-            
-            self.connection.commit()
-            return True
-            
-        except Exception as e:
-            if self.connection:
-                self.connection.rollback()
-            self.logger.error(f"Помилка збереження джерела для {object_type}:{object_id}: {e}")
-            return False
-    
     def process_record(self, record: dict, source_id: int, dry_run: bool = False) -> bool:
-        """Обробка одного запису з повною ієрархією"""
-        
+        """Обробка одного запису rtg_addr через спільний резолвер ієрархії"""
         try:
-            # Нормалізація запису
             normalized = self.parser.normalize_record(record)
-            
-            # Пропускаємо записи без мінімальних даних
-            if not normalized.get('path') or not normalized.get('city'):
-                self.logger.warning(f"Пропущено запис {normalized.get('id', 'unknown')}: немає path або міста")
-                self.stats['skipped'] += 1
-                return False
-            
-            # Парсинг ієрархії з path
-            hierarchy = self.parser.parse_path_hierarchy(normalized['path'])
-            
-            # Обробка ієрархії адмінодиниць
-            country_id = self.get_or_create_country(
-                hierarchy.get('country'), 
-                normalized.get('region'), 
-                dry_run
-            )
-            
-            region_id = self.get_or_create_region(
-                hierarchy.get('region'), 
-                country_id, 
-                normalized['region'], 
-                dry_run
-            )
-            
-            district_id = self.get_or_create_district(
-                hierarchy.get('district'), 
-                region_id, 
-                normalized['district'], 
-                dry_run
-            )
-            
-            community_id = self.get_or_create_community(
-                hierarchy.get('community'), 
-                district_id, 
-                normalized['community'], 
-                dry_run
-            )
-            
-            city_id = self.get_or_create_city(
-                hierarchy.get('city'), 
-                community_id, 
-                normalized['city'],
-                normalized.get('city_type', 'м.'),
-                dry_run
-            )
-            
-            # Район міста (опціонально)
-            city_district_id = None
-            if normalized.get('city_district'):
-                city_district_id = self.get_or_create_city_district(
-                    city_id, 
-                    normalized['city_district'], 
-                    dry_run
-                )
-            
-            # Вулиця (якщо є)
-            street_entity_id = None
-            if normalized.get('street'):
-                street_type_id = self.get_or_create_street_type(
-                    normalized.get('street_type', 'вулиця'), 
-                    dry_run
-                )
-                street_entity_id = self._get_or_create_street_entity(
-                    city_id, city_district_id, street_type_id,
-                    normalized['street'], hierarchy, normalized, dry_run
-                )
-            
-            # Будівля (якщо є)
-            building_id = None
-            if normalized.get('building'):
-                building_id = self._get_or_create_building(
-                    street_entity_id or city_id, normalized, dry_run
-                )
-            
-            # Приміщення (якщо є)
-            if normalized.get('flat') or normalized.get('room'):
-                self._get_or_create_premise(
-                    building_id, normalized, dry_run
-                )
-            
-            # Збереження джерела даних
-            primary_object_type = 'premise' if (normalized.get('flat') or normalized.get('room')) else \
-                                 'building' if normalized.get('building') else \
-                                 'street' if normalized.get('street') else 'city'
-            
-            primary_object_id = building_id or street_entity_id or city_id
-            
-            self.save_object_source(
-                primary_object_type, 
-                primary_object_id, 
-                source_id, 
-                normalized, 
-                dry_run
-            )
-            
-            self.stats['processed'] += 1
-            return True
-            
         except Exception as e:
             self.stats['errors'] += 1
             self.logger.error(f"Помилка обробки запису {record.get('id', 'unknown')}: {e}")
             return False
-    
-    def _get_or_create_street_entity(self, city_id: int, city_district_id: Optional[int], 
-                                   street_type_id: int, street_name: str, hierarchy: dict, 
-                                   normalized: dict, dry_run: bool = False) -> int:
-        """Створення вуличного об'єкта"""
-        # Реалізація створення street_entity - спрощена для цього прикладу
-        return 1
-    
-    def _get_or_create_building(self, parent_id: int, normalized: dict, dry_run: bool = False) -> int:
-        """Створення будівлі"""
-        # Реалізація створення building - спрощена для цього прикладу
-        return 1
-    
-    def _get_or_create_premise(self, building_id: int, normalized: dict, dry_run: bool = False) -> int:
-        """Створення приміщення"""
-        # Реалізація створення premise - спрощена для цього прикладу
-        return 1
+        
+        return self.resolver.process_batch(self.adapter, [normalized], source_id, dry_run) > 0
     
     def migrate(self, dry_run: bool = False, batch_size: int = 100) -> dict:
         """Головний метод міграції"""
@@ -761,18 +200,24 @@ class RefactoredRtgAddrMigrator:
             self.logger.error(f"Помилка завантаження даних: {e}")
             return self.stats
         
-        # Обробка записів пакетами
+        normalized_records = []
+        for record in records:
+            try:
+                normalized_records.append(self.parser.normalize_record(record))
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"Помилка обробки запису {record.get('id', 'unknown')}: {e}")
+        
+        # Обробка записів пакетами: один SELECT/INSERT на рівень ієрархії
         if HAS_DEPENDENCIES:
-            progress_bar = tqdm(total=len(records), desc="Міграція rtg_addr")
+            progress_bar = tqdm(total=len(normalized_records), desc="Міграція rtg_addr")
         
-        for i in range(0, len(records), batch_size):
-            batch = records[i:i + batch_size]
+        for i in range(0, len(normalized_records), batch_size):
+            batch = normalized_records[i:i + batch_size]
+            self.resolver.process_batch(self.adapter, batch, source_id, dry_run)
             
-            for record in batch:
-                self.process_record(record, source_id, dry_run)
-                
-                if HAS_DEPENDENCIES:
-                    progress_bar.update(1)
+            if HAS_DEPENDENCIES:
+                progress_bar.update(len(batch))
         
         if HAS_DEPENDENCIES:
             progress_bar.close()
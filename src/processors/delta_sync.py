@@ -0,0 +1,114 @@
+"""Дельта-міграція: high-water mark по date_modified для кожного джерела
+
+Позначка зберігається в addrinity.data_sources.high_water_mark. Дельта-запуск
+бере лише рядки, у яких COALESCE(date_modified, date_created) більша за позначку,
+і передає їх у HierarchyResolver з update=True, щоб змінені назви та типи
+записувались на місці. Позначка зсувається тільки після запуску без збоїв запису
+в БД (лічильник failed резолвера), тому невдалі пачки будуть оброблені повторно
+наступного разу. Рядки, відхилені валідацією (invalid), позначку не тримають:
+без змін у джерелі вони були б відхилені знову, а після зміни - потраплять у дельту.
+"""
+
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+try:
+    from src.processors.source_adapters import clean_value
+except ImportError:
+    from source_adapters import clean_value
+
+
+# Умова відбору змінених рядків для addr.rtg_addr (параметр %(since)s)
+DELTA_CONDITION = "COALESCE(date_modified, date_created) > %(since)s"
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Дата з дампу ('2025-04-28 05:48:50.030') або з БД (datetime / pandas.Timestamp)"""
+    if clean_value(value) is None:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(clean_value(value))
+    except ValueError:
+        return None
+
+
+def record_modified_at(record) -> Optional[datetime]:
+    """Момент останньої зміни запису: date_modified, або date_created якщо змін не було"""
+    return parse_timestamp(record.get('date_modified')) or parse_timestamp(record.get('date_created'))
+
+
+class DeltaSync:
+    """Зберігання та застосування high-water mark одного джерела"""
+
+    def __init__(self, source_name: str, connection=None, logger: logging.Logger = None):
+        self.source_name = source_name
+        self.connection = connection
+        self.cursor = connection.cursor() if connection is not None else None
+        self.logger = logger or logging.getLogger('AddrinityMigration')
+
+    def get_high_water_mark(self) -> Optional[datetime]:
+        """Поточна позначка джерела; None - дельта ще не запускалась (повна міграція)"""
+        if not self.cursor:
+            return None
+
+        self.cursor.execute(
+            "SELECT high_water_mark FROM addrinity.data_sources WHERE name = %s",
+            (self.source_name,)
+        )
+        result = self.cursor.fetchone()
+        return result[0] if result else None
+
+    def filter_changed(self, records: List[dict], since: Optional[datetime]) -> List[dict]:
+        """Записи, змінені після позначки (без позначки - усі записи)"""
+        if since is None:
+            return list(records)
+        return [record for record in records
+                if (record_modified_at(record) or datetime.min) > since]
+
+    @staticmethod
+    def latest(records: Iterable[dict], since: Optional[datetime] = None) -> Optional[datetime]:
+        """Нова позначка: найпізніша дата зміни серед оброблених записів"""
+        mark = since
+        for record in records:
+            modified_at = record_modified_at(record)
+            if modified_at and (mark is None or modified_at > mark):
+                mark = modified_at
+        return mark
+
+    def advance(self, records: Iterable[dict], since: Optional[datetime], stats: dict,
+                dry_run: bool = False) -> Optional[datetime]:
+        """Зсув позначки після дельта-запуску; None - були збої запису, позначка не змінена"""
+        if stats.get('failed'):
+            self.logger.warning(f"High-water mark {self.source_name} не змінено: "
+                                f"{stats['failed']} збоїв запису під час дельта-міграції")
+            return None
+        if stats.get('invalid'):
+            self.logger.info(f"Невалідні записи {self.source_name} ({stats['invalid']}) "
+                             f"не затримують high-water mark")
+
+        mark = self.latest(records, since)
+        self.save_high_water_mark(mark, dry_run)
+        return mark
+
+    def save_high_water_mark(self, mark: Optional[datetime], dry_run: bool = False):
+        """Збереження позначки (лише вперед) та часу синхронізації"""
+        if mark is None:
+            return
+        if dry_run or not self.cursor:
+            self.logger.info(f"DRY RUN: high-water mark {self.source_name} = {mark}")
+            return
+
+        self.cursor.execute(
+            """
+            UPDATE addrinity.data_sources
+            SET high_water_mark = GREATEST(COALESCE(high_water_mark, %s), %s),
+                last_sync_at = NOW()
+            WHERE name = %s
+            """,
+            (mark, mark, self.source_name)
+        )
+        self.connection.commit()
+        self.logger.info(f"High-water mark {self.source_name} = {mark}")
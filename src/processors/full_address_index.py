@@ -0,0 +1,75 @@
+"""Оновлення денормалізованої таблиці повних адрес addrinity.mv_full_address
+
+Матеріалізоване подання (setup/setup_addrinity_views.sql) тримає по рядку на
+будівлю та приміщення з готовою адресою, нормалізованою та фонетичною формами
+і ID ієрархії. Після міграції його треба оновити:
+  - REFRESH ... CONCURRENTLY - читання пошуком не блокуються на час оновлення;
+  - подання, створене WITH NO DATA, ще не можна оновити конкурентно -
+    перше оновлення виконується звичайним REFRESH.
+Разом з оновленням збільшується версія адресних даних, тож кеші результатів
+пошуку не віддають адреси, отримані з попереднього стану подання.
+"""
+
+import logging
+
+from psycopg2 import errorcodes
+
+try:
+    from src.utils.data_version import get_data_version
+except ImportError:
+    import os
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
+    from data_version import get_data_version
+
+
+FULL_ADDRESS_VIEW = 'addrinity.mv_full_address'
+
+
+class FullAddressIndex:
+    """Оновлення addrinity.mv_full_address після міграцій"""
+
+    def __init__(self, connection=None, logger: logging.Logger = None, data_version=None):
+        self.connection = connection
+        self.cursor = connection.cursor() if connection is not None else None
+        self.logger = logger or logging.getLogger('AddrinityMigration')
+        self.data_version = data_version or get_data_version()
+        self.stats = {'refreshes': 0, 'concurrent': 0, 'rows': 0}
+
+    def _refresh(self, concurrently: bool):
+        mode = 'CONCURRENTLY ' if concurrently else ''
+        self.cursor.execute(f"REFRESH MATERIALIZED VIEW {mode}{FULL_ADDRESS_VIEW}")
+
+    def refresh(self, concurrently: bool = True, dry_run: bool = False) -> bool:
+        """Оновлення подання; False - подання ще не створено або режим без БД"""
+        if dry_run or not self.cursor:
+            self.logger.info(f"DRY RUN: оновлення {FULL_ADDRESS_VIEW}")
+            return False
+
+        try:
+            try:
+                self._refresh(concurrently)
+            except Exception as e:
+                if not concurrently or getattr(e, 'pgcode', None) != errorcodes.OBJECT_NOT_IN_PREREQUISITE_STATE:
+                    raise
+                # Подання ще не заповнене - конкурентне оновлення неможливе
+                self.connection.rollback()
+                concurrently = False
+                self._refresh(concurrently)
+
+            self.data_version.bump(self.cursor)
+            self.connection.commit()
+        except Exception as e:
+            self.connection.rollback()
+            if getattr(e, 'pgcode', None) == errorcodes.UNDEFINED_TABLE:
+                self.logger.warning(f"{FULL_ADDRESS_VIEW} не створено (setup/setup_addrinity_views.sql)")
+                return False
+            raise
+
+        self.stats['refreshes'] += 1
+        self.stats['concurrent'] += int(concurrently)
+        self.cursor.execute(f"SELECT COUNT(*) FROM {FULL_ADDRESS_VIEW}")
+        self.stats['rows'] = self.cursor.fetchone()[0]
+        self.logger.info(f"{FULL_ADDRESS_VIEW} оновлено"
+                         f"{' конкурентно' if concurrently else ''}: {self.stats['rows']} адрес")
+        return True
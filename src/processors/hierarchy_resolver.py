@@ -0,0 +1,629 @@
+"""Спільний пакетний резолвер ієрархії addrinity для всіх міграторів
+
+Мігратори не шукають і не створюють об'єкти самостійно: адаптер джерела
+(src/processors/source_adapters.py) перетворює рядок у вузли ієрархії,
+а резолвер розв'язує їх пачками:
+  1. довідники (країни ... типи вулиць) повністю завантажуються в кеш один раз;
+  2. для кожного рівня всі невідомі ключі пачки шукаються одним SELECT;
+  3. відсутні об'єкти вставляються одним INSERT ... RETURNING на рівень.
+
+Назви вулиць, районів міста та міст записуються разом з фонетичним ключем
+(колонка phonetic_key, src/utils/phonetics.py), а номери будівель - разом з
+канонічною формою (колонки number_*, src/utils/building_numbers.py) для пошуку
+за рівністю.
+
+Кожна фіксація пачки збільшує версію адресних даних (addrinity.data_versions,
+src/utils/data_version.py) в тій самій транзакції - кеші результатів пошуку
+перестають віддавати результати, отримані до зміни даних.
+
+У режимі оновлення (update=True, дельта-міграція) знайдені в БД вулиці,
+будівлі та приміщення порівнюються з рядком джерела, і змінені колонки
+та назви вулиць записуються на місці (UPDATE), а не створюються заново.
+"""
+
+import json
+import logging
+from typing import Dict, List, Optional
+
+try:
+    from psycopg2.extras import execute_batch, execute_values
+except ImportError:
+    execute_batch = execute_values = None
+
+try:
+    from src.utils.candidate_snapshot import get_candidate_snapshot
+    from src.utils.data_version import get_data_version
+    from src.utils.phonetics import phonetic_key
+    from src.utils.building_numbers import building_number_columns
+except ImportError:
+    import os
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
+    from candidate_snapshot import get_candidate_snapshot
+    from data_version import get_data_version
+    from phonetics import phonetic_key
+    from building_numbers import building_number_columns
+
+
+# Рівні ієрархії у порядку розв'язання.
+# parents    - колонка таблиці -> рівень, з якого береться ID
+# key_parents - батьківські колонки входять до природного ключа (назва в межах батька)
+# preload    - невеликий довідник, який повністю завантажується в кеш
+HIERARCHY_LEVELS = (
+    {'level': 'country', 'table': 'countries', 'stat': 'countries',
+     'parents': {}, 'key_parents': False, 'preload': ('iso_code',)},
+    {'level': 'region', 'table': 'regions', 'stat': 'regions',
+     'parents': {'country_id': 'country'}, 'key_parents': True, 'preload': ('name_uk',)},
+    {'level': 'district', 'table': 'districts', 'stat': 'districts',
+     'parents': {'region_id': 'region'}, 'key_parents': True, 'preload': ('name_uk',)},
+    {'level': 'community', 'table': 'communities', 'stat': 'communities',
+     'parents': {'district_id': 'district'}, 'key_parents': True, 'preload': ('name_uk',)},
+    {'level': 'city', 'table': 'cities', 'stat': 'cities',
+     'parents': {'community_id': 'community'}, 'key_parents': True, 'preload': ('name_uk',)},
+    {'level': 'city_district', 'table': 'city_districts', 'stat': 'city_districts',
+     'parents': {'city_id': 'city'}, 'key_parents': True, 'preload': ('name_uk',)},
+    {'level': 'street_type', 'table': 'street_types', 'stat': 'street_types',
+     'parents': {}, 'key_parents': False, 'preload': ('name_uk',)},
+    {'level': 'street', 'table': 'street_entities', 'stat': 'streets',
+     'parents': {'city_id': 'city', 'city_district_id': 'city_district', 'type_id': 'street_type'},
+     'key_parents': False, 'preload': None},
+    {'level': 'building', 'table': 'buildings', 'stat': 'buildings',
+     'parents': {'street_entity_id': 'street'}, 'key_parents': False, 'preload': None},
+    {'level': 'premise', 'table': 'premises', 'stat': 'premises',
+     'parents': {'building_id': 'building'}, 'key_parents': False, 'preload': None},
+)
+
+LEVELS_BY_NAME = {spec['level']: spec for spec in HIERARCHY_LEVELS}
+
+# Рівень -> (тип об'єкта знімка кандидатів, колонки з назвами)
+SNAPSHOT_COLUMNS = {
+    'district': ('district', ('name_uk',)),
+    'city': ('city', ('name_uk',)),
+    'city_district': ('district', ('name_uk',)),
+    'street_type': ('street_type', ('name_uk', 'short_name_uk')),
+    'building': ('building', ('number_canonical',)),
+}
+
+# Рівень -> тип об'єкта фонетичного ключа (колонка phonetic_key за name_uk)
+PHONETIC_KEY_LEVELS = {
+    'city': 'city',
+    'city_district': 'district',
+}
+
+
+
+def derived_columns(level: str, values: dict) -> dict:
+    """Колонки, що обчислюються зі значень рівня: фонетичний ключ, канонічний номер будівлі"""
+    if level in PHONETIC_KEY_LEVELS:
+        return {'phonetic_key': phonetic_key(values.get('name_uk'), PHONETIC_KEY_LEVELS[level])}
+    if level == 'building':
+        return building_number_columns(values.get('number'), values.get('corpus'))
+    return {}
+
+
+# Таблиці з колонкою phonetic_key: таблиця -> (колонка назви, тип об'єкта)
+PHONETIC_KEY_TABLES = {
+    'street_names': ('name', 'street'),
+    'city_districts': ('name_uk', 'district'),
+    'cities': ('name_uk', 'city'),
+}
+
+
+class HierarchyResolver:
+    """Пакетне отримання або створення об'єктів ієрархії з кешуванням"""
+
+    def __init__(self, connection=None, logger: logging.Logger = None, stats: dict = None,
+                 snapshot=None, data_version=None):
+        self.connection = connection
+        self.cursor = connection.cursor() if connection is not None else None
+        self.logger = logger or logging.getLogger('AddrinityMigration')
+        self.stats = stats if stats is not None else {}
+
+        # Кеш: рівень -> ключ -> ID
+        self.cache = {spec['level']: {} for spec in HIERARCHY_LEVELS}
+        # Ключі, створені в поточній (ще не зафіксованій) транзакції
+        self._pending_created = []
+        # Нові назви, які після фіксації додаються до знімка кандидатів компаратора
+        self.snapshot = snapshot or get_candidate_snapshot()
+        self._pending_names = []
+        # Версія адресних даних (ключ кешів результатів пошуку) - збільшується з кожною фіксацією
+        self.data_version = data_version or get_data_version()
+        # Лічильник фіктивних ID для DRY RUN
+        self._dry_run_ids = {spec['level']: 0 for spec in HIERARCHY_LEVELS}
+        self._preloaded = False
+        # Карта злиття вулиць між джерелами: id дубліката -> канонічний id
+        self.street_merges = {}
+
+    @staticmethod
+    def cache_key(lookup: dict) -> tuple:
+        """Ключ кешу з природного ключа (значення приводяться до рядків)"""
+        return tuple((column, None if value is None else str(value))
+                     for column, value in sorted(lookup.items()))
+
+    def _count(self, stat: str, amount: int = 1):
+        self.stats[stat] = self.stats.get(stat, 0) + amount
+
+    def preload(self):
+        """Завантаження довідників у кеш одним запитом на таблицю"""
+        if self._preloaded or not self.cursor:
+            return
+
+        for spec in HIERARCHY_LEVELS:
+            if not spec['preload']:
+                continue
+
+            key_columns = list(spec['preload'])
+            if spec['key_parents']:
+                key_columns = list(spec['parents']) + key_columns
+
+            self.cursor.execute(
+                f"SELECT id, {', '.join(key_columns)} FROM addrinity.{spec['table']}"
+            )
+            for row in self.cursor.fetchall():
+                lookup = dict(zip(key_columns, row[1:]))
+                self.cache[spec['level']].setdefault(self.cache_key(lookup), row[0])
+
+        self.load_street_merges()
+        self._preloaded = True
+        self.logger.info(
+            "Довідники завантажено в кеш: " +
+            ', '.join(f"{spec['table']}={len(self.cache[spec['level']])}"
+                      for spec in HIERARCHY_LEVELS if spec['preload'])
+        )
+
+    def load_street_merges(self):
+        """Карта злиття вулиць (src/processors/street_entity_resolution.py), якщо вона є"""
+        self.cursor.execute("SELECT to_regclass('addrinity.street_entity_merges')")
+        if self.cursor.fetchone()[0] is None:
+            return
+
+        self.cursor.execute("SELECT street_entity_id, canonical_id FROM addrinity.street_entity_merges")
+        self.street_merges = dict(self.cursor.fetchall())
+        if self.street_merges:
+            self.logger.info(f"Карта злиття вулиць: {len(self.street_merges)} записів")
+
+    def resolve_batch(self, hierarchies: List[Optional[Dict[str, dict]]],
+                      dry_run: bool = False, update: bool = False) -> List[Optional[Dict[str, int]]]:
+        """Розв'язання пачки ієрархій; повертає для кожної словник рівень -> ID
+
+        update=True - існуючі об'єкти (крім довідників) оновлюються значеннями джерела.
+        """
+        if not dry_run:
+            self.preload()
+
+        results = [{} if hierarchy else None for hierarchy in hierarchies]
+
+        for spec in HIERARCHY_LEVELS:
+            level = spec['level']
+            pending = {}
+            slots = []
+
+            for index, hierarchy in enumerate(hierarchies):
+                if not hierarchy or level not in hierarchy:
+                    continue
+
+                node = hierarchy[level]
+                parent_values = {column: results[index].get(parent_level)
+                                 for column, parent_level in spec['parents'].items()}
+
+                lookup = dict(node['key'])
+                if spec['key_parents']:
+                    lookup.update(parent_values)
+                if any(value is None for value in lookup.values()):
+                    continue
+
+                key = self.cache_key(lookup)
+                slots.append((index, key))
+                if key not in self.cache[level] and key not in pending:
+                    values = {**parent_values, **node.get('values', {}), **lookup}
+                    values.update(derived_columns(level, values))
+                    pending[key] = (lookup, values, node)
+
+            created = self._resolve_pending(spec, pending, dry_run, update) if pending else set()
+
+            for index, key in slots:
+                object_id = self.cache[level][key]
+                if level == 'street' and object_id in self.street_merges:
+                    # Будівлі прив'язуються до канонічної вулиці іншого джерела
+                    object_id = self.street_merges[object_id]
+                    self._count('merged_streets')
+                results[index][level] = object_id
+                if key in created:
+                    created.discard(key)
+                else:
+                    self._count(f"duplicate_{spec['stat']}")
+
+        return results
+
+    def _resolve_pending(self, spec: dict, pending: dict, dry_run: bool,
+                         update: bool = False) -> set:
+        """Пошук та створення відсутніх об'єктів одного рівня; повертає створені ключі"""
+        level = spec['level']
+
+        if dry_run or not self.cursor:
+            for key in pending:
+                self._dry_run_ids[level] += 1
+                self.cache[level][key] = self._dry_run_ids[level]
+            self._count(f"created_{spec['stat']}", len(pending))
+            return set(pending)
+
+        if update and not spec['preload']:
+            existing = self._select_existing(spec, pending, with_rows=True)
+            self._update_existing(spec, pending, existing)
+        else:
+            self._select_existing(spec, pending)
+        missing = {key: item for key, item in pending.items() if key not in self.cache[level]}
+        if not missing:
+            return set()
+
+        created = self._insert_missing(spec, missing)
+
+        # Об'єкти, вставлені паралельно іншим процесом (ON CONFLICT DO NOTHING)
+        leftovers = {key: item for key, item in missing.items() if key not in self.cache[level]}
+        if leftovers:
+            self._select_existing(spec, leftovers)
+
+        if level == 'street' and created:
+            self._insert_street_names(created, missing)
+        self._collect_snapshot_names(level, created, missing)
+
+        self._count(f"created_{spec['stat']}", len(created))
+        return set(created)
+
+    def _collect_snapshot_names(self, level: str, created: Dict[tuple, int], missing: dict):
+        """Назви щойно створених об'єктів для інкрементального оновлення знімка"""
+        if level == 'street':
+            for key in created:
+                self._pending_names.extend(
+                    ('street', name) for name, is_current, _ in missing[key][2].get('names', [])
+                    if is_current
+                )
+        elif level in SNAPSHOT_COLUMNS:
+            object_type, columns = SNAPSHOT_COLUMNS[level]
+            for key in created:
+                values = missing[key][1]
+                self._pending_names.extend(
+                    (object_type, values[column]) for column in columns if values.get(column)
+                )
+
+    def _select_existing(self, spec: dict, pending: dict, with_rows: bool = False) -> Dict[tuple, dict]:
+        """Пошук існуючих об'єктів одним запитом на набір ключових колонок
+
+        with_rows=True - вибираються всі колонки, повертається ключ -> рядок БД.
+        """
+        existing = {}
+        groups = {}
+        for key, (lookup, _, _) in pending.items():
+            groups.setdefault(tuple(sorted(lookup)), []).append(key)
+
+        for columns, keys in groups.items():
+            values = tuple(tuple(pending[key][0][column] for column in columns) for key in keys)
+            select_columns = '*' if with_rows else f"id, {', '.join(columns)}"
+            self.cursor.execute(
+                f"SELECT {select_columns} FROM addrinity.{spec['table']} "
+                f"WHERE ({', '.join(columns)}) IN %s",
+                (values,)
+            )
+            names = [column[0] for column in self.cursor.description]
+            for row in self.cursor.fetchall():
+                row = dict(zip(names, row))
+                key = self.cache_key({column: row[column] for column in columns})
+                self.cache[spec['level']].setdefault(key, row['id'])
+                existing.setdefault(key, row)
+
+        return existing
+
+    @staticmethod
+    def _same_value(current, new) -> bool:
+        """Порівняння значення з БД та з джерела (типи можуть відрізнятися: 5 і '5')"""
+        if current is None or new is None:
+            return current is None and new is None
+        return str(current) == str(new)
+
+    def _update_existing(self, spec: dict, pending: dict, existing: Dict[tuple, dict]):
+        """Оновлення на місці змінених колонок та назв існуючих об'єктів"""
+        updates = {}
+        for key, row in existing.items():
+            lookup, values, _ = pending[key]
+            changes = {column: value for column, value in values.items()
+                       if column not in lookup and column in row
+                       and not self._same_value(row[column], value)}
+            if changes:
+                columns = tuple(sorted(changes))
+                updates.setdefault(columns, []).append(
+                    tuple(changes[column] for column in columns) + (row['id'],)
+                )
+
+        for columns, rows in updates.items():
+            execute_batch(
+                self.cursor,
+                f"UPDATE addrinity.{spec['table']} "
+                f"SET {', '.join(f'{column} = %s' for column in columns)} WHERE id = %s",
+                rows
+            )
+            self._count(f"updated_{spec['stat']}", len(rows))
+
+        if spec['level'] == 'street' and existing:
+            self._update_street_names(
+                {row['id']: pending[key][2].get('names', []) for key, row in existing.items()}
+            )
+
+    def _update_street_names(self, names_by_street: Dict[int, list]):
+        """Синхронізація назв існуючих вулиць: нова поточна назва, попередня стає старою"""
+        self.cursor.execute(
+            """
+            SELECT id, street_entity_id, name, is_current
+            FROM addrinity.street_names
+            WHERE street_entity_id = ANY(%s)
+            """,
+            (list(names_by_street),)
+        )
+        stored = {}
+        for name_id, street_entity_id, name, is_current in self.cursor.fetchall():
+            stored.setdefault(street_entity_id, {})[name] = (name_id, is_current)
+
+        retire, promote, insert = [], [], []
+        for street_entity_id, names in names_by_street.items():
+            known = stored.get(street_entity_id, {})
+            current = [name for name, is_current, _ in names if is_current]
+            if current and not (current[0] in known and known[current[0]][1]):
+                retire.append((street_entity_id, current[0]))
+                if current[0] in known:
+                    promote.append((known[current[0]][0],))
+                else:
+                    insert.append((street_entity_id, current[0], 'uk', True, 'current',
+                                   phonetic_key(current[0])))
+                self._pending_names.append(('street', current[0]))
+            for name, is_current, name_type in names:
+                if not is_current and name not in known:
+                    insert.append((street_entity_id, name, 'uk', False, name_type, phonetic_key(name)))
+
+        if retire:
+            execute_batch(
+                self.cursor,
+                """
+                UPDATE addrinity.street_names
+                SET is_current = FALSE, name_type = 'old', valid_to = CURRENT_DATE
+                WHERE street_entity_id = %s AND is_current AND name <> %s
+                """,
+                retire
+            )
+            self._count('updated_street_names', len(retire))
+        if promote:
+            execute_batch(
+                self.cursor,
+                """
+                UPDATE addrinity.street_names
+                SET is_current = TRUE, name_type = 'current', valid_from = CURRENT_DATE, valid_to = NULL
+                WHERE id = %s
+                """,
+                promote
+            )
+        if insert:
+            execute_values(
+                self.cursor,
+                """
+                INSERT INTO addrinity.street_names
+                (street_entity_id, name, language_code, is_current, name_type, phonetic_key)
+                VALUES %s
+                """,
+                insert
+            )
+
+    def _insert_missing(self, spec: dict, missing: dict) -> Dict[tuple, int]:
+        """Пакетна вставка відсутніх об'єктів; повертає ключ -> новий ID"""
+        level = spec['level']
+        created = {}
+
+        groups = {}
+        for key, (lookup, values, _) in missing.items():
+            groups.setdefault((tuple(sorted(lookup)), tuple(sorted(values))), []).append(key)
+
+        for (key_columns, columns), keys in groups.items():
+            rows = [tuple(missing[key][1][column] for column in columns) for key in keys]
+            returned = execute_values(
+                self.cursor,
+                f"INSERT INTO addrinity.{spec['table']} ({', '.join(columns)}) VALUES %s "
+                f"ON CONFLICT DO NOTHING RETURNING id, {', '.join(key_columns)}",
+                rows,
+                fetch=True
+            )
+            for row in returned:
+                key = self.cache_key(dict(zip(key_columns, row[1:])))
+                self.cache[level][key] = row[0]
+                created[key] = row[0]
+                self._pending_created.append((level, key))
+
+        return created
+
+    def _insert_street_names(self, created: Dict[tuple, int], missing: dict):
+        """Назви (поточна та старі) для щойно створених вулиць"""
+        rows = []
+        for key, street_entity_id in created.items():
+            for name, is_current, name_type in missing[key][2].get('names', []):
+                rows.append((street_entity_id, name, 'uk', is_current, name_type, phonetic_key(name)))
+
+        if rows:
+            execute_values(
+                self.cursor,
+                """
+                INSERT INTO addrinity.street_names
+                (street_entity_id, name, language_code, is_current, name_type, phonetic_key)
+                VALUES %s
+                """,
+                rows
+            )
+
+    def backfill_phonetic_keys(self, batch_size: int = 5000) -> int:
+        """Заповнення phonetic_key для рядків, створених до появи колонки; повертає кількість"""
+        total = 0
+        for table, (name_column, object_type) in PHONETIC_KEY_TABLES.items():
+            self.cursor.execute(
+                f"SELECT id, {name_column} FROM addrinity.{table} "
+                f"WHERE phonetic_key IS NULL AND {name_column} IS NOT NULL"
+            )
+            rows = [(phonetic_key(name, object_type), row_id) for row_id, name in self.cursor.fetchall()]
+            execute_batch(
+                self.cursor,
+                f"UPDATE addrinity.{table} SET phonetic_key = %s WHERE id = %s",
+                rows,
+                page_size=batch_size
+            )
+            self._count(f"phonetic_keys_{table}", len(rows))
+            total += len(rows)
+
+        self.connection.commit()
+        self.logger.info(f"Фонетичні ключі заповнено: {total} рядків")
+        return total
+
+    def backfill_building_numbers(self, batch_size: int = 5000) -> int:
+        """Заповнення канонічних колонок номерів для будівель, створених до їх появи"""
+        self.cursor.execute(
+            "SELECT id, number, corpus FROM addrinity.buildings WHERE number_canonical IS NULL"
+        )
+        columns = ('number_int', 'number_letter', 'number_fraction', 'number_corpus', 'number_canonical')
+        rows = []
+        for row_id, number, corpus in self.cursor.fetchall():
+            values = building_number_columns(number, corpus)
+            rows.append(tuple(values[column] for column in columns) + (row_id,))
+
+        execute_batch(
+            self.cursor,
+            f"UPDATE addrinity.buildings SET {', '.join(f'{column} = %s' for column in columns)} "
+            f"WHERE id = %s",
+            rows,
+            page_size=batch_size
+        )
+        self.data_version.bump(self.cursor)
+        self.connection.commit()
+        self._count('canonical_building_numbers', len(rows))
+        self.logger.info(f"Канонічні номери будівель заповнено: {len(rows)} рядків")
+        return len(rows)
+
+    def save_object_sources(self, items: List[tuple], source_id: int, dry_run: bool = False,
+                            update: bool = False):
+        """Пакетне збереження зв'язків об'єктів з джерелом (object_type, object_id, original_data)"""
+        items = [item for item in items if item[1]]
+        if dry_run or not self.cursor or not items:
+            return
+
+        rows = [(object_type, object_id, source_id,
+                 json.dumps(original_data, ensure_ascii=False, default=str))
+                for object_type, object_id, original_data in items]
+
+        if update:
+            execute_values(
+                self.cursor,
+                """
+                UPDATE addrinity.object_sources os
+                SET original_data = v.original_data::jsonb
+                FROM (VALUES %s) AS v(object_type, object_id, source_id, original_data)
+                WHERE os.object_type = v.object_type
+                AND os.object_id = v.object_id
+                AND os.source_id = v.source_id
+                """,
+                rows
+            )
+
+        execute_values(
+            self.cursor,
+            """
+            INSERT INTO addrinity.object_sources (object_type, object_id, source_id, original_data)
+            SELECT v.object_type, v.object_id, v.source_id, v.original_data::jsonb
+            FROM (VALUES %s) AS v(object_type, object_id, source_id, original_data)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM addrinity.object_sources os
+                WHERE os.object_type = v.object_type
+                AND os.object_id = v.object_id
+                AND os.source_id = v.source_id
+            )
+            """,
+            rows
+        )
+
+    def commit(self):
+        """Фіксація транзакції пачки (разом з новою версією даних) та доповнення знімка кандидатів"""
+        if self.connection is not None:
+            self.data_version.bump(self.cursor)
+            self.connection.commit()
+        self._pending_created = []
+
+        names_by_type = {}
+        for object_type, name in self._pending_names:
+            names_by_type.setdefault(object_type, []).append(name)
+        for object_type, names in names_by_type.items():
+            self.snapshot.add(object_type, names)
+        self._pending_names = []
+
+    def rollback(self):
+        """Відкат транзакції та видалення з кешу ID, які не були зафіксовані"""
+        if self.connection is not None:
+            self.connection.rollback()
+        for level, key in self._pending_created:
+            self.cache[level].pop(key, None)
+        self._pending_created = []
+        self._pending_names = []
+
+    def process_batch(self, adapter, rows: list, source_id: int, dry_run: bool = False,
+                      enrich=None, update: bool = False) -> int:
+        """Обробка пачки рядків джерела однією транзакцією; повертає кількість оброблених
+
+        enrich(row, original_data) - необов'язкове доповнення оригінальних даних
+        (наприклад, результатом валідації) перед збереженням.
+        update=True - зміни існуючих об'єктів записуються на місці (дельта-міграція).
+        Лічильники: invalid - рядки, відхилені адаптером (ValueError); failed - записи,
+        які не вдалося зберегти навіть поодинці (помилки БД); errors - усі помилки разом.
+        Відкочена пачка, рядки якої збереглися поодинці, збоєм не рахується.
+        """
+        hierarchies = []
+        for row in rows:
+            try:
+                hierarchy = adapter.to_hierarchy(row)
+                if hierarchy is None:
+                    self._count('skipped')
+            except ValueError as e:
+                # Невалідний рядок джерела: рахується окремо від збоїв запису (failed)
+                hierarchy = None
+                self._count('errors')
+                self._count('invalid')
+                self.logger.debug(f"Невалідний запис {adapter.source_name}: {e}")
+            hierarchies.append(hierarchy)
+
+        stats_before = dict(self.stats)
+        try:
+            resolved = self.resolve_batch(hierarchies, dry_run, update)
+
+            sources = []
+            for row, ids in zip(rows, resolved):
+                if ids is None:
+                    continue
+                object_type, object_id = adapter.primary_object(row, ids)
+                original_data = adapter.original_data(row)
+                if enrich:
+                    enrich(row, original_data)
+                sources.append((object_type, object_id, original_data))
+
+            self.save_object_sources(sources, source_id, dry_run, update)
+            if not dry_run:
+                self.commit()
+
+            self._count('processed', len(sources))
+            return len(sources)
+
+        except Exception as e:
+            self.rollback()
+            self.stats.clear()
+            self.stats.update(stats_before)
+            if len(rows) == 1:
+                # Запис не зберігся і поодинці - дельта-міграція не зсуває high-water mark
+                self._count('failed')
+                self._count('errors')
+                self.logger.error(f"Помилка обробки запису {adapter.source_name}: {e}")
+                return 0
+
+            # Пачка відкочена - обробляємо рядки поодинці, щоб ізолювати проблемний
+            self.logger.warning(f"Помилка пачки {adapter.source_name} ({e}), обробка поодинці")
+            return sum(
+                self.process_batch(adapter, [row], source_id, dry_run, enrich, update)
+                for row, hierarchy in zip(rows, hierarchies) if hierarchy is not None
+            )
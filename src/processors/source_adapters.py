@@ -0,0 +1,392 @@
+"""Адаптери джерел: перетворення рядків bld_local, ek_addr, rtg_addr в ієрархію addrinity
+
+Адаптер нічого не знає про БД - він лише описує, які об'єкти ієрархії
+стоять за рядком джерела. Пошук, кешування та вставку виконує
+HierarchyResolver (src/processors/hierarchy_resolver.py).
+
+Формат ієрархії: словник рівень -> вузол, де вузол має
+    'key'    - природний ключ для пошуку існуючого об'єкта
+    'values' - додаткові колонки, які записуються при створенні
+    'names'  - (лише для вулиць) список (назва, is_current, name_type)
+"""
+
+import re
+from typing import Dict, Optional, Tuple
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+# Базова ієрархія Дніпра, яку використовують bld_local та ek_addr
+DNIPRO_HIERARCHY = {
+    'country': ('UA', 'Україна'),
+    'region': 'Дніпропетровська область',
+    'district': 'Дніпровський район',
+    'community': ('Дніпровська міська громада', 'міська'),
+    'city': ('Дніпро', 'м.'),
+}
+
+STREET_TYPE_MAPPING = {
+    'вул.': 'вулиця', 'вул': 'вулиця',
+    'просп.': 'проспект', 'просп': 'проспект',
+    'бул.': 'бульвар', 'бул': 'бульвар',
+    'пров.': 'провулок', 'пров': 'провулок',
+    'ш.': 'шосе', 'ш': 'шосе',
+    'туп.': 'тупик', 'туп': 'тупик',
+    'майд.': 'майдан', 'майд': 'майдан',
+    'ал.': 'алея', 'ал': 'алея',
+    'наб.': 'набережна', 'наб': 'набережна',
+    'пл.': 'площа', 'пл': 'площа',
+    'ж/м': 'житловий масив',
+}
+
+STREET_TYPE_SHORT_NAMES = {
+    'вулиця': 'вул.',
+    'проспект': 'просп.',
+    'бульвар': 'бул.',
+    'провулок': 'пров.',
+    'шосе': 'ш.',
+    'тупик': 'туп.',
+    'майдан': 'майд.',
+    'алея': 'ал.',
+    'набережна': 'наб.',
+    'площа': 'пл.',
+    'житловий масив': 'ж/м',
+}
+
+# Позиції ідентифікаторів у rtg_addr.path: країна.регіон.район.місто.вулиця.будівля.приміщення
+RTG_PATH_LEVELS = ('country', 'region', 'district', 'city', 'street', 'building', 'premise')
+
+
+def clean_value(value):
+    """Очищення значення з джерела (None, NaN, '[NULL]', зайві пробіли)"""
+    if value is None:
+        return None
+    if pd is not None and not isinstance(value, str):
+        try:
+            if pd.isna(value):
+                return None
+        except (TypeError, ValueError):
+            pass
+    text = re.sub(r'\s+', ' ', str(value)).strip()
+    if not text or text == '[NULL]':
+        return None
+    return text
+
+
+def parse_int(value):
+    """Перетворення ідентифікатора джерела в int (з урахуванням пробілів-розділювачів)"""
+    text = clean_value(value)
+    if text is None:
+        return None
+    text = text.replace(' ', '').replace('\xa0', '')
+    if text.endswith('.0'):
+        text = text[:-2]
+    return int(text) if text.isdigit() else None
+
+
+def normalize_street_type(type_name: str, default: str = 'вулиця') -> str:
+    """Нормалізація типу вулиці до повної форми (вул. -> вулиця)"""
+    text = clean_value(type_name)
+    if not text:
+        return default
+    text = text.lower()
+    return STREET_TYPE_MAPPING.get(text, text)
+
+
+def short_street_type(full_type: str) -> str:
+    """Скорочена назва типу вулиці"""
+    return STREET_TYPE_SHORT_NAMES.get(full_type.lower(), full_type[:4] + '.')
+
+
+def normalize_district_name(text: str, lowercase: bool = False) -> Optional[str]:
+    """Нормалізація назви району міста (без слова 'район' та префікса 'м.')"""
+    text = clean_value(text)
+    if not text:
+        return None
+    text = re.sub(r'\s*район$', '', text, flags=re.IGNORECASE).strip()
+    text = re.sub(r'^м\.', '', text, flags=re.IGNORECASE).strip()
+    return text.lower() if lowercase else text
+
+
+class SourceAdapter:
+    """Базовий адаптер джерела даних"""
+
+    source_name = None
+    source_description = None
+
+    def to_hierarchy(self, row) -> Optional[Dict[str, dict]]:
+        """Ієрархія для рядка; None - рядок пропускається, ValueError - невалідний рядок"""
+        raise NotImplementedError
+
+    def primary_object(self, row, ids: Dict[str, int]) -> Tuple[str, Optional[int]]:
+        """Тип та ID найнижчого об'єкта, з яким пов'язується джерело"""
+        for level, object_type in (('premise', 'premise'), ('building', 'building'),
+                                   ('street', 'street'), ('city', 'city')):
+            if ids.get(level):
+                return object_type, ids[level]
+        return 'city', None
+
+    def original_data(self, row) -> dict:
+        """Оригінальні дані рядка для addrinity.object_sources"""
+        return {key: clean_value(value) for key, value in dict(row).items()}
+
+    @staticmethod
+    def dnipro_hierarchy(source_values: Dict[str, dict] = None) -> Dict[str, dict]:
+        """Вузли базової ієрархії Дніпра з колонками конкретного джерела"""
+        source_values = source_values or {}
+        iso_code, country_name = DNIPRO_HIERARCHY['country']
+        community_name, community_type = DNIPRO_HIERARCHY['community']
+        city_name, city_type = DNIPRO_HIERARCHY['city']
+        return {
+            'country': {'key': {'iso_code': iso_code},
+                        'values': {'name_uk': country_name, **source_values.get('country', {})}},
+            'region': {'key': {'name_uk': DNIPRO_HIERARCHY['region']},
+                       'values': source_values.get('region', {})},
+            'district': {'key': {'name_uk': DNIPRO_HIERARCHY['district']},
+                         'values': source_values.get('district', {})},
+            'community': {'key': {'name_uk': community_name},
+                          'values': {'type': community_type, **source_values.get('community', {})}},
+            'city': {'key': {'name_uk': city_name},
+                     'values': {'type': city_type, **source_values.get('city', {})}},
+        }
+
+    @staticmethod
+    def street_type_node(type_name: str, code_column: str) -> dict:
+        """Вузол типу вулиці з оригінальним кодом джерела"""
+        normalized_type = normalize_street_type(type_name)
+        return {
+            'key': {'name_uk': normalized_type},
+            'values': {
+                'short_name_uk': short_street_type(normalized_type),
+                code_column: clean_value(type_name) or normalized_type,
+            },
+        }
+
+
+class RtgAddrAdapter(SourceAdapter):
+    """Адаптер addr.rtg_addr (дамп migrations/DATA-TrinitY-3.txt або таблиця БД)"""
+
+    source_name = 'rtg_addr'
+    source_description = 'Міграція з addr.rtg_addr (файл migrations/DATA-TrinitY-3.txt)'
+
+    def parse_path(self, path) -> Dict[str, Optional[int]]:
+        """Ідентифікатори рівнів з rtg_addr.path"""
+        parts = [parse_int(part) for part in str(path).split('.')] if path else []
+        return {level: parts[i] if i < len(parts) else None
+                for i, level in enumerate(RTG_PATH_LEVELS)}
+
+    def to_hierarchy(self, record) -> Optional[Dict[str, dict]]:
+        path = clean_value(record.get('path'))
+        city = clean_value(record.get('city'))
+        if not path or not city:
+            return None
+
+        ids = self.parse_path(path)
+        region = clean_value(record.get('region'))
+        district = clean_value(record.get('district'))
+        community = clean_value(record.get('community'))
+        if not region:
+            raise ValueError("Назва регіону обов'язкова")
+        if not district:
+            raise ValueError("Назва району обов'язкова")
+        if not community:
+            raise ValueError("Назва громади обов'язкова")
+
+        hierarchy = {
+            'country': {'key': {'iso_code': 'UA'},
+                        'values': {'name_uk': 'Україна', 'rtg_country_id': str(ids['country'])}},
+            'region': {'key': {'name_uk': region}, 'values': {'rtg_region_id': ids['region']}},
+            'district': {'key': {'name_uk': district}, 'values': {'rtg_district_id': ids['district']}},
+            'community': {'key': {'name_uk': community},
+                          'values': {'type': 'міська' if 'міська' in community.lower() else 'сільська'}},
+            'city': {'key': {'name_uk': city},
+                     'values': {'type': clean_value(record.get('city_type')) or 'м.',
+                                'rtg_city_id': ids['city']}},
+        }
+
+        city_district = normalize_district_name(record.get('city_district'))
+        if city_district:
+            hierarchy['city_district'] = {'key': {'name_uk': city_district},
+                                          'values': {'type': 'адміністративний'}}
+
+        street = clean_value(record.get('street'))
+        if street and ids['street']:
+            hierarchy['street_type'] = self.street_type_node(record.get('street_type'), 'rtg_type_code')
+            names = [(street, True, 'current')]
+            street_old = clean_value(record.get('street_old'))
+            if street_old and street_old != street:
+                names.append((street_old, False, 'old'))
+            hierarchy['street'] = {
+                'key': {'rtg_street_id': ids['street']},
+                'values': {'rtg_path': '.'.join(str(part) for part in path.split('.')[:5])},
+                'names': names,
+            }
+
+        building = clean_value(record.get('building'))
+        if building and ids['building']:
+            hierarchy['building'] = {
+                'key': {'rtg_building_id': ids['building']},
+                'values': {'number': building, 'corpus': clean_value(record.get('corp'))},
+            }
+
+        flat = clean_value(record.get('flat'))
+        room = clean_value(record.get('room'))
+        if (flat or room) and ids['premise'] and 'building' in hierarchy:
+            hierarchy['premise'] = {
+                'key': {'rtg_premise_id': ids['premise']},
+                'values': {
+                    'number': flat or room,
+                    'type': 'квартира' if flat else 'кімната',
+                    'floor': clean_value(record.get('floor')),
+                    'entrance': clean_value(record.get('entrance')),
+                },
+            }
+
+        return hierarchy
+
+
+class BldLocalAdapter(SourceAdapter):
+    """Адаптер addr.bld_local"""
+
+    source_name = 'bld_local'
+    source_description = 'Локальна таблиця будівель (bld_local)'
+
+    def extract_street_from_address(self, address):
+        """Витяг назви вулиці з адресного рядка ('192 КІРОВА ВУЛ.' -> 'КІРОВА')"""
+        address = clean_value(address)
+        if not address:
+            return None
+
+        parts = address.split()
+        if len(parts) > 2:
+            # Видаляємо перший (номер будинку) і останній (тип вулиці) елементи
+            return ' '.join(parts[1:-1])
+        elif len(parts) == 2:
+            return parts[1]
+        return address
+
+    def is_valid_record(self, row):
+        """Валідація запису"""
+        if not clean_value(row['objectid']):
+            return False, "Відсутній objectid"
+
+        if not clean_value(row['adres_n_uk']) and not clean_value(row['adres_o_uk']):
+            return False, "Відсутні адреси"
+
+        if not clean_value(row['street_ukr']):
+            return False, "Відсутня назва вулиці"
+
+        if not clean_value(row['raion']):
+            return False, "Відсутній район"
+
+        return True, "OK"
+
+    def to_hierarchy(self, row) -> Optional[Dict[str, dict]]:
+        is_valid, message = self.is_valid_record(row)
+        if not is_valid:
+            raise ValueError(message)
+
+        hierarchy = self.dnipro_hierarchy({
+            'country': {'bld_local_country_code': 'UA'},
+            'region': {'bld_local_region_key': 'dnipropetrovsk'},
+            'district': {'bld_local_district_key': 'dnipro_district'},
+            'community': {'bld_local_community_key': 'dnipro_community'},
+            'city': {'bld_local_city_key': 'dnipro_city'},
+        })
+
+        raion = clean_value(row['raion'])
+        hierarchy['city_district'] = {
+            'key': {'name_uk': normalize_district_name(raion, lowercase=True)},
+            'values': {'type': 'адміністративний', 'bld_local_raion_name': raion},
+        }
+        hierarchy['street_type'] = self.street_type_node(row['type_ukr'] or 'ВУЛ.', 'bld_local_type_code')
+
+        street_name = clean_value(row['street_ukr'])
+        names = [(street_name, True, 'current')]
+        old_street = self.extract_street_from_address(row['adres_o_uk'])
+        if old_street and old_street != street_name:
+            names.append((old_street, False, 'old'))
+
+        objectid = parse_int(row['objectid'])
+        hierarchy['street'] = {
+            'key': {'bld_local_objectid': objectid},
+            'values': {'bld_local_id_street_rtg': parse_int(row['id_street_rtg'])},
+            'names': names,
+        }
+        hierarchy['building'] = {
+            'key': {'bld_local_objectid': objectid},
+            'values': {'number': clean_value(row['l']) or '',
+                       'bld_local_id_bld_rtg': parse_int(row['id_bld_rtg'])},
+        }
+        return hierarchy
+
+    def primary_object(self, row, ids):
+        return 'building', ids.get('building')
+
+    def original_data(self, row) -> dict:
+        return {
+            'objectid': parse_int(row['objectid']),
+            'adres_n_uk': clean_value(row['adres_n_uk']),
+            'adres_o_uk': clean_value(row['adres_o_uk']),
+            'raion': clean_value(row['raion']) or 'Невідомий',
+            'street_ukr': clean_value(row['street_ukr']),
+            'building_number': clean_value(row['l']) or '',
+        }
+
+
+class EkAddrAdapter(SourceAdapter):
+    """Адаптер addr.ek_addr"""
+
+    source_name = 'ek_addr'
+    source_description = 'Таблиця адрес ЕК (addr.ek_addr)'
+
+    def create_ek_addr_key(self, row):
+        """Створення унікального ключа для ek_addr запису"""
+        key_parts = [row['district'], row['street_type'], row['street'], row['build'], row['corp']]
+        return '|'.join(str(part) for part in (clean_value(p) for p in key_parts) if part)
+
+    def to_hierarchy(self, row) -> Optional[Dict[str, dict]]:
+        street = clean_value(row['street'])
+        build = clean_value(row['build'])
+        if not street and not build:
+            raise ValueError("Відсутня вулиця та будівля")
+
+        hierarchy = self.dnipro_hierarchy({'city': {'ek_addr_city_key': 'dnipro_city'}})
+
+        district = normalize_district_name(row['district'], lowercase=True)
+        if district:
+            hierarchy['city_district'] = {
+                'key': {'name_uk': district},
+                'values': {'type': 'адміністративний',
+                           'ek_addr_district_name': clean_value(row['district'])},
+            }
+        hierarchy['street_type'] = self.street_type_node(row['street_type'], 'ek_addr_type_code')
+
+        if street:
+            hierarchy['street'] = {
+                'key': {'ek_addr_street_key': f"ek_{street}_{clean_value(row['street_type'])}"},
+                'values': {},
+                'names': [(street, True, 'current')],
+            }
+
+        ek_addr_key = self.create_ek_addr_key(row)
+        if build:
+            hierarchy['building'] = {
+                'key': {'ek_addr_building_key': ek_addr_key},
+                'values': {'number': build, 'corpus': clean_value(row['corp'])},
+            }
+            flat = clean_value(row['flat'])
+            if flat:
+                hierarchy['premise'] = {
+                    'key': {'ek_addr_premise_key': f"{ek_addr_key}_{flat}"},
+                    'values': {'number': flat, 'type': 'квартира'},
+                }
+
+        return hierarchy
+
+    def original_data(self, row) -> dict:
+        return {field: clean_value(row[field])
+                for field in ('district', 'street_type', 'street', 'build', 'corp', 'flat')}
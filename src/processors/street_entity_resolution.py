@@ -0,0 +1,333 @@
+"""Офлайн-зіставлення вулиць між джерелами (entity resolution з блокуванням)
+
+Одна й та сама вулиця з bld_local, ek_addr та rtg_addr потрапляє в три різні
+street_entities. Етап зіставлення:
+  1. завантажує всі вулиці з поточними назвами одним запитом;
+  2. згортає вулиці джерел, де сутність вулиці створюється на кожен рядок
+     (COLLAPSED_SOURCES: bld_local - на кожну будівлю), в одну на
+     (місто, джерело, тип, назву); решта сутностей групи зливається з нею;
+  3. розкладає згорнуті вулиці по блоках: (місто, фонетичний ключ) та
+     (місто, рідкісна триграма);
+  4. порівнює компаратором лише пари з різних джерел усередині блоку;
+  5. об'єднує пари вище порогу (union-find, від найсхожіших). Кластер містить не
+     більше однієї вулиці кожного джерела: пара, яка через третю вулицю
+     (rtg A ~ bld X ~ rtg B) злила б дві вулиці одного джерела, відкидається;
+  6. записує карту злиття addrinity.street_entity_merges (HierarchyResolver
+     застосовує її до наступних завантажень) і тією ж транзакцією переносить на
+     канонічні вулиці вже завантажені будівлі, назви та посилання object_sources.
+
+Великі блоки (поширені триграми) відкидаються, тому кількість порівнянь
+росте майже лінійно з кількістю вулиць.
+
+Дублікати, перенесені попереднім запуском, назв уже не мають і в зіставленні не
+беруть участі; їхні записи в карті злиття зберігаються, щоб мігратори й далі
+прив'язували ключі джерела до канонічної вулиці.
+"""
+
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from psycopg2.extras import execute_values
+except ImportError:
+    execute_values = None
+
+try:
+    from src.utils.data_version import get_data_version
+    from src.utils.phonetics import ukrainian_phonetic_key
+    from src.utils.trigrams import trigrams
+except ImportError:
+    import os
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
+    from data_version import get_data_version
+    from phonetics import ukrainian_phonetic_key
+    from trigrams import trigrams
+
+
+# Пріоритет джерел при виборі канонічної вулиці (менше - важливіше)
+SOURCE_PRIORITY = {'rtg_addr': 0, 'bld_local': 1, 'ek_addr': 2}
+
+# Джерела без ідентифікатора вулиці: сутність вулиці створюється на кожен рядок
+# (bld_local - на objectid будівлі), тож однойменні вулиці джерела в місті - одна вулиця.
+# У rtg_addr однойменні вулиці міста - різні об'єкти реєстру.
+COLLAPSED_SOURCES = {'bld_local', 'ek_addr'}
+
+STREETS_QUERY = """
+    SELECT se.id, se.city_id, se.type_id,
+           CASE
+               WHEN se.rtg_street_id IS NOT NULL OR se.rtg_path IS NOT NULL THEN 'rtg_addr'
+               WHEN se.bld_local_objectid IS NOT NULL THEN 'bld_local'
+               WHEN se.ek_addr_street_key IS NOT NULL THEN 'ek_addr'
+           END AS source,
+           sn.name
+    FROM addrinity.street_entities se
+    JOIN addrinity.street_names sn ON sn.street_entity_id = se.id AND sn.is_current = TRUE
+"""
+
+# Попередні записи вулиць, що брали участь у зіставленні (решта - вже перенесені дублікати)
+DELETE_MERGES_QUERY = """
+    DELETE FROM addrinity.street_entity_merges m
+    USING addrinity.street_names sn
+    WHERE sn.street_entity_id = m.street_entity_id AND sn.is_current = TRUE
+"""
+
+# Канонічна вулиця сама стала дублікатом - старі записи ведуть одразу до нової
+FLATTEN_MERGES_QUERY = """
+    UPDATE addrinity.street_entity_merges m
+    SET canonical_id = n.canonical_id
+    FROM addrinity.street_entity_merges n
+    WHERE m.canonical_id = n.street_entity_id
+"""
+
+# Перенесення вже завантажених даних дублікатів на канонічні вулиці
+REPOINT_BUILDINGS_QUERY = """
+    UPDATE addrinity.buildings b
+    SET street_entity_id = m.canonical_id
+    FROM addrinity.street_entity_merges m
+    WHERE b.street_entity_id = m.street_entity_id
+"""
+
+REPOINT_SOURCES_QUERY = """
+    UPDATE addrinity.object_sources os
+    SET object_id = m.canonical_id
+    FROM addrinity.street_entity_merges m
+    WHERE os.object_type = 'street' AND os.object_id = m.street_entity_id
+"""
+
+# Назва дубліката, якої канонічна вулиця ще не має, переходить до неї не поточною
+# (по одній на написання); решта назв дублікатів видаляється
+MOVE_NAMES_QUERY = """
+    UPDATE addrinity.street_names sn
+    SET street_entity_id = moved.canonical_id,
+        is_current = FALSE,
+        name_type = CASE WHEN sn.is_current THEN 'alternative' ELSE sn.name_type END
+    FROM (
+        SELECT DISTINCT ON (m.canonical_id, lower(n.name)) n.id, m.canonical_id
+        FROM addrinity.street_names n
+        JOIN addrinity.street_entity_merges m ON n.street_entity_id = m.street_entity_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM addrinity.street_names c
+            WHERE c.street_entity_id = m.canonical_id AND lower(c.name) = lower(n.name)
+        )
+        ORDER BY m.canonical_id, lower(n.name), n.is_current DESC, n.id
+    ) moved
+    WHERE sn.id = moved.id
+"""
+
+DELETE_NAMES_QUERY = """
+    DELETE FROM addrinity.street_names sn
+    USING addrinity.street_entity_merges m
+    WHERE sn.street_entity_id = m.street_entity_id
+"""
+
+REPOINT_QUERIES = (FLATTEN_MERGES_QUERY, REPOINT_BUILDINGS_QUERY, REPOINT_SOURCES_QUERY,
+                   MOVE_NAMES_QUERY, DELETE_NAMES_QUERY)
+
+
+class StreetEntityResolver:
+    """Пошук дублікатів вулиць між джерелами та запис карти злиття"""
+
+    def __init__(self, connection=None, logger: logging.Logger = None, comparator=None,
+                 threshold: float = 0.9, trigram_keys: int = 2, max_block_size: int = 50,
+                 data_version=None):
+        self.connection = connection
+        self.cursor = connection.cursor() if connection is not None else None
+        self.logger = logger or logging.getLogger('AddrinityMigration')
+        self.comparator = comparator
+        self.threshold = threshold
+        self.trigram_keys = trigram_keys
+        self.max_block_size = max_block_size
+        self.data_version = data_version or get_data_version()
+        self.stats = {
+            'streets': 0,
+            'collapsed_streets': 0,
+            'blocks': 0,
+            'oversized_blocks': 0,
+            'candidate_pairs': 0,
+            'matched_pairs': 0,
+            'conflicting_pairs': 0,
+            'merged_streets': 0,
+        }
+
+    def load_streets(self) -> List[dict]:
+        """Вулиці з поточною назвою: id, city_id, type_id, source, name"""
+        self.cursor.execute(STREETS_QUERY)
+        columns = [column[0] for column in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+
+    def collapse(self, streets: List[dict]) -> Tuple[List[dict], List[List[int]]]:
+        """Одна вулиця на (місто, джерело, тип, назву) для COLLAPSED_SOURCES; id сутностей кожної"""
+        groups = {}
+        collapsed, members = [], []
+        for street in streets:
+            if street['source'] in COLLAPSED_SOURCES:
+                key = (street['city_id'], street['source'], street['type_id'],
+                       ' '.join(street['name'].split()).lower())
+            else:
+                key = ('id', street['id'])
+            if key in groups:
+                index = groups[key]
+                members[index].append(street['id'])
+                if street['id'] < collapsed[index]['id']:
+                    collapsed[index] = street
+            else:
+                groups[key] = len(collapsed)
+                collapsed.append(street)
+                members.append([street['id']])
+        return collapsed, members
+
+    def blocking_keys(self, streets: List[dict]) -> Dict[tuple, List[int]]:
+        """Блоки кандидатів: ключ блоку -> індекси вулиць"""
+        street_trigrams = [trigrams(ukrainian_phonetic_key(street['name'])) for street in streets]
+        document_frequency = Counter(gram for grams in street_trigrams for gram in grams)
+
+        blocks = defaultdict(list)
+        for index, street in enumerate(streets):
+            phonetic_key = ukrainian_phonetic_key(street['name'])
+            if phonetic_key:
+                blocks[('phonetic', street['city_id'], phonetic_key)].append(index)
+
+            # Найрідкісніші триграми - ловлять одруківки, які змінюють фонетичний ключ
+            rare = sorted(street_trigrams[index], key=lambda gram: (document_frequency[gram], gram))
+            for gram in rare[:self.trigram_keys]:
+                blocks[('trigram', street['city_id'], gram)].append(index)
+
+        return blocks
+
+    def candidate_pairs(self, streets: List[dict]) -> Iterable[Tuple[int, int]]:
+        """Унікальні пари вулиць з різних джерел у межах блоків"""
+        seen = set()
+        for members in self.blocking_keys(streets).values():
+            if len(members) < 2:
+                continue
+            if len(members) > self.max_block_size:
+                self.stats['oversized_blocks'] += 1
+                continue
+
+            self.stats['blocks'] += 1
+            for i, first in enumerate(members):
+                for second in members[i + 1:]:
+                    a, b = streets[first], streets[second]
+                    if a['source'] == b['source'] or a['id'] == b['id']:
+                        continue
+                    # Вулиця та провулок з однаковою назвою - різні об'єкти
+                    if a['type_id'] and b['type_id'] and a['type_id'] != b['type_id']:
+                        continue
+                    pair = (min(first, second), max(first, second))
+                    if pair not in seen:
+                        seen.add(pair)
+                        yield pair
+
+    def score(self, first: str, second: str) -> float:
+        """Оцінка схожості назв існуючим компаратором"""
+        if self.comparator is None:
+            from src.utils.validators import get_universal_comparator
+            self.comparator = get_universal_comparator()
+        return self.comparator.calculate_comprehensive_similarity(first, second, 'street')
+
+    def score_pairs(self, streets: List[dict], pairs: List[Tuple[int, int]]) -> List[float]:
+        """Оцінки для всіх пар; паралельний компаратор (calculate_many) рахує їх пачкою"""
+        if hasattr(self.comparator, 'calculate_many'):
+            return self.comparator.calculate_many(
+                [(streets[first]['name'], streets[second]['name']) for first, second in pairs], 'street'
+            )
+        return [self.score(streets[first]['name'], streets[second]['name']) for first, second in pairs]
+
+    def resolve(self, streets: List[dict]) -> Dict[int, Tuple[int, float]]:
+        """Карта злиття: id дубліката -> (id канонічної вулиці, оцінка)"""
+        self.stats['streets'] = len(streets)
+        # Однойменні сутності одного джерела зіставляються як одна вулиця
+        streets, members = self.collapse(streets)
+        self.stats['collapsed_streets'] = self.stats['streets'] - len(streets)
+        parent = list(range(len(streets)))
+        best_score = {}
+
+        def find(index):
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        pairs = list(self.candidate_pairs(streets))
+        self.stats['candidate_pairs'] += len(pairs)
+        matched = [(similarity, first, second)
+                   for (first, second), similarity in zip(pairs, self.score_pairs(streets, pairs))
+                   if similarity >= self.threshold]
+        # Найсхожіші пари об'єднуються першими: вулиця йде до найкращого відповідника
+        matched.sort(key=lambda item: item[0], reverse=True)
+
+        # Джерела вулиць кожного кластера (за коренем)
+        sources = [{street['source']} for street in streets]
+        for similarity, first, second in matched:
+            self.stats['matched_pairs'] += 1
+            root_first, root_second = find(first), find(second)
+            if root_first != root_second:
+                if sources[root_first] & sources[root_second]:
+                    # Злиття кластерів з'єднало б дві різні вулиці одного джерела
+                    self.stats['conflicting_pairs'] += 1
+                    continue
+                parent[root_second] = root_first
+                sources[root_first] |= sources[root_second]
+
+            for index in (first, second):
+                best_score[index] = max(best_score.get(index, 0.0), similarity)
+
+        clusters = defaultdict(list)
+        for index in range(len(streets)):
+            clusters[find(index)].append(index)
+
+        merges = {}
+        for cluster in clusters.values():
+            canonical = min(cluster, key=lambda index: (
+                SOURCE_PRIORITY.get(streets[index]['source'], len(SOURCE_PRIORITY)),
+                streets[index]['id'],
+            ))
+            canonical_id = streets[canonical]['id']
+            for index in cluster:
+                # Згорнуті однойменні сутності - з оцінкою 1.0 до своєї вулиці
+                score = best_score.get(index, 1.0)
+                for street_id in members[index]:
+                    if street_id != canonical_id:
+                        merges[street_id] = (canonical_id, score)
+
+        self.stats['merged_streets'] = len(merges)
+        return merges
+
+    def save_merges(self, merges: Dict[int, Tuple[int, float]], dry_run: bool = False):
+        """Запис карти злиття та перенесення даних дублікатів на канонічні вулиці (одна транзакція)"""
+        if dry_run or not self.cursor:
+            self.logger.info(f"DRY RUN: карта злиття вулиць - {len(merges)} записів")
+            return
+
+        self.cursor.execute(DELETE_MERGES_QUERY)
+        if merges:
+            execute_values(
+                self.cursor,
+                """
+                INSERT INTO addrinity.street_entity_merges (street_entity_id, canonical_id, score)
+                VALUES %s
+                """,
+                [(street_id, canonical_id, score)
+                 for street_id, (canonical_id, score) in merges.items()]
+            )
+        for query in REPOINT_QUERIES:
+            self.cursor.execute(query)
+        # Будівлі змінили вулицю - кеші пошуку та знімки кандидатів застаріли
+        self.data_version.bump(self.cursor)
+        self.connection.commit()
+
+    def run(self, dry_run: bool = False) -> dict:
+        """Повний етап: завантаження, блокування, оцінка, запис карти злиття"""
+        streets = self.load_streets()
+        merges = self.resolve(streets)
+        self.save_merges(merges, dry_run)
+
+        self.logger.info(
+            f"Зіставлення вулиць: {self.stats['streets']} вулиць, "
+            f"{self.stats['candidate_pairs']} пар-кандидатів у {self.stats['blocks']} блоках, "
+            f"злито {self.stats['merged_streets']}"
+        )
+        return self.stats
+
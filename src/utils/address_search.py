@@ -1,17 +1,196 @@
-"""Пошук адрес по вільному тексту з використанням валідатора"""
+"""Пошук адрес по вільному тексту з використанням валідатора
+
+Кожен запит бере з'єднання з пулу (src/utils/db_pool.py) на час виконання:
+публічні методи пошуку позначені @with_cursor, а self.cursor - курсор
+поточного потоку. Вкладені виклики (search_by_free_text -> search_building)
+використовують той самий курсор, тож один запит займає одне з'єднання.
+Якщо розібраний запит не знайдено, пошук йде по денормалізованій таблиці
+повних адрес addrinity.mv_full_address одним запитом за триграмним індексом.
+Автодоповнення (fuzzy_search) відповідає з префіксного індексу в пам'яті
+(src/utils/autocomplete.py) і з'єднання з пулу не бере.
+
+Результати search_by_free_text кешуються (LRU з TTL, розмір і строки - CACHE_CONFIG)
+за розібраним запитом; ключ містить версію даних (src/utils/data_version.py),
+яку мігратори збільшують після зміни даних, тож після міграції кеш не застаріває.
+Нова версія в БД (міграція в іншому процесі) також інвалідує знімки
+кандидатів компаратора та індекси автодоповнення - перший же запит під
+новою версією порівнюється з новими назвами, а не з кешованими до TTL.
+"""
+
+import functools
+import logging
+import re
+import threading
 
-from src.utils.validators import get_universal_comparator
 import psycopg2
-import json
-from config.database import CONNECTION_STRING
+
+from src.utils.validators import get_universal_comparator
+from src.utils.building_numbers import canonical_building_number
+from src.utils.autocomplete import Autocomplete
+from src.utils.data_version import get_data_version
+from src.utils.db_pool import get_connection_pool
+from src.utils.phonetics import phonetic_key
+from src.utils.lru_cache import LRUCache
+
+try:
+    from config.database import CACHE_CONFIG
+except ImportError:
+    CACHE_CONFIG = {}
+
+logger = logging.getLogger('AddressSearch')
+
+
+# Пошук будівлі одним запитом: до 10 найсхожіших вулиць (по одній назві на вулицю),
+# до 5 будівель з канонічним номером на кожній (LATERAL) та готова повна адреса
+BUILDING_SEARCH_QUERY = """
+    WITH streets AS (
+        SELECT * FROM (
+            SELECT DISTINCT ON (se.id) se.id, sn.name, similarity(sn.name, %(street)s) AS score
+            FROM addrinity.street_entities se
+            JOIN addrinity.street_names sn ON se.id = sn.street_entity_id
+            LEFT JOIN addrinity.cities c ON c.id = se.city_id
+            LEFT JOIN addrinity.city_districts cd ON cd.id = se.city_district_id
+            WHERE similarity(sn.name, %(street)s) > 0.7
+            AND sn.is_current = TRUE
+            AND (%(city)s::text IS NULL OR lower(c.name_uk) = %(city)s)
+            AND (%(district)s::text IS NULL OR lower(cd.name_uk) = %(district)s)
+            ORDER BY se.id, score DESC
+        ) best_names
+        ORDER BY score DESC
+        LIMIT 10
+    )
+    SELECT s.id, s.name, b.id, b.number, b.corpus, c.name_uk, cd.name_uk,
+           c.name_uk || ', ' || cur.name || COALESCE(' ' || st.short_name_uk, '') || ', ' ||
+           b.number || COALESCE('/' || NULLIF(b.corpus, ''), '') AS full_address
+    FROM streets s
+    JOIN addrinity.street_entities se ON se.id = s.id
+    JOIN addrinity.cities c ON c.id = se.city_id
+    LEFT JOIN addrinity.city_districts cd ON cd.id = se.city_district_id
+    LEFT JOIN addrinity.street_types st ON st.id = se.type_id
+    CROSS JOIN LATERAL (
+        SELECT b.id, b.number, b.corpus
+        FROM addrinity.buildings b
+        WHERE b.street_entity_id = s.id
+        AND b.number_canonical = %(number)s
+        ORDER BY b.number_int, b.number_letter, b.number_fraction, b.number_corpus
+        LIMIT 5
+    ) b
+    LEFT JOIN LATERAL (
+        SELECT sn.name FROM addrinity.street_names sn
+        WHERE sn.street_entity_id = s.id AND sn.is_current = TRUE
+        ORDER BY sn.is_official DESC NULLS LAST
+        LIMIT 1
+    ) cur ON TRUE
+    ORDER BY s.score DESC
+"""
+
+# Деталі всіх знайдених вулиць одним запитом: по одній вулиці на назву
+# та до 10 будівель кожної (номери в числовому порядку - одним масивом)
+STREET_DETAILS_QUERY = """
+    WITH streets AS (
+        SELECT DISTINCT ON (sn.name) sn.name, se.id, st.name_uk AS street_type, c.name_uk AS city_name
+        FROM addrinity.street_names sn
+        JOIN addrinity.street_entities se ON se.id = sn.street_entity_id
+        JOIN addrinity.street_types st ON se.type_id = st.id
+        JOIN addrinity.cities c ON se.city_id = c.id
+        LEFT JOIN addrinity.city_districts cd ON cd.id = se.city_district_id
+        WHERE sn.name = ANY(%(names)s) AND sn.is_current = TRUE
+        AND (%(city)s::text IS NULL OR lower(c.name_uk) = %(city)s)
+        AND (%(district)s::text IS NULL OR lower(cd.name_uk) = %(district)s)
+        ORDER BY sn.name, se.id
+    )
+    SELECT s.name, s.id, s.street_type, s.city_name, COALESCE(b.numbers, '{}')
+    FROM streets s
+    LEFT JOIN LATERAL (
+        SELECT array_agg(sample.number ORDER BY sample.number_int, sample.number_letter,
+                         sample.number_fraction, sample.number_corpus, sample.number) AS numbers
+        FROM (
+            SELECT number, number_int, number_letter, number_fraction, number_corpus
+            FROM addrinity.buildings
+            WHERE street_entity_id = s.id
+            ORDER BY number_int, number_letter, number_fraction, number_corpus, number
+            LIMIT 10
+        ) sample
+    ) b ON TRUE
+"""
+
+# Деталі всіх знайдених районів одним запитом: місто та кількість вулиць
+DISTRICT_DETAILS_QUERY = """
+    WITH districts AS (
+        SELECT DISTINCT ON (cd.name_uk) cd.name_uk, cd.id, cd.type,
+               COALESCE(c.name_uk, 'Невідомо') AS city_name
+        FROM addrinity.city_districts cd
+        LEFT JOIN addrinity.cities c ON c.id = cd.city_id
+        WHERE cd.name_uk = ANY(%(names)s)
+        AND (%(city)s::text IS NULL OR lower(c.name_uk) = %(city)s)
+        ORDER BY cd.name_uk, cd.id
+    )
+    SELECT d.name_uk, d.id, d.type, d.city_name,
+           (SELECT COUNT(*) FROM addrinity.street_entities se
+            WHERE se.city_district_id = d.id) AS streets_count
+    FROM districts d
+"""
+
+# Пошук по денормалізованій таблиці повних адрес (setup/setup_addrinity_views.sql):
+# один запит за GIN-триграмними індексами нормалізованої та фонетичної форм
+FULL_ADDRESS_SEARCH_QUERY = """
+    SELECT building_id, premise_id, street_entity_id, street, building_number, corpus,
+           premise_number, city, city_district, full_address,
+           GREATEST(similarity(normalized_address, %(query)s),
+                    similarity(phonetic_address, %(phonetic)s)) AS score
+    FROM addrinity.mv_full_address
+    WHERE (normalized_address %% %(query)s OR phonetic_address %% %(phonetic)s)
+    AND (%(city)s::text IS NULL OR lower(city) = %(city)s)
+    AND (%(district)s::text IS NULL OR lower(city_district) = %(district)s)
+    ORDER BY score DESC, premise_id NULLS FIRST
+    LIMIT %(limit)s
+"""
+
+# Готова повна адреса будівлі з денормалізованої таблиці
+FULL_ADDRESS_QUERY = """
+    SELECT full_address FROM addrinity.mv_full_address
+    WHERE building_id = %(building_id)s AND premise_id IS NULL
+"""
+
+
+def normalize_address(text):
+    """Адреса в нижньому регістрі без розділових знаків (як normalized_address у mv_full_address)"""
+    return ' '.join(re.sub(r'\W+', ' ', str(text or '').lower()).split())
+
+
+def with_cursor(method):
+    """Виконання методу з курсором з пулу (якщо потік ще не має курсора)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(self._local, 'cursor', None) is not None:
+            return method(self, *args, **kwargs)
+        with self.pool.cursor() as cursor:
+            self._local.cursor = cursor
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._local.cursor = None
+    return wrapper
+
 
 class AddressSearchEngine:
-    def __init__(self):
-        self.connection = psycopg2.connect(CONNECTION_STRING)
-        self.cursor = self.connection.cursor()
+    def __init__(self, pool=None):
+        self.pool = pool or get_connection_pool()
+        self._local = threading.local()
         self.comparator = get_universal_comparator()
+        # Префіксний індекс назв для автодоповнення (без звернень до БД пошуку)
+        self.autocomplete = Autocomplete(self.comparator)
+        # Кеш результатів search_by_free_text; ключ містить версію даних
+        self.result_cache = LRUCache(CACHE_CONFIG.get('size', 10000), ttl=CACHE_CONFIG.get('ttl', 300.0))
+        self.negative_ttl = CACHE_CONFIG.get('negative_ttl', 60.0)
+        self.data_version = get_data_version()
+    
+    @property
+    def cursor(self):
+        """Курсор з'єднання, взятого з пулу поточним запитом (None поза запитом)"""
+        return getattr(self._local, 'cursor', None)
     
-    def search_by_free_text(self, query_text, limit=50):
+    def search_by_free_text(self, query_text, limit=50, city=None, district=None):
         """
         Пошук адрес по вільному тексту
         Приклади запитів:
@@ -19,7 +198,33 @@ class AddressSearchEngine:
         - "Дніпро, Старий Шлях 192"
         - "Кірова вул., буд. 100"
         - "Таромський район, Золотоосіння 117"
+        
+        city, district - явна область пошуку (мають перевагу над розпізнаними в тексті);
+        без області кандидатами є назви всіх міст.
+        Результати (і порожні теж) кешуються за розібраним запитом та версією даних.
         """
+        try:
+            # Парсинг вільного тексту
+            parsed_query = self.parse_free_text(query_text)
+        except Exception as e:
+            return {'query': query_text, 'matches': [], 'total_found': 0, 'suggestions': [], 'error': str(e)}
+        if city:
+            parsed_query['city'] = city
+        if district:
+            parsed_query['district'] = district
+        
+        key = (self.current_data_version(),) + self.result_cache_key(parsed_query, limit, bool(district))
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return {**cached, 'query': query_text}
+        
+        results = self._search_parsed(query_text, parsed_query, limit, bool(district))
+        self.cache_results(key, results)
+        return results
+    
+    @with_cursor
+    def _search_parsed(self, query_text, parsed_query, limit, explicit_district=False):
+        """Пошук за розібраним запитом"""
         results = {
             'query': query_text,
             'matches': [],
@@ -28,17 +233,23 @@ class AddressSearchEngine:
         }
         
         try:
-            # Парсинг вільного тексту
-            parsed_query = self.parse_free_text(query_text)
-            
             # Пошук за різними критеріями
             if parsed_query.get('street') and parsed_query.get('building'):
                 # Пошук конкретної будівлі
                 matches = self.search_building(
                     parsed_query['street'], 
                     parsed_query['building'],
-                    parsed_query.get('city')
+                    parsed_query.get('city'),
+                    parsed_query.get('district')
                 )
+                if not matches and parsed_query.get('district') and not explicit_district:
+                    # Район, розпізнаний у тексті, може не збігатися з назвою в довіднику
+                    matches = self.search_building(
+                        parsed_query['street'], parsed_query['building'], parsed_query.get('city')
+                    )
+                if not matches:
+                    # Текст розібрано неточно - пошук по таблиці повних адрес
+                    matches = self.search_full_address(query_text, parsed_query, limit)
             elif parsed_query.get('street'):
                 # Пошук вулиці
                 matches = self.search_street(
@@ -46,6 +257,9 @@ class AddressSearchEngine:
                     parsed_query.get('city'),
                     parsed_query.get('district')
                 )
+                if not matches and parsed_query.get('district') and not explicit_district:
+                    # Район, розпізнаний у тексті, може не збігатися з назвою в довіднику
+                    matches = self.search_street(parsed_query['street'], parsed_query.get('city'))
             elif parsed_query.get('district'):
                 # Пошук району
                 matches = self.search_district(
@@ -54,20 +268,67 @@ class AddressSearchEngine:
                 )
             else:
                 # Загальний пошук
-                matches = self.search_general(query_text)
+                matches = self.search_general(query_text, parsed_query.get('city'))
             
             results['matches'] = matches
             results['total_found'] = len(matches)
             
             # Генерація підказок
             if len(matches) == 0:
-                results['suggestions'] = self.generate_suggestions(query_text)
+                results['suggestions'] = self.generate_suggestions(query_text, parsed_query.get('city'))
             
         except Exception as e:
             results['error'] = str(e)
         
         return results
     
+    # Кеш результатів
+    
+    @staticmethod
+    def result_cache_key(parsed_query, limit, explicit_district=False):
+        """Ключ кешу: нормалізовані вулиця, канонічний номер, район, місто та ліміт"""
+        def part(value):
+            return ' '.join(str(value).split()).lower() if value else None
+        
+        building = parsed_query.get('building')
+        # Загальний пошук йде по тексту запиту, а не по розібраних частинах
+        general = (None if parsed_query.get('street') or parsed_query.get('district')
+                   else ' '.join(parsed_query.get('parts') or []).lower())
+        return (part(parsed_query.get('street')),
+                canonical_building_number(building) if building else None,
+                part(parsed_query.get('district')), part(parsed_query.get('city')),
+                general, limit, explicit_district)
+    
+    def cache_results(self, key, results):
+        """Збереження результатів у кеш (порожні - з коротшим TTL, помилки - ні)"""
+        if 'error' in results:
+            return
+        ttl = None if results['matches'] else self.negative_ttl
+        self.result_cache.put(key, results, ttl)
+    
+    def current_data_version(self):
+        """Версія адресних даних (з БД - не частіше за інтервал перевірки)"""
+        if self.data_version.due():
+            known = self.data_version.current()[0]
+            try:
+                with self.pool.cursor() as cursor:
+                    self.data_version.refresh(cursor)
+            except Exception as e:
+                self.data_version.failed()
+            self.check_data_changed(known)
+        return self.data_version.current()
+    
+    def check_data_changed(self, known):
+        """Версія в БД змінилася з known: знімки кандидатів та індекси автодоповнення перечитуються"""
+        if self.data_version.current()[0] != known:
+            self.comparator.snapshot.bump_version()
+            self.autocomplete.reset()
+    
+    def cache_metrics(self):
+        """Метрики кешу результатів та версії даних"""
+        return {**self.result_cache.info(), 'data_version': list(self.data_version.current()),
+                'data_version_checks': self.data_version.stats['checks']}
+    
     def parse_free_text(self, text):
         """Парсинг вільного тексту в структурований запит"""
         parsed = {
@@ -76,7 +337,7 @@ class AddressSearchEngine:
             'street': None,
             'building': None,
             'district': None,
-            'city': 'Дніпро',  # За замовчуванням
+            'city': None,  # Розпізнається за довідником міст; None - пошук по всіх містах
             'street_type': None
         }
         
@@ -101,9 +362,21 @@ class AddressSearchEngine:
         parts = text.replace(',', ' ').replace('.', ' ').split()
         parsed['parts'] = parts
         
+        # Пошук міста: одне чи два слова, що збігаються з назвою міста з довідника
+        city_words = set()
+        known_cities = self.known_cities()
+        for i in range(len(parts)):
+            phrase = next((' '.join(parts[i:i + size]) for size in (2, 1)
+                           if ' '.join(parts[i:i + size]) in known_cities), None)
+            if phrase:
+                parsed['city'] = known_cities[phrase]
+                city_words.update(phrase.split())
+                break
+        
         # Пошук номера будинку
         for i, part in enumerate(parts):
-            if any(ind in part for ind in building_indicators) and i + 1 < len(parts):
+            # Ціле слово: підрядок 'д' є в 'дніпро'
+            if part in building_indicators and i + 1 < len(parts):
                 parsed['building'] = parts[i + 1]
                 break
             elif part.isdigit() and len(part) <= 4:
@@ -120,7 +393,8 @@ class AddressSearchEngine:
             if any(di in part for di in district_indicators):
                 # Знайти назву району
                 for p in parts:
-                    if p not in street_types and p not in district_indicators and not p.isdigit():
+                    if (p not in street_types and p not in district_indicators and
+                            p not in city_words and not p.isdigit()):
                         parsed['district'] = p.title()
                         break
                 break
@@ -132,7 +406,8 @@ class AddressSearchEngine:
                 part not in district_indicators and 
                 part not in building_indicators and 
                 not part.isdigit() and
-                part not in ['дніпро', 'м', 'м.']):
+                part not in city_words and
+                part != 'м'):
                 street_parts.append(part.title())
         
         if street_parts:
@@ -140,168 +415,203 @@ class AddressSearchEngine:
         
         return parsed
     
-    def search_building(self, street_name, building_number, city=None):
-        """Пошук конкретної будівлі"""
-        matches = []
+    def known_cities(self):
+        """Назви міст з довідника: нижній регістр -> назва (зі знімка кандидатів 'city')"""
+        try:
+            snapshot = self.comparator._get_snapshot('city')
+        except Exception as e:
+            return {}
+        names = snapshot.names if snapshot else []
+        return {name.lower(): name for name in names}
+    
+    @staticmethod
+    def scope_params(city=None, district=None, **params):
+        """Параметри фільтра області для SQL: назви в нижньому регістрі або NULL"""
+        params['city'] = city.strip().lower() if city and city.strip() else None
+        params['district'] = district.strip().lower() if district and district.strip() else None
+        return params
+    
+    @with_cursor
+    def search_building(self, street_name, building_number, city=None, district=None):
+        """Пошук конкретної будівлі (в межах міста / району міста, якщо задано) одним запитом"""
+        try:
+            # Канонічний номер (12А, 12/3, 12 к2) - будівля шукається рівністю за індексом
+            self.cursor.execute(BUILDING_SEARCH_QUERY, self.scope_params(
+                city, district, street=street_name, number=canonical_building_number(building_number)
+            ))
+            rows = self.cursor.fetchall()
+        except Exception as e:
+            return []
         
+        return self.building_matches(rows, street_name, building_number)
+    
+    @with_cursor
+    def search_full_address(self, query_text, parsed_query=None, limit=50):
+        """Пошук по таблиці повних адрес одним індексованим запитом (будівлі та приміщення)"""
         try:
-            # Пошук вулиці
-            self.cursor.execute("""
-                SELECT se.id, se.city_id, sn.name as street_name
-                FROM addrinity.street_entities se
-                JOIN addrinity.street_names sn ON se.id = sn.street_entity_id
-                WHERE similarity(sn.name, %s) > 0.7 
-                AND sn.is_current = TRUE
-                ORDER BY similarity(sn.name, %s) DESC
-                LIMIT 10
-            """, (street_name, street_name))
-            
-            streets = self.cursor.fetchall()
-            
-            for street_id, city_id, found_street_name in streets:
-                # Пошук будівлі на цій вулиці
-                self.cursor.execute("""
-                    SELECT b.id, b.number, b.corpus, c.name_uk as city_name
-                    FROM addrinity.buildings b
-                    JOIN addrinity.cities c ON c.id = (
-                        SELECT city_id FROM addrinity.street_entities WHERE id = %s
-                    )
-                    WHERE b.street_entity_id = %s 
-                    AND (b.number = %s OR similarity(b.number, %s) > 0.8)
-                    LIMIT 5
-                """, (street_id, street_id, building_number, building_number))
-                
-                buildings = self.cursor.fetchall()
-                
-                for building_id, number, corpus, city_name in buildings:
-                    # Отримання повної адреси
-                    full_address = self.get_full_address(street_id, building_id)
-                    
-                    matches.append({
-                        'type': 'building',
-                        'id': building_id,
-                        'street': found_street_name,
-                        'building': number,
-                        'corpus': corpus,
-                        'city': city_name,
-                        'full_address': full_address,
-                        'confidence': self.calculate_address_confidence(
-                            street_name, found_street_name, 
-                            building_number, number
-                        )
-                    })
+            self.cursor.execute(FULL_ADDRESS_SEARCH_QUERY, self.full_address_params(query_text, parsed_query, limit))
+            rows = self.cursor.fetchall()
+        except psycopg2.Error as e:
+            # Перервана транзакція не повинна зламати наступні запити на цьому з'єднанні
+            self.cursor.connection.rollback()
+            logger.warning(f"Пошук по таблиці повних адрес недоступний: {e}")
+            return []
         
-        except Exception as e:
-            pass
+        return self.full_address_matches(rows)
+    
+    def full_address_params(self, query_text, parsed_query=None, limit=50):
+        """Параметри FULL_ADDRESS_SEARCH_QUERY: нормалізований текст, фонетична форма, область"""
+        parsed_query = parsed_query or {}
+        building = parsed_query.get('building')
+        phonetic = ' '.join(part for part in (
+            phonetic_key(parsed_query.get('city'), 'city'),
+            phonetic_key(parsed_query.get('street'), 'street'),
+            canonical_building_number(building) if building else None,
+        ) if part)
+        return self.scope_params(parsed_query.get('city'), parsed_query.get('district'),
+                                 query=normalize_address(query_text), phonetic=phonetic or None, limit=limit)
+    
+    def full_address_matches(self, rows):
+        """Результати пошуку з рядків FULL_ADDRESS_SEARCH_QUERY"""
+        matches = []
+        for (building_id, premise_id, street_id, street, number, corpus, premise_number,
+             city_name, district_name, full_address, score) in rows:
+            matches.append({
+                'type': 'premise' if premise_id else 'building',
+                'id': premise_id or building_id,
+                'building_id': building_id,
+                'street_id': street_id,
+                'street': street,
+                'building': number,
+                'corpus': corpus,
+                'premise': premise_number,
+                'city': city_name,
+                'district': district_name,
+                'full_address': full_address,
+                'confidence': round(float(score or 0), 3)
+            })
+        return matches
+    
+    def building_matches(self, rows, street_name, building_number):
+        """Результати пошуку будівлі з рядків BUILDING_SEARCH_QUERY (один прохід з оцінкою довіри)"""
+        matches = []
+        for (street_id, found_street_name, building_id, number, corpus,
+             city_name, district_name, full_address) in rows:
+            matches.append({
+                'type': 'building',
+                'id': building_id,
+                'street_id': street_id,
+                'street': found_street_name,
+                'building': number,
+                'corpus': corpus,
+                'city': city_name,
+                'district': district_name,
+                'full_address': full_address or "Адреса не знайдена",
+                'confidence': self.calculate_address_confidence(
+                    street_name, found_street_name,
+                    building_number, number
+                )
+            })
         
         return sorted(matches, key=lambda x: x['confidence'], reverse=True)
     
+    @with_cursor
     def search_street(self, street_name, city=None, district=None):
-        """Пошук вулиці"""
-        matches = []
-        
+        """Пошук вулиці (кандидати - лише вулиці заданого міста / району міста)"""
         try:
             # Пошук схожих вулиць
             similar_streets = self.comparator.find_similar_objects_universal(
-                street_name, 'street', 0.6
+                street_name, 'street', 0.6, city=city, district=district
             )
+            if not similar_streets:
+                # Фонетично однакові назви (індекс phonetic_key) з власною оцінкою схожості
+                similar_streets = [
+                    (name, self.comparator.calculate_comprehensive_similarity(street_name, name, 'street'))
+                    for name in self.comparator.find_phonetic_matches(street_name, 'street')
+                ]
+            similar_streets = similar_streets[:20]
+            if not similar_streets:
+                return []
             
-            for street_name_match, similarity_score in similar_streets[:20]:
-                # Отримання інформації про вулицю
-                self.cursor.execute("""
-                    SELECT se.id, se.city_id, st.name_uk as street_type,
-                           c.name_uk as city_name
-                    FROM addrinity.street_entities se
-                    JOIN addrinity.street_names sn ON se.id = sn.street_entity_id
-                    JOIN addrinity.street_types st ON se.type_id = st.id
-                    JOIN addrinity.cities c ON se.city_id = c.id
-                    WHERE sn.name = %s AND sn.is_current = TRUE
-                    LIMIT 1
-                """, (street_name_match,))
-                
-                street_info = self.cursor.fetchone()
-                if street_info:
-                    street_id, city_id, street_type, city_name = street_info
-                    
-                    # Отримання будівель на вулиці
-                    self.cursor.execute("""
-                        SELECT id, number, corpus 
-                        FROM addrinity.buildings 
-                        WHERE street_entity_id = %s
-                        ORDER BY number
-                        LIMIT 10
-                    """, (street_id,))
-                    
-                    buildings = self.cursor.fetchall()
-                    
-                    matches.append({
-                        'type': 'street',
-                        'id': street_id,
-                        'name': street_name_match,
-                        'type_name': street_type,
-                        'city': city_name,
-                        'buildings_count': len(buildings),
-                        'sample_buildings': [b[1] for b in buildings[:5]],
-                        'confidence': similarity_score
-                    })
-        
+            # Інформація та будівлі всіх кандидатів - одним запитом
+            self.cursor.execute(STREET_DETAILS_QUERY, self.scope_params(
+                city, district, names=[name for name, _ in similar_streets]
+            ))
+            rows = self.cursor.fetchall()
         except Exception as e:
-            pass
+            return []
         
-        return sorted(matches, key=lambda x: x['confidence'], reverse=True)
+        return self.street_matches(rows, similar_streets)
     
-    def search_district(self, district_name, city=None):
-        """Пошук району"""
+    def street_matches(self, rows, similar_streets):
+        """Результати пошуку вулиці з рядків STREET_DETAILS_QUERY"""
+        details = {row[0]: row for row in rows}
         matches = []
+        for street_name_match, similarity_score in similar_streets:
+            if street_name_match not in details:
+                continue
+            _, street_id, street_type, city_name, buildings = details[street_name_match]
+            matches.append({
+                'type': 'street',
+                'id': street_id,
+                'name': street_name_match,
+                'type_name': street_type,
+                'city': city_name,
+                'buildings_count': len(buildings),
+                'sample_buildings': list(buildings[:5]),
+                'confidence': similarity_score
+            })
         
+        return sorted(matches, key=lambda x: x['confidence'], reverse=True)
+    
+    @with_cursor
+    def search_district(self, district_name, city=None):
+        """Пошук району (кандидати - лише райони заданого міста)"""
         try:
             # Пошук схожих районів
             similar_districts = self.comparator.find_similar_objects_universal(
-                district_name, 'district', 0.7
+                district_name, 'district', 0.7, city=city
             )
+            if not similar_districts:
+                similar_districts = [
+                    (name, self.comparator.calculate_comprehensive_similarity(district_name, name, 'district'))
+                    for name in self.comparator.find_phonetic_matches(district_name, 'district')
+                ]
+            similar_districts = similar_districts[:10]
+            if not similar_districts:
+                return []
             
-            for district_name_match, similarity_score in similar_districts[:10]:
-                # Отримання інформації про район
-                self.cursor.execute("""
-                    SELECT id, name_uk, type, city_id
-                    FROM addrinity.city_districts 
-                    WHERE name_uk = %s
-                    LIMIT 1
-                """, (district_name_match,))
-                
-                district_info = self.cursor.fetchone()
-                if district_info:
-                    district_id, name, district_type, city_id = district_info
-                    
-                    # Отримання міста
-                    self.cursor.execute("""
-                        SELECT name_uk FROM addrinity.cities WHERE id = %s
-                    """, (city_id,))
-                    city_name = self.cursor.fetchone()[0] if self.cursor.fetchone() else "Невідомо"
-                    
-                    # Отримання вулиць у районі
-                    self.cursor.execute("""
-                        SELECT COUNT(*) FROM addrinity.street_entities 
-                        WHERE city_district_id = %s
-                    """, (district_id,))
-                    streets_count = self.cursor.fetchone()[0]
-                    
-                    matches.append({
-                        'type': 'district',
-                        'id': district_id,
-                        'name': name,
-                        'type_name': district_type,
-                        'city': city_name,
-                        'streets_count': streets_count,
-                        'confidence': similarity_score
-                    })
-        
+            # Район, його місто та кількість вулиць для всіх кандидатів - одним запитом
+            self.cursor.execute(DISTRICT_DETAILS_QUERY, self.scope_params(
+                city, names=[name for name, _ in similar_districts]
+            ))
+            rows = self.cursor.fetchall()
         except Exception as e:
-            pass
+            return []
+        
+        return self.district_matches(rows, similar_districts)
+    
+    def district_matches(self, rows, similar_districts):
+        """Результати пошуку району з рядків DISTRICT_DETAILS_QUERY"""
+        details = {row[0]: row for row in rows}
+        matches = []
+        for district_name_match, similarity_score in similar_districts:
+            if district_name_match not in details:
+                continue
+            name, district_id, district_type, city_name, streets_count = details[district_name_match]
+            matches.append({
+                'type': 'district',
+                'id': district_id,
+                'name': name,
+                'type_name': district_type,
+                'city': city_name,
+                'streets_count': streets_count,
+                'confidence': similarity_score
+            })
         
         return sorted(matches, key=lambda x: x['confidence'], reverse=True)
     
-    def search_general(self, query_text):
+    def search_general(self, query_text, city=None):
         """Загальний пошук"""
         matches = []
         
@@ -311,7 +621,7 @@ class AddressSearchEngine:
         for obj_type in object_types:
             try:
                 similar_objects = self.comparator.find_similar_objects_universal(
-                    query_text, obj_type, 0.6
+                    query_text, obj_type, 0.6, city=city
                 )
                 
                 for obj_name, similarity_score in similar_objects[:5]:
@@ -326,10 +636,20 @@ class AddressSearchEngine:
         
         return sorted(matches, key=lambda x: x['confidence'], reverse=True)
     
+    @with_cursor
     def get_full_address(self, street_id, building_id=None):
-        """Отримання повної адреси"""
+        """Отримання повної адреси (будівлі - з таблиці повних адрес, якщо вона є)"""
         try:
             if building_id:
+                try:
+                    self.cursor.execute(FULL_ADDRESS_QUERY, {'building_id': building_id})
+                    result = self.cursor.fetchone()
+                    if result and result[0]:
+                        return result[0]
+                except psycopg2.Error:
+                    # Таблицю ще не створено - адреса збирається JOIN-ами
+                    self.cursor.connection.rollback()
+                
                 self.cursor.execute("""
                     SELECT c.name_uk, cd.name_uk, sn.name, st.short_name_uk, b.number, b.corpus
                     FROM addrinity.buildings b
@@ -374,11 +694,12 @@ class AddressSearchEngine:
             search_street, found_street, 'street'
         )
         
-        building_similarity = 1.0 if search_building == found_building else 0.5
+        building_similarity = 1.0 if (canonical_building_number(search_building) ==
+                                      canonical_building_number(found_building)) else 0.5
         
         return (street_similarity * 0.7 + building_similarity * 0.3)
     
-    def generate_suggestions(self, query_text):
+    def generate_suggestions(self, query_text, city=None):
         """Генерація підказок для пошуку"""
         suggestions = []
         
@@ -386,7 +707,7 @@ class AddressSearchEngine:
         for obj_type in ['street', 'district']:
             try:
                 similar = self.comparator.find_similar_objects_universal(
-                    query_text, obj_type, 0.5
+                    query_text, obj_type, 0.5, city=city
                 )
                 for name, score in similar[:3]:
                     suggestions.append({
@@ -400,44 +721,32 @@ class AddressSearchEngine:
         
         return suggestions
     
-    def fuzzy_search(self, partial_text, object_type='street', limit=10):
-        """Нечіткий пошук з автодоповненням"""
+    def fuzzy_search(self, partial_text, object_type='street', limit=10, city=None, district=None):
+        """Автодоповнення: префіксний індекс назв міста / району міста (нечіткий пошук - при опечатці)"""
         try:
-            # Використання fuzzywuzzy для автодоповнення
-            if object_type == 'street':
-                self.cursor.execute("""
-                    SELECT DISTINCT name FROM addrinity.street_names 
-                    WHERE is_current = TRUE AND name IS NOT NULL
-                """)
-            elif object_type == 'district':
-                self.cursor.execute("""
-                    SELECT DISTINCT name_uk FROM addrinity.city_districts 
-                    WHERE name_uk IS NOT NULL
-                """)
-            
-            all_objects = [row[0] for row in self.cursor.fetchall() if row[0]]
-            
-            from fuzzywuzzy import process
-            matches = process.extract(partial_text, all_objects, limit=limit)
-            
-            return [{'name': name, 'score': score} for name, score in matches if score > 30]
-            
+            return self.autocomplete.complete(partial_text, object_type, limit, city, district)
         except Exception as e:
             return []
     
+    def pool_metrics(self):
+        """Метрики пулу з'єднань та стан БД"""
+        return {'healthy': self.pool.health_check(), **self.pool.metrics()}
+    
     def close(self):
-        """Закриття з'єднання"""
-        if self.connection:
-            self.connection.close()
+        """Закриття з'єднань пулу"""
+        self.pool.close()
 
-# Глобальний екземпляр для зручності
+# Глобальний екземпляр для зручності (спільний для потоків API: з'єднання беруться з пулу)
 search_engine = None
+_search_engine_lock = threading.Lock()
 
 def get_search_engine():
     """Отримання глобального екземпляра пошукової системи"""
     global search_engine
     if not search_engine:
-        search_engine = AddressSearchEngine()
+        with _search_engine_lock:
+            if not search_engine:
+                search_engine = AddressSearchEngine()
     return search_engine
 
 # Приклад використання
@@ -0,0 +1,420 @@
+"""Асинхронна пошукова система адрес на asyncpg
+
+Той самий пошук, що й AddressSearchEngine (src/utils/address_search.py), але
+без блокування event loop:
+  - запити до БД виконуються через пул asyncpg; будівля, деталі всіх знайдених
+    вулиць чи районів отримуються одним запитом (спільним з синхронною версією),
+    тож кількість звернень до БД не залежить від кількості кандидатів;
+  - нечітке порівняння (find_similar_objects_universal) - робота процесора -
+    виконується в пулі потоків, тому повільний запит не зупиняє інші;
+  - підказки рахуються в пулі потоків лише для пошуку без результатів (як у
+    синхронній версії): пул потоків спільний для всіх запитів, тож зайве
+    нечітке порівняння для успішних запитів забирало б його в інших;
+  - автодоповнення відповідає з префіксного індексу (src/utils/autocomplete.py)
+    прямо в event loop; в пул потоків іде лише його побудова.
+Розбір вільного тексту, розрахунок довіри та кеш результатів (ключ, строки,
+версія даних) спільні з синхронною версією.
+
+Розміри пулу беруться з POOL_CONFIG (config/database.py): DB_POOL_MIN / DB_POOL_MAX.
+Пул створюється при першому запиті або явним await engine.connect().
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.address_search import (
+    BUILDING_SEARCH_QUERY, DISTRICT_DETAILS_QUERY, FULL_ADDRESS_QUERY, FULL_ADDRESS_SEARCH_QUERY,
+    STREET_DETAILS_QUERY, AddressSearchEngine, logger
+)
+from src.utils.building_numbers import canonical_building_number
+from src.utils.data_version import DATA_VERSION_QUERY, get_data_version
+from src.utils.lru_cache import LRUCache
+from src.utils.autocomplete import AUTOCOMPLETE_TYPES, Autocomplete
+from src.utils.validators import get_universal_comparator
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+try:
+    from config.database import CACHE_CONFIG, CONNECTION_STRING, POOL_CONFIG
+except ImportError:
+    CACHE_CONFIG, CONNECTION_STRING, POOL_CONFIG = {}, None, {}
+
+
+# Кількість потоків для нечіткого порівняння
+SCORING_WORKERS = 4
+
+def asyncpg_query(query, names):
+    """Запит з іменованими параметрами psycopg2 (%(name)s) у форматі asyncpg ($1, $2 ...)"""
+    for position, name in enumerate(names, 1):
+        query = query.replace(f"%({name})s", f"${position}")
+    return query.replace('%%', '%')
+
+
+# Запити (параметри asyncpg: $1, $2 ...; місто та район - в нижньому регістрі або NULL)
+
+# Пошук будівлі одним запитом (спільний з синхронною версією)
+BUILDING_SEARCH = asyncpg_query(BUILDING_SEARCH_QUERY, ('street', 'number', 'city', 'district'))
+
+DATA_VERSION = DATA_VERSION_QUERY.replace('%s', '$1')
+
+# Таблиця повних адрес (addrinity.mv_full_address)
+FULL_ADDRESS_SEARCH_PARAMS = ('query', 'phonetic', 'city', 'district', 'limit')
+FULL_ADDRESS_SEARCH = asyncpg_query(FULL_ADDRESS_SEARCH_QUERY, FULL_ADDRESS_SEARCH_PARAMS)
+FULL_ADDRESS = asyncpg_query(FULL_ADDRESS_QUERY, ('building_id',))
+
+# Деталі всіх знайдених вулиць / районів одним запитом
+STREET_DETAILS = asyncpg_query(STREET_DETAILS_QUERY, ('names', 'city', 'district'))
+DISTRICT_DETAILS = asyncpg_query(DISTRICT_DETAILS_QUERY, ('names', 'city'))
+
+BUILDING_ADDRESS = """
+    SELECT c.name_uk, cd.name_uk, sn.name, st.short_name_uk, b.number, b.corpus
+    FROM addrinity.buildings b
+    JOIN addrinity.street_entities se ON b.street_entity_id = se.id
+    JOIN addrinity.street_names sn ON se.id = sn.street_entity_id AND sn.is_current = TRUE
+    JOIN addrinity.street_types st ON se.type_id = st.id
+    JOIN addrinity.cities c ON se.city_id = c.id
+    LEFT JOIN addrinity.city_districts cd ON se.city_district_id = cd.id
+    WHERE b.id = $1
+"""
+
+STREET_ADDRESS = """
+    SELECT c.name_uk, cd.name_uk, sn.name, st.short_name_uk
+    FROM addrinity.street_entities se
+    JOIN addrinity.street_names sn ON se.id = sn.street_entity_id AND sn.is_current = TRUE
+    JOIN addrinity.street_types st ON se.type_id = st.id
+    JOIN addrinity.cities c ON se.city_id = c.id
+    LEFT JOIN addrinity.city_districts cd ON se.city_district_id = cd.id
+    WHERE se.id = $1
+"""
+
+
+def _lower(value):
+    """Назва області для фільтра SQL: нижній регістр або None"""
+    return value.strip().lower() if value and value.strip() else None
+
+
+class AsyncAddressSearchEngine:
+    """Пошук адрес по вільному тексту: asyncpg для БД, пул потоків для нечіткого порівняння"""
+
+    # Спільні з синхронною версією кроки, що не звертаються до БД пошуку
+    known_cities = AddressSearchEngine.known_cities
+    parse_free_text = AddressSearchEngine.parse_free_text
+    calculate_address_confidence = AddressSearchEngine.calculate_address_confidence
+    building_matches = AddressSearchEngine.building_matches
+    street_matches = AddressSearchEngine.street_matches
+    district_matches = AddressSearchEngine.district_matches
+    full_address_params = AddressSearchEngine.full_address_params
+    full_address_matches = AddressSearchEngine.full_address_matches
+    scope_params = staticmethod(AddressSearchEngine.scope_params)
+    result_cache_key = staticmethod(AddressSearchEngine.result_cache_key)
+    cache_results = AddressSearchEngine.cache_results
+    check_data_changed = AddressSearchEngine.check_data_changed
+    cache_metrics = AddressSearchEngine.cache_metrics
+
+    def __init__(self, pool=None, executor=None, comparator=None, dsn=None,
+                 min_size=None, max_size=None):
+        self.pool = pool
+        self.dsn = dsn or CONNECTION_STRING
+        self.min_size = min_size if min_size is not None else POOL_CONFIG.get('minconn', 1)
+        self.max_size = max_size if max_size is not None else POOL_CONFIG.get('maxconn', 10)
+        self.executor = executor or ThreadPoolExecutor(max_workers=SCORING_WORKERS,
+                                                       thread_name_prefix='address-scoring')
+        self.comparator = comparator or get_universal_comparator()
+        self.autocomplete = Autocomplete(self.comparator)
+        self.result_cache = LRUCache(CACHE_CONFIG.get('size', 10000), ttl=CACHE_CONFIG.get('ttl', 300.0))
+        self.negative_ttl = CACHE_CONFIG.get('negative_ttl', 60.0)
+        self.data_version = get_data_version()
+        self._pool_lock = None
+        self.stats = {'queries': 0, 'offloaded': 0}
+
+    # Пул з'єднань та виконавець
+
+    async def connect(self):
+        """Створення пулу asyncpg (один раз)"""
+        if self.pool is not None:
+            return self.pool
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+        async with self._pool_lock:
+            if self.pool is None:
+                if asyncpg is None:
+                    raise RuntimeError("Для асинхронного пошуку потрібен пакет asyncpg")
+                self.pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+        return self.pool
+
+    async def close(self):
+        """Закриття пулу з'єднань та виконавця"""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+        self.executor.shutdown(wait=False)
+
+    async def _fetch(self, query, *args):
+        pool = await self.connect()
+        self.stats['queries'] += 1
+        async with pool.acquire() as connection:
+            return await connection.fetch(query, *args)
+
+    async def _fetchrow(self, query, *args):
+        pool = await self.connect()
+        self.stats['queries'] += 1
+        async with pool.acquire() as connection:
+            return await connection.fetchrow(query, *args)
+
+    async def _offload(self, function, *args, **kwargs):
+        """Виконання процесорної роботи в пулі потоків (event loop не блокується)"""
+        self.stats['offloaded'] += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(function, *args, **kwargs))
+
+    def _similar(self, name, object_type, threshold, city=None, district=None):
+        """Схожі назви з фонетичним запасним варіантом (виконується в пулі потоків)"""
+        similar = self.comparator.find_similar_objects_universal(
+            name, object_type, threshold, city=city, district=district
+        )
+        if not similar:
+            similar = [
+                (match, self.comparator.calculate_comprehensive_similarity(name, match, object_type))
+                for match in self.comparator.find_phonetic_matches(name, object_type)
+            ]
+        return similar
+
+    # Пошук
+
+    async def search_by_free_text(self, query_text, limit=50, city=None, district=None):
+        """Асинхронний аналог AddressSearchEngine.search_by_free_text (з тим самим кешем результатів)"""
+        try:
+            # Довідник міст може (пере)завантажуватися з БД - поза event loop
+            parsed_query = await self._offload(self.parse_free_text, query_text)
+        except Exception as e:
+            return {'query': query_text, 'matches': [], 'total_found': 0, 'suggestions': [], 'error': str(e)}
+        if city:
+            parsed_query['city'] = city
+        if district:
+            parsed_query['district'] = district
+
+        key = (await self.current_data_version(),) + self.result_cache_key(parsed_query, limit, bool(district))
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return {**cached, 'query': query_text}
+
+        results = await self._search_parsed(query_text, parsed_query, limit, bool(district))
+        self.cache_results(key, results)
+        return results
+
+    async def _search_parsed(self, query_text, parsed_query, limit, explicit_district=False):
+        results = {
+            'query': query_text,
+            'matches': [],
+            'total_found': 0,
+            'suggestions': []
+        }
+
+        try:
+            matches = await self._lookup(query_text, parsed_query, limit, explicit_district)
+
+            results['matches'] = matches[:limit]
+            results['total_found'] = len(matches)
+
+            if len(matches) == 0:
+                results['suggestions'] = await self.generate_suggestions(query_text, parsed_query.get('city'))
+
+        except Exception as e:
+            results['error'] = str(e)
+
+        return results
+
+    async def _lookup(self, query_text, parsed_query, limit, explicit_district=False):
+        """Основний пошук за розібраним запитом (будівля, вулиця, район або загальний)"""
+        parsed_district = parsed_query.get('district') if not explicit_district else None
+
+        if parsed_query.get('street') and parsed_query.get('building'):
+            matches = await self.search_building(
+                parsed_query['street'], parsed_query['building'],
+                parsed_query.get('city'), parsed_query.get('district')
+            )
+            if not matches and parsed_district:
+                # Район, розпізнаний у тексті, може не збігатися з назвою в довіднику
+                matches = await self.search_building(
+                    parsed_query['street'], parsed_query['building'], parsed_query.get('city')
+                )
+            if not matches:
+                # Текст розібрано неточно - пошук по таблиці повних адрес
+                matches = await self.search_full_address(query_text, parsed_query, limit)
+        elif parsed_query.get('street'):
+            matches = await self.search_street(
+                parsed_query['street'], parsed_query.get('city'), parsed_query.get('district')
+            )
+            if not matches and parsed_district:
+                matches = await self.search_street(parsed_query['street'], parsed_query.get('city'))
+        elif parsed_query.get('district'):
+            matches = await self.search_district(parsed_query['district'], parsed_query.get('city'))
+        else:
+            matches = await self.search_general(query_text, parsed_query.get('city'))
+        return matches
+
+    async def current_data_version(self):
+        """Версія адресних даних (з БД - не частіше за інтервал перевірки)"""
+        if self.data_version.due():
+            known = self.data_version.current()[0]
+            try:
+                row = await self._fetchrow(DATA_VERSION, self.data_version.name)
+                self.data_version.update(row[0] if row else None)
+            except Exception as e:
+                self.data_version.failed()
+            self.check_data_changed(known)
+        return self.data_version.current()
+
+    async def search_building(self, street_name, building_number, city=None, district=None):
+        """Пошук будівлі одним запитом; оцінка довіри - в пулі потоків"""
+        try:
+            rows = await self._fetch(BUILDING_SEARCH, street_name, canonical_building_number(building_number),
+                                     _lower(city), _lower(district))
+        except Exception as e:
+            return []
+
+        return await self._offload(self.building_matches, rows, street_name, building_number)
+
+    async def search_full_address(self, query_text, parsed_query=None, limit=50):
+        """Пошук по таблиці повних адрес одним індексованим запитом"""
+        params = self.full_address_params(query_text, parsed_query, limit)
+        try:
+            rows = await self._fetch(FULL_ADDRESS_SEARCH, *(params[name] for name in FULL_ADDRESS_SEARCH_PARAMS))
+        except Exception as e:
+            logger.warning(f"Пошук по таблиці повних адрес недоступний: {e}")
+            return []
+
+        return self.full_address_matches(rows)
+
+    async def search_street(self, street_name, city=None, district=None):
+        """Пошук вулиці: нечітке порівняння в пулі потоків, деталі всіх кандидатів - одним запитом"""
+        try:
+            similar_streets = (await self._offload(self._similar, street_name, 'street', 0.6, city, district))[:20]
+            if not similar_streets:
+                return []
+            rows = await self._fetch(STREET_DETAILS, [name for name, _ in similar_streets],
+                                     _lower(city), _lower(district))
+        except Exception as e:
+            return []
+
+        return self.street_matches(rows, similar_streets)
+
+    async def search_district(self, district_name, city=None):
+        """Пошук району: деталі всіх кандидатів - одним запитом"""
+        try:
+            similar_districts = (await self._offload(self._similar, district_name, 'district', 0.7, city))[:10]
+            if not similar_districts:
+                return []
+            rows = await self._fetch(DISTRICT_DETAILS, [name for name, _ in similar_districts], _lower(city))
+        except Exception as e:
+            return []
+
+        return self.district_matches(rows, similar_districts)
+
+    def _general_matches(self, query_text, city=None):
+        matches = []
+        for obj_type in ['street', 'district', 'city']:
+            try:
+                similar_objects = self.comparator.find_similar_objects_universal(query_text, obj_type, 0.6, city=city)
+            except Exception:
+                continue
+            matches.extend({'type': obj_type, 'name': name, 'confidence': score, 'search_term': query_text}
+                           for name, score in similar_objects[:5])
+        return sorted(matches, key=lambda x: x['confidence'], reverse=True)
+
+    async def search_general(self, query_text, city=None):
+        """Загальний пошук по всіх типах об'єктів (у пулі потоків)"""
+        return await self._offload(self._general_matches, query_text, city)
+
+    async def get_full_address(self, street_id, building_id=None):
+        """Повна адреса будівлі (з таблиці повних адрес, якщо вона є) або вулиці"""
+        try:
+            if building_id:
+                try:
+                    result = await self._fetchrow(FULL_ADDRESS, building_id)
+                    if result and result[0]:
+                        return result[0]
+                except Exception as e:
+                    # Таблицю ще не створено - адреса збирається JOIN-ами
+                    pass
+
+                result = await self._fetchrow(BUILDING_ADDRESS, building_id)
+                if result:
+                    city, district, street, street_type, number, corpus = result
+                    corpus_part = f"/{corpus}" if corpus else ""
+                    return f"{city}, {street} {street_type}, {number}{corpus_part}"
+
+            result = await self._fetchrow(STREET_ADDRESS, street_id)
+            if result:
+                city, district, street, street_type = result
+                return f"{city}, {street} {street_type}"
+        except Exception as e:
+            return "Адреса не знайдена"
+
+        return "Адреса не знайдена"
+
+    def _suggestions(self, query_text, city=None):
+        suggestions = []
+        for obj_type in ['street', 'district']:
+            try:
+                similar = self.comparator.find_similar_objects_universal(query_text, obj_type, 0.5, city=city)
+            except Exception:
+                continue
+            suggestions.extend({'type': obj_type, 'name': name, 'confidence': score,
+                                'suggestion': f"Можливо ви мали на увазі: {name}?"}
+                               for name, score in similar[:3])
+        return suggestions
+
+    async def generate_suggestions(self, query_text, city=None):
+        """Підказки для пошуку без результатів (у пулі потоків)"""
+        return await self._offload(self._suggestions, query_text, city)
+
+    async def fuzzy_search(self, partial_text, object_type='street', limit=10, city=None, district=None):
+        """Автодоповнення з префіксного індексу; побудова індексу чи знімка - у пулі потоків"""
+        try:
+            if self.autocomplete.is_ready(object_type, city, district):
+                return self.autocomplete.complete(partial_text, object_type, limit, city, district)
+            return await self._offload(self.autocomplete.complete, partial_text, object_type, limit, city, district)
+        except Exception as e:
+            return []
+
+    async def load_autocomplete(self, object_types=AUTOCOMPLETE_TYPES):
+        """Побудова індексів автодоповнення (при старті сервера, у пулі потоків)"""
+        await self._offload(self.autocomplete.load, object_types)
+
+    # Стан
+
+    async def health_check(self):
+        """Перевірка доступності БД через пул asyncpg"""
+        try:
+            return await self._fetchrow("SELECT 1 AS ok") is not None
+        except Exception:
+            return False
+
+    def pool_metrics(self):
+        """Метрики пулу asyncpg та лічильники запитів"""
+        metrics = dict(self.stats)
+        if self.pool is not None:
+            metrics.update({
+                'min_size': self.pool.get_min_size(),
+                'max_size': self.pool.get_max_size(),
+                'size': self.pool.get_size(),
+                'idle': self.pool.get_idle_size(),
+            })
+        return metrics
+
+
+# Глобальний екземпляр (пул створюється в першому запиті event loop)
+async_search_engine = None
+
+
+def get_async_search_engine():
+    """Отримання глобального екземпляра асинхронної пошукової системи"""
+    global async_search_engine
+    if async_search_engine is None:
+        async_search_engine = AsyncAddressSearchEngine()
+    return async_search_engine
@@ -0,0 +1,198 @@
+"""Префіксний індекс автодоповнення назв вулиць та районів
+
+/api/autocomplete викликається на кожне натискання клавіші, тому назви не
+перебираються нечітким порівнянням, а шукаються за префіксом:
+  - ключі індексу - нормалізована та фонетична форми кожної назви, починаючи
+    з кожного слова ("старий шлях", "шлях"), у відсортованому масиві;
+  - префікс знаходить свій діапазон ключів двома bisect;
+  - для коротких префіксів (до PRECOMPUTED_PREFIX_LENGTH символів), діапазони
+    яких найбільші, найкращі top_k назв пораховані заздалегідь.
+Назви з префіксом від початку ранжуються вище, ніж збіг з середини, прямі
+збіги - вище фонетичних, коротші назви - вище довших.
+
+Індекс будується зі знімка кандидатів компаратора (CandidateSnapshot) і
+стежить за ним: нові назви, додані міграторами (CandidateSnapshot.add),
+вставляються в індекс інкрементально, перечитаний знімок (TTL, bump_version)
+перебудовує індекс. БД потрібна лише для завантаження знімка; індекси
+основних типів будуються при старті (load).
+
+Якщо за префіксом нічого не знайдено (опечатка), використовується нечітке
+порівняння fuzzywuzzy по назвах знімка.
+"""
+
+import bisect
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fuzzywuzzy import process
+
+try:
+    from src.utils.candidate_snapshot import CANDIDATE_QUERIES, MAX_SCOPED_SNAPSHOTS, candidate_scope
+    from src.utils.lru_cache import LRUCache
+except ImportError:
+    from candidate_snapshot import CANDIDATE_QUERIES, MAX_SCOPED_SNAPSHOTS, candidate_scope
+    from lru_cache import LRUCache
+
+
+# Типи, індекси яких будуються при старті
+AUTOCOMPLETE_TYPES = ('street', 'district')
+
+# Найкращі назви рахуються заздалегідь для префіксів до цієї довжини
+PRECOMPUTED_PREFIX_LENGTH = 3
+
+TOP_K = 10
+
+# Межа для ключів діапазону: більша за будь-який символ назви
+_MAX_CHAR = '\U0010ffff'
+
+# Ранг збігу: (збіг з середини назви, фонетичний збіг, довжина назви, назва) - менший кращий
+Rank = Tuple[bool, bool, int, str]
+
+
+def _word_starts(form: str) -> List[int]:
+    """Позиції початків слів у формі назви"""
+    return [0] + [position + 1 for position, char in enumerate(form[:-1])
+                  if char in ' -' and form[position + 1] not in ' -']
+
+
+def _best_ranks(ranks: Iterable[Rank], limit: int) -> List[Rank]:
+    """Найкращий ранг кожної назви, limit найкращих"""
+    best: Dict[str, Rank] = {}
+    for rank in ranks:
+        name = rank[3]
+        if name not in best or rank < best[name]:
+            best[name] = rank
+    return heapq.nsmallest(limit, best.values())
+
+
+class PrefixIndex:
+    """Відсортований масив ключів з рангами та top_k для коротких префіксів"""
+
+    def __init__(self, keys: Iterable[Tuple[str, Rank]] = (), top_k: int = TOP_K):
+        self.top_k = top_k
+        pairs = sorted(keys)
+        self.keys: List[str] = [key for key, _ in pairs]
+        self.ranks: List[Rank] = [rank for _, rank in pairs]
+        self.top: Dict[str, List[Rank]] = {}
+
+        buckets: Dict[str, List[Rank]] = {}
+        for key, rank in pairs:
+            for length in range(1, min(len(key), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                buckets.setdefault(key[:length], []).append(rank)
+        for prefix, ranks in buckets.items():
+            self.top[prefix] = _best_ranks(ranks, top_k)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, keys: Iterable[Tuple[str, Rank]]):
+        """Інкрементальна вставка ключів (bisect) з оновленням top_k їхніх префіксів"""
+        for key, rank in keys:
+            position = bisect.bisect_right(self.keys, key)
+            self.keys.insert(position, key)
+            self.ranks.insert(position, rank)
+            for length in range(1, min(len(key), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                prefix = key[:length]
+                self.top[prefix] = _best_ranks(self.top.get(prefix, []) + [rank], self.top_k)
+
+    def lookup(self, prefix: str, limit: int = TOP_K) -> List[Rank]:
+        """Найкращі limit назв, один з ключів яких починається з prefix"""
+        if not prefix:
+            return []
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH and limit <= self.top_k:
+            return self.top.get(prefix, [])[:limit]
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + _MAX_CHAR, start)
+        return _best_ranks(self.ranks[start:end], limit)
+
+
+class Autocomplete:
+    """Індекси автодоповнення по типах (та областях) поверх знімків кандидатів компаратора"""
+
+    def __init__(self, comparator, top_k: int = TOP_K):
+        self.comparator = comparator
+        self.top_k = top_k
+        # (тип, область) -> (знімок, кількість проіндексованих назв, індекс)
+        self._indexes = LRUCache(MAX_SCOPED_SNAPSHOTS + len(CANDIDATE_QUERIES))
+        self._lock = threading.Lock()
+        self.stats = {'builds': 0, 'incremental_adds': 0, 'lookups': 0, 'fallbacks': 0}
+
+    def _keys(self, snapshot, names: Iterable[str]):
+        """Ключі індексу назв: нормалізована та фонетична форми від кожного слова"""
+        for name in names:
+            entry = snapshot.entry(name) or self.comparator.prepare_candidate(name, snapshot.object_type)
+            forms = [(entry.normalized, False)]
+            if entry.phonetic and entry.phonetic != entry.normalized:
+                forms.append((entry.phonetic, True))
+            for form, phonetic in forms:
+                for start in _word_starts(form):
+                    yield form[start:], (start > 0, phonetic, len(entry.normalized), name)
+
+    def index(self, object_type: str, scope=None) -> Optional[PrefixIndex]:
+        """Індекс типу (області), синхронізований з поточним знімком кандидатів"""
+        snapshot = self.comparator._get_snapshot(object_type, scope)
+        if snapshot is None:
+            return None
+
+        key = (object_type, scope)
+        with self._lock:
+            state = self._indexes.get(key)
+            if state is None or state[0] is not snapshot:
+                index = PrefixIndex(self._keys(snapshot, snapshot.names), self.top_k)
+                self.stats['builds'] += 1
+            else:
+                _, indexed, index = state
+                if len(snapshot.names) > indexed:
+                    # Назви, додані до знімка після побудови індексу
+                    new_names = snapshot.names[indexed:]
+                    index.add(self._keys(snapshot, new_names))
+                    self.stats['incremental_adds'] += len(new_names)
+            self._indexes.put(key, (snapshot, len(snapshot.names), index))
+        return index
+
+    def reset(self):
+        """Скидання всіх індексів (дані змінено): наступний index() будує їх зі свіжого знімка"""
+        with self._lock:
+            self._indexes.clear()
+
+    def is_ready(self, object_type: str, city: str = None, district: str = None) -> bool:
+        """Чи відповість complete без завантаження знімка та побудови індексу"""
+        scope = candidate_scope(object_type, city, district)
+        snapshot = self.comparator.snapshot
+        state = self._indexes.get((object_type, scope))
+        return (state is not None and snapshot.is_fresh(object_type, scope)
+                and state[0] is snapshot.get(object_type, None, scope)
+                and state[1] == len(state[0].names))
+
+    def load(self, object_types: Iterable[str] = AUTOCOMPLETE_TYPES):
+        """Побудова індексів типів (при старті сервера)"""
+        for object_type in object_types:
+            self.index(object_type)
+
+    def complete(self, partial_text: str, object_type: str = 'street', limit: int = 10,
+                 city: str = None, district: str = None) -> List[dict]:
+        """Назви, що починаються з введеного тексту (з будь-якого слова), з оцінкою 0-100"""
+        index = self.index(object_type, candidate_scope(object_type, city, district))
+        query = self.comparator.normalize_text(partial_text, object_type)
+        if index is None or not query:
+            return []
+
+        self.stats['lookups'] += 1
+        ranks = index.lookup(query, limit)
+        phonetic = self.comparator.phonetic_form(query)
+        if phonetic and phonetic != query:
+            ranks = _best_ranks(ranks + index.lookup(phonetic, limit), limit)
+
+        if not ranks:
+            return self._fuzzy(partial_text, object_type, limit, city, district)
+        return [{'name': name, 'score': min(100, round(100 * len(query) / max(length, 1)))}
+                for _, _, length, name in ranks]
+
+    def _fuzzy(self, partial_text, object_type, limit, city, district):
+        """Нечіткий пошук по назвах знімка (префікс не знайдено - можлива опечатка)"""
+        self.stats['fallbacks'] += 1
+        snapshot = self.comparator._get_snapshot(object_type, candidate_scope(object_type, city, district))
+        all_objects = snapshot.names if snapshot else []
+        matches = process.extract(partial_text, all_objects, limit=limit)
+        return [{'name': name, 'score': score} for name, score in matches if score > 30]
@@ -0,0 +1,84 @@
+"""BK-дерево за відстанню Левенштейна для пошуку назв з опечатками
+
+Кожен вузол зберігає назву, а нащадки розкладені за відстанню до неї.
+Запит "всі назви на відстані не більше k" обходить лише гілки з відстанню
+в межах [d - k, d + k] (нерівність трикутника), тому перевіряє невелику
+частину довідника, а не всі назви, як process.extract.
+
+Назви порівнюються без урахування регістру та зайвих пробілів.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import Levenshtein
+
+
+def typo_key(name: str) -> str:
+    """Форма назви для порівняння: нижній регістр, одинарні пробіли"""
+    return ' '.join(str(name).lower().split())
+
+
+class _Node:
+    __slots__ = ('key', 'names', 'children')
+
+    def __init__(self, key: str, name: str):
+        self.key = key
+        self.names = [name]
+        self.children: Dict[int, '_Node'] = {}
+
+
+class BKTree:
+    """Метричне дерево назв для запитів "в межах k правок" """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.root: Optional[_Node] = None
+        self.size = 0
+        self.stats = {'queries': 0, 'distance_calls': 0}
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, name: str):
+        """Додавання назви (однакові за ключем назви зберігаються в одному вузлі)"""
+        key = typo_key(name)
+        if not key:
+            return
+        self.size += 1
+        if self.root is None:
+            self.root = _Node(key, name)
+            return
+
+        node = self.root
+        while True:
+            distance = Levenshtein.distance(key, node.key)
+            if distance == 0:
+                node.names.append(name)
+                return
+            child = node.children.get(distance)
+            if child is None:
+                node.children[distance] = _Node(key, name)
+                return
+            node = child
+
+    def search(self, query: str, max_distance: int = 2) -> List[Tuple[str, int]]:
+        """Назви на відстані Левенштейна не більше max_distance, від найближчих"""
+        key = typo_key(query)
+        if self.root is None or not key:
+            return []
+
+        self.stats['queries'] += 1
+        results = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = Levenshtein.distance(key, node.key)
+            self.stats['distance_calls'] += 1
+            if distance <= max_distance:
+                results.extend((name, distance) for name in node.names)
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for edge, child in node.children.items() if low <= edge <= high)
+
+        results.sort(key=lambda item: item[1])
+        return results
@@ -0,0 +1,114 @@
+"""Канонічна форма номера будівлі для пошуку за рівністю та числового сортування
+
+Номер розбирається на частини:
+  "12"            -> (12, '', '', '')
+  "12А", "12-а"   -> (12, 'А', '', '')
+  "12/3"          -> (12, '', '3', '')
+  "102, корп.3"   -> (102, '', '', '3')
+  "12 к2", "12к.2" -> (12, '', '', '2')
+Латинські літери, схожі на кириличні (A, B, E ...), зводяться до кириличних,
+тож "12A" і "12А" дають однакову канонічну форму "12А". Корпус може прийти
+окремою колонкою джерела (corp) - він використовується, якщо в номері його немає.
+
+Канонічна форма записується міграторами в колонки buildings.number_* і дозволяє
+знаходити будівлю на вулиці рівністю за індексом та сортувати номери як числа
+("2" перед "100").
+"""
+
+import re
+from typing import NamedTuple, Optional
+
+
+# Латинські двійники кириличних літер
+LATIN_TO_CYRILLIC = str.maketrans('ABCEHIKMOPTXY', 'АВСЕНІКМОРТХУ')
+
+# Префікси, які не є частиною номера
+NUMBER_PREFIX = re.compile(r'^\s*(?:буд(?:инок)?|б)\s*\.?\s*(?=\d)', re.IGNORECASE)
+
+# Корпус у тексті номера: "корп. 2", "корпус 2", "к.2", "к2"
+CORPUS_PATTERN = re.compile(r'[\s,]*(?:корпус|корп|кор|к)\s*\.?\s*(\w+)\s*$', re.IGNORECASE)
+
+# Слово "корпус" в окремій колонці корпусу
+CORPUS_PREFIX = re.compile(r'^\s*(?:корпус|корп|кор|к)\s*\.?\s*(?=\w)', re.IGNORECASE)
+
+# Номер: число, необов'язкова літера, необов'язковий дріб
+NUMBER_PATTERN = re.compile(
+    r'^(\d+)\s*-?\s*([^\W\d_]{0,2})\s*(?:/\s*(\w+))?$'
+)
+
+
+class BuildingNumber(NamedTuple):
+    """Розібраний номер будівлі"""
+    number: int
+    letter: str = ''
+    fraction: str = ''
+    corpus: str = ''
+
+    @property
+    def canonical(self) -> str:
+        """Канонічний текст: 12А/3 к2"""
+        text = f"{self.number}{self.letter}"
+        if self.fraction:
+            text += f"/{self.fraction}"
+        if self.corpus:
+            text += f" к{self.corpus}"
+        return text
+
+
+def _clean_part(value) -> str:
+    if value is None:
+        return ''
+    return re.sub(r'\s+', '', str(value)).upper().translate(LATIN_TO_CYRILLIC)
+
+
+def _corpus_value(corpus) -> str:
+    if corpus is None:
+        return ''
+    return CORPUS_PREFIX.sub('', str(corpus))
+
+
+def parse_building_number(number, corpus=None) -> Optional[BuildingNumber]:
+    """Розбір номера будівлі; None, якщо номер не починається з числа"""
+    if number is None:
+        return None
+
+    text = NUMBER_PREFIX.sub('', str(number).strip())
+    found_corpus = ''
+    match = CORPUS_PATTERN.search(text)
+    if match and match.start() > 0:
+        found_corpus = match.group(1)
+        text = text[:match.start()]
+
+    match = NUMBER_PATTERN.match(text.strip().rstrip(','))
+    if not match:
+        return None
+
+    value, letter, fraction = match.groups()
+    return BuildingNumber(
+        number=int(value),
+        letter=_clean_part(letter),
+        fraction=_clean_part(fraction),
+        corpus=_clean_part(found_corpus or _corpus_value(corpus)),
+    )
+
+
+def canonical_building_number(number, corpus=None) -> str:
+    """Канонічний текст номера; для нерозпізнаних - стиснутий текст у верхньому регістрі"""
+    parsed = parse_building_number(number, corpus)
+    if parsed:
+        return parsed.canonical
+    text = ' '.join(str(number or '').split()).upper()
+    corpus = _clean_part(_corpus_value(corpus))
+    return f"{text} к{corpus}" if text and corpus else text
+
+
+def building_number_columns(number, corpus=None) -> dict:
+    """Значення колонок buildings.number_* для запису міграторами"""
+    parsed = parse_building_number(number, corpus)
+    return {
+        'number_int': parsed.number if parsed else None,
+        'number_letter': parsed.letter if parsed else None,
+        'number_fraction': parsed.fraction if parsed else None,
+        'number_corpus': parsed.corpus if parsed else None,
+        'number_canonical': canonical_building_number(number, corpus) or None,
+    }
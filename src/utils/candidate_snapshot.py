@@ -0,0 +1,375 @@
+"""Версійований знімок назв-кандидатів для UniversalAddressComparator
+
+Замість SELECT DISTINCT на кожен виклик find_similar_objects_universal
+назви кожного типу об'єкта завантажуються в пам'ять один раз.
+Знімок типу перечитується з БД, коли:
+  - минув TTL (ttl секунд від останнього завантаження);
+  - викликано bump_version() (явна інвалідація, наприклад після масового оновлення).
+Мігратори доповнюють знімок інкрементально (add) після фіксації транзакції,
+тому нові назви стають кандидатами без перечитування всього довідника.
+
+Кожна зміна типу збільшує його версію - за нею можна інвалідувати
+похідні структури та кеші результатів.
+
+Якщо задано preparer (його реєструє UniversalAddressComparator), кожна назва
+зберігається разом з підготовленим записом CandidateEntry: нормалізована та
+фонетична форми, фонетичний ключ, множина токенів і довжина рахуються один
+раз при побудові знімка, а не при кожному порівнянні. Назви з однаковим
+фонетичним ключем групуються для пошуку за рівністю (phonetic_matches).
+
+Для назв вулиць, районів та міст знімок також тримає BK-дерево
+(typo_index) для пошуку назв з однією-двома опечатками.
+
+Знімки вулиць, районів міста та будівель можна обмежити областю (scope):
+містом та районом міста. Пошук у межах міста перебирає лише його назви,
+а не довідник усіх завантажених міст. Знімки областей завантажуються за
+потребою, кешуються окремо від загального знімка типу (не більше
+MAX_SCOPED_SNAPSHOTS, найдавніше використані витісняються) і мають власні версії.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+try:
+    from src.utils.bk_tree import BKTree
+    from src.utils.trigram_index import TrigramIndex
+except ImportError:
+    from bk_tree import BKTree
+    from trigram_index import TrigramIndex
+
+
+# Запити назв-кандидатів для кожного типу об'єкта
+CANDIDATE_QUERIES = {
+    'street': """
+        SELECT DISTINCT name FROM addrinity.street_names
+        WHERE is_current = TRUE AND name IS NOT NULL
+    """,
+    'district': """
+        SELECT DISTINCT name_uk FROM addrinity.city_districts
+        WHERE name_uk IS NOT NULL
+        UNION
+        SELECT DISTINCT name_uk FROM addrinity.districts
+        WHERE name_uk IS NOT NULL
+    """,
+    'street_type': """
+        SELECT DISTINCT name_uk FROM addrinity.street_types
+        WHERE name_uk IS NOT NULL
+        UNION
+        SELECT DISTINCT short_name_uk FROM addrinity.street_types
+        WHERE short_name_uk IS NOT NULL
+    """,
+    'city': """
+        SELECT DISTINCT name_uk FROM addrinity.cities
+        WHERE name_uk IS NOT NULL
+    """,
+    'building': """
+        SELECT DISTINCT number_canonical FROM addrinity.buildings
+        WHERE number_canonical IS NOT NULL AND number_canonical != ''
+    """
+}
+
+# Запити назв-кандидатів у межах міста / району міста (параметри city, district - в нижньому регістрі або NULL)
+SCOPED_CANDIDATE_QUERIES = {
+    'street': """
+        SELECT DISTINCT sn.name FROM addrinity.street_names sn
+        JOIN addrinity.street_entities se ON se.id = sn.street_entity_id
+        LEFT JOIN addrinity.cities c ON c.id = se.city_id
+        LEFT JOIN addrinity.city_districts cd ON cd.id = se.city_district_id
+        WHERE sn.is_current = TRUE AND sn.name IS NOT NULL
+        AND (%(city)s::text IS NULL OR lower(c.name_uk) = %(city)s)
+        AND (%(district)s::text IS NULL OR lower(cd.name_uk) = %(district)s)
+    """,
+    'district': """
+        SELECT DISTINCT cd.name_uk FROM addrinity.city_districts cd
+        JOIN addrinity.cities c ON c.id = cd.city_id
+        WHERE cd.name_uk IS NOT NULL AND lower(c.name_uk) = %(city)s
+    """,
+    'building': """
+        SELECT DISTINCT b.number_canonical FROM addrinity.buildings b
+        JOIN addrinity.street_entities se ON se.id = b.street_entity_id
+        LEFT JOIN addrinity.cities c ON c.id = se.city_id
+        LEFT JOIN addrinity.city_districts cd ON cd.id = se.city_district_id
+        WHERE b.number_canonical IS NOT NULL AND b.number_canonical != ''
+        AND (%(city)s::text IS NULL OR lower(c.name_uk) = %(city)s)
+        AND (%(district)s::text IS NULL OR lower(cd.name_uk) = %(district)s)
+    """
+}
+
+DEFAULT_TTL = 600
+
+# Скільки знімків областей (місто / район міста) тримати в пам'яті
+MAX_SCOPED_SNAPSHOTS = 64
+
+# Типи, для яких будується індекс опечаток (BK-дерево)
+TYPO_INDEX_TYPES = {'street', 'district', 'city'}
+
+
+class Scope(NamedTuple):
+    """Область пошуку кандидатів: місто та район міста (нижній регістр)"""
+    city: Optional[str] = None
+    district: Optional[str] = None
+
+
+def _scope_part(value) -> Optional[str]:
+    text = ' '.join(str(value).split()).lower() if value else ''
+    return text or None
+
+
+def candidate_scope(object_type: str, city: str = None, district: str = None) -> Optional[Scope]:
+    """Область кандидатів типу; None - весь довідник (тип не ділиться за областями або область не задана)"""
+    if object_type not in SCOPED_CANDIDATE_QUERIES:
+        return None
+    city, district = _scope_part(city), _scope_part(district)
+    if object_type == 'district':
+        # Райони міста обмежуються лише містом
+        district = None
+        if city is None:
+            return None
+    if city is None and district is None:
+        return None
+    return Scope(city, district)
+
+
+class CandidateEntry:
+    """Назва-кандидат з заздалегідь обчисленими формами для порівняння"""
+
+    __slots__ = ('name', 'normalized', 'phonetic', 'tokens', 'length',
+                 'processed', 'phonetic_processed', 'phonetic_key')
+
+    def __init__(self, name: str, normalized: str, phonetic: str, tokens: FrozenSet[str],
+                 processed: str = None, phonetic_processed: str = None, phonetic_key: str = ""):
+        self.name = name
+        self.normalized = normalized
+        self.phonetic = phonetic
+        self.tokens = tokens
+        self.length = len(normalized)
+        # Форми після процесора fuzzy-метрик (token_set_ratio) - щоб не обробляти кандидата щоразу
+        self.processed = normalized if processed is None else processed
+        self.phonetic_processed = phonetic if phonetic_processed is None else phonetic_processed
+        self.phonetic_key = phonetic_key
+
+    def __repr__(self):
+        return f"CandidateEntry({self.name!r}, normalized={self.normalized!r}, phonetic={self.phonetic!r})"
+
+
+class TypeSnapshot:
+    """Назви одного типу об'єкта з версією, часом завантаження та триграмним індексом"""
+
+    def __init__(self, names: Iterable[str] = (), object_type: str = None,
+                 preparer: Callable[[str, str], CandidateEntry] = None):
+        self.names: List[str] = []
+        self.entries: Dict[str, CandidateEntry] = {}
+        self.by_phonetic_key: Dict[str, List[str]] = {}
+        self.index = TrigramIndex()
+        self.typo_index = BKTree() if object_type in TYPO_INDEX_TYPES else None
+        self.object_type = object_type
+        self.preparer = preparer
+        self._known = set()
+        self.version = 0
+        self.loaded_at = time.monotonic()
+        self.extend(names)
+
+    def extend(self, names: Iterable[str]) -> int:
+        """Додавання нових назв (дублікати ігноруються); повертає кількість доданих"""
+        added = 0
+        for name in names:
+            if name and name not in self._known:
+                self._known.add(name)
+                self.names.append(name)
+                self.index.add(name)
+                if self.typo_index is not None:
+                    self.typo_index.add(name)
+                if self.preparer:
+                    self._add_entry(self.preparer(name, self.object_type))
+                added += 1
+        return added
+
+    def _add_entry(self, entry: CandidateEntry):
+        self.entries[entry.name] = entry
+        if entry.phonetic_key:
+            self.by_phonetic_key.setdefault(entry.phonetic_key, []).append(entry.name)
+
+    def prepare(self, preparer: Callable[[str, str], CandidateEntry]):
+        """Підготовка записів усіх назв новим preparer"""
+        self.preparer = preparer
+        self.entries = {}
+        self.by_phonetic_key = {}
+        for name in self.names:
+            self._add_entry(preparer(name, self.object_type))
+
+    def typo_matches(self, query: str, max_distance: int) -> List[str]:
+        """Назви в межах max_distance правок (порожньо, якщо індекс не будується)"""
+        if self.typo_index is None:
+            return []
+        return [name for name, _ in self.typo_index.search(query, max_distance)]
+
+    def phonetic_matches(self, key: str) -> List[str]:
+        """Назви з тим самим фонетичним ключем"""
+        return self.by_phonetic_key.get(key, []) if key else []
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._known
+
+    def entry(self, name: str) -> Optional[CandidateEntry]:
+        """Підготовлений запис назви (None, якщо preparer не задано)"""
+        return self.entries.get(name)
+
+
+def _function(preparer):
+    """Функція, що стоїть за preparer (для методів - без прив'язки до екземпляра)"""
+    return getattr(preparer, '__func__', preparer)
+
+
+class CandidateSnapshot:
+    """Знімки назв-кандидатів по типах об'єктів (та областях пошуку)"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, preparer: Callable[[str, str], CandidateEntry] = None,
+                 max_scoped: int = MAX_SCOPED_SNAPSHOTS):
+        self.ttl = ttl
+        self.preparer = preparer
+        self.max_scoped = max_scoped
+        self._snapshots: Dict[str, TypeSnapshot] = {}
+        self._scoped: Dict[tuple, TypeSnapshot] = OrderedDict()
+        self._stale = set()
+        self._versions: Dict[object, int] = {}
+        self._lock = threading.RLock()
+        self.stats = {'loads': 0, 'hits': 0, 'incremental_adds': 0, 'scoped_loads': 0, 'scoped_evictions': 0}
+
+    @staticmethod
+    def _key(object_type: str, scope: Optional[Scope]):
+        return object_type if scope is None else (object_type, scope)
+
+    def _stored(self, key) -> Optional[TypeSnapshot]:
+        if isinstance(key, tuple):
+            return self._scoped.get(key)
+        return self._snapshots.get(key)
+
+    def _is_fresh(self, key) -> bool:
+        snapshot = self._stored(key)
+        return (snapshot is not None and key not in self._stale
+                and time.monotonic() - snapshot.loaded_at < self.ttl)
+
+    def is_fresh(self, object_type: str, scope: Scope = None) -> bool:
+        """Чи можна використати знімок типу (області) без звернення до БД"""
+        with self._lock:
+            return self._is_fresh(self._key(object_type, scope))
+
+    def _next_version(self, key) -> int:
+        self._versions[key] = self._versions.get(key, 0) + 1
+        return self._versions[key]
+
+    def load(self, object_type: str, cursor, scope: Scope = None) -> TypeSnapshot:
+        """Завантаження назв типу (в межах області) з БД одним запитом"""
+        if scope is None:
+            cursor.execute(CANDIDATE_QUERIES[object_type])
+        else:
+            cursor.execute(SCOPED_CANDIDATE_QUERIES[object_type], scope._asdict())
+        return self.install(object_type, (row[0] for row in cursor.fetchall()), scope)
+
+    def install(self, object_type: str, names: Iterable[str], scope: Scope = None) -> TypeSnapshot:
+        """Встановлення знімка типу з готового списку назв (без БД, наприклад у воркері)"""
+        snapshot = TypeSnapshot(names, object_type, self.preparer)
+        key = self._key(object_type, scope)
+
+        with self._lock:
+            snapshot.version = self._next_version(key)
+            self._stale.discard(key)
+            if scope is None:
+                self._snapshots[object_type] = snapshot
+                self.stats['loads'] += 1
+            else:
+                self._scoped[key] = snapshot
+                self._scoped.move_to_end(key)
+                self.stats['scoped_loads'] += 1
+                while len(self._scoped) > self.max_scoped:
+                    evicted, _ = self._scoped.popitem(last=False)
+                    self._stale.discard(evicted)
+                    self.stats['scoped_evictions'] += 1
+        return snapshot
+
+    def get(self, object_type: str, cursor=None, scope: Scope = None) -> Optional[TypeSnapshot]:
+        """Актуальний знімок типу (області); перечитується з БД після TTL або bump_version()"""
+        if object_type not in CANDIDATE_QUERIES:
+            return None
+        if scope is not None and object_type not in SCOPED_CANDIDATE_QUERIES:
+            scope = None
+        key = self._key(object_type, scope)
+
+        with self._lock:
+            if self._is_fresh(key):
+                self.stats['hits'] += 1
+                if scope is not None:
+                    self._scoped.move_to_end(key)
+                return self._stored(key)
+
+        if cursor is None:
+            # Без з'єднання повертаємо те, що є (може бути застарілим)
+            return self._stored(key)
+        return self.load(object_type, cursor, scope)
+
+    def _all_snapshots(self) -> List[TypeSnapshot]:
+        return list(self._snapshots.values()) + list(self._scoped.values())
+
+    def set_preparer(self, preparer: Callable[[str, str], CandidateEntry]):
+        """Реєстрація функції підготовки записів; вже завантажені знімки готуються одразу"""
+        with self._lock:
+            if preparer == self.preparer:
+                return
+            if _function(preparer) is _function(self.preparer):
+                # Та сама функція іншого екземпляра компаратора - записи вже підготовлені нею
+                self.preparer = preparer
+                for snapshot in self._all_snapshots():
+                    snapshot.preparer = preparer
+                return
+            self.preparer = preparer
+            for snapshot in self._all_snapshots():
+                snapshot.prepare(preparer)
+
+    def names(self, object_type: str, cursor=None, scope: Scope = None) -> List[str]:
+        """Список назв-кандидатів типу (області)"""
+        snapshot = self.get(object_type, cursor, scope)
+        return snapshot.names if snapshot else []
+
+    def version(self, object_type: str, scope: Scope = None) -> int:
+        """Поточна версія типу або області (змінюється при кожному завантаженні чи доповненні)"""
+        with self._lock:
+            return self._versions.get(self._key(object_type, scope), 0)
+
+    def _scoped_keys(self, object_type: str) -> List[tuple]:
+        return [key for key in self._scoped if key[0] == object_type]
+
+    def add(self, object_type: str, names: Iterable[str]) -> int:
+        """Інкрементальне доповнення знімка новими назвами (від міграторів)"""
+        with self._lock:
+            snapshot = self._snapshots.get(object_type)
+            if snapshot is None:
+                # Знімок ще не завантажено - його перше завантаження прочитає ці назви з БД
+                return 0
+            added = snapshot.extend(names)
+            if added:
+                snapshot.version = self._next_version(object_type)
+                self.stats['incremental_adds'] += added
+                # Область нових назв невідома - знімки областей перечитаються при наступному get()
+                for key in self._scoped_keys(object_type):
+                    self._stale.add(key)
+                    self._next_version(key)
+            return added
+
+    def bump_version(self, object_type: str = None):
+        """Явна інвалідація типу (або всіх типів) разом з його областями; наступний get() перечитає БД"""
+        with self._lock:
+            for current_type in ([object_type] if object_type else list(CANDIDATE_QUERIES)):
+                for key in [current_type] + self._scoped_keys(current_type):
+                    self._stale.add(key)
+                    self._next_version(key)
+
+
+# Глобальний екземпляр
+candidate_snapshot = CandidateSnapshot()
+
+
+def get_candidate_snapshot():
+    """Отримання глобального знімка назв-кандидатів"""
+    return candidate_snapshot
@@ -0,0 +1,122 @@
+"""Лічильник версії адресних даних для інвалідації кешів результатів пошуку
+
+Мігратори збільшують версію в addrinity.data_versions тією ж транзакцією,
+що й зміни даних (HierarchyResolver.commit), тож нова версія стає видимою
+разом з даними. Пошукові системи додають версію до ключа кешу результатів:
+після міграції старі записи більше не знаходяться і витісняються LRU.
+
+Версія з БД перечитується не частіше, ніж раз на check_interval секунд
+(DATA_VERSION_CHECK_INTERVAL), тому кеш може віддавати результати,
+застарілі не більше ніж на цей інтервал. Зміни, зроблені в тому ж процесі,
+інвалідують кеш одразу (локальний лічильник).
+
+Якщо таблиці ще немає (setup/Script-333.sql не застосовано), версія з БД
+вважається нульовою, а мігратори працюють як раніше.
+"""
+
+import threading
+import time
+from typing import Optional, Tuple
+
+import psycopg2
+
+try:
+    from config.database import CACHE_CONFIG
+except ImportError:
+    CACHE_CONFIG = {}
+
+
+# Назва лічильника адресних даних (вулиці, райони, будівлі)
+ADDRESS_DATA = 'addresses'
+
+DATA_VERSION_QUERY = "SELECT version FROM addrinity.data_versions WHERE name = %s"
+
+BUMP_QUERY = """
+    INSERT INTO addrinity.data_versions (name, version, updated_at)
+    VALUES (%s, 1, NOW())
+    ON CONFLICT (name) DO UPDATE SET
+        version = addrinity.data_versions.version + 1,
+        updated_at = NOW()
+    RETURNING version
+"""
+
+
+class DataVersion:
+    """Версія даних: значення з БД (з інтервалом перевірки) та локальні зміни процесу"""
+
+    def __init__(self, name: str = ADDRESS_DATA, check_interval: float = None):
+        self.name = name
+        self.check_interval = (check_interval if check_interval is not None
+                               else CACHE_CONFIG.get('data_version_check_interval', 5.0))
+        self._db_version = 0
+        self._local_version = 0
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self.stats = {'checks': 0, 'changes': 0, 'bumps': 0, 'errors': 0}
+
+    def current(self) -> Tuple[int, int]:
+        """Поточна версія для ключа кешу: (версія в БД, локальні зміни)"""
+        return self._db_version, self._local_version
+
+    def due(self) -> bool:
+        """Чи час перечитати версію з БД"""
+        checked_at = self._checked_at
+        return checked_at is None or time.monotonic() - checked_at >= self.check_interval
+
+    def update(self, db_version: Optional[int]):
+        """Встановлення версії, прочитаної з БД (None - лічильника ще немає)"""
+        with self._lock:
+            self.stats['checks'] += 1
+            self._checked_at = time.monotonic()
+            db_version = db_version or 0
+            if db_version != self._db_version:
+                self._db_version = db_version
+                self.stats['changes'] += 1
+
+    def refresh(self, cursor) -> Tuple[int, int]:
+        """Перечитування версії з БД, якщо минув check_interval"""
+        if cursor is not None and self.due():
+            try:
+                cursor.execute(DATA_VERSION_QUERY, (self.name,))
+                row = cursor.fetchone()
+                self.update(row[0] if row else None)
+            except psycopg2.Error:
+                # Таблиці немає - пробуємо знову через check_interval
+                self.failed()
+        return self.current()
+
+    def failed(self):
+        """Версію не вдалося прочитати: попередня діє до наступної перевірки"""
+        with self._lock:
+            self.stats['errors'] += 1
+            self._checked_at = time.monotonic()
+
+    def bump(self, cursor=None) -> Tuple[int, int]:
+        """Збільшення версії після зміни даних (в поточній транзакції cursor, до commit)"""
+        with self._lock:
+            self._local_version += 1
+            self.stats['bumps'] += 1
+
+        if cursor is not None:
+            # Точка збереження: відсутня таблиця не перериває транзакцію мігратора
+            cursor.execute("SAVEPOINT data_version_bump")
+            try:
+                cursor.execute(BUMP_QUERY, (self.name,))
+                version = cursor.fetchone()[0]
+                cursor.execute("RELEASE SAVEPOINT data_version_bump")
+                with self._lock:
+                    self._db_version = version
+            except psycopg2.Error:
+                cursor.execute("ROLLBACK TO SAVEPOINT data_version_bump")
+                with self._lock:
+                    self.stats['errors'] += 1
+        return self.current()
+
+
+# Глобальний екземпляр (спільний для міграторів і пошуку в одному процесі)
+data_version = DataVersion()
+
+
+def get_data_version():
+    """Отримання глобального лічильника версії адресних даних"""
+    return data_version
@@ -0,0 +1,206 @@
+"""Пул з'єднань PostgreSQL для пошукової системи
+
+AddressSearchEngine обслуговує паралельні запити API, тому не може тримати
+одне з'єднання з одним курсором. Кожен запит бере з'єднання з пулу
+(psycopg2.pool.ThreadedConnectionPool) на час виконання і повертає його:
+
+    with pool.cursor() as cursor:
+        cursor.execute(...)
+
+Розміри пулу, час очікування та інтервал перевірки задаються в
+config/database.py (змінні середовища DB_POOL_MIN, DB_POOL_MAX,
+DB_POOL_TIMEOUT, DB_POOL_HEALTH_CHECK).
+
+  - Коли всі maxconn з'єднань зайняті, запит чекає вільне до timeout секунд
+    (ThreadedConnectionPool в такому разі одразу кидає PoolError).
+  - З'єднання, що простояло довше health_check_interval, перевіряється
+    SELECT 1 перед видачею; розірване закривається і замінюється новим.
+  - Після запиту незавершена транзакція відкочується, зламане з'єднання
+    не повертається в пул.
+  - Пул створюється при першому запиті, а не при імпорті.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2 import extensions
+
+try:
+    from config.database import CONNECTION_STRING, POOL_CONFIG
+except ImportError:
+    CONNECTION_STRING, POOL_CONFIG = None, {}
+
+
+class PoolTimeout(pg_pool.PoolError):
+    """Немає вільного з'єднання протягом timeout секунд"""
+
+
+class ConnectionPool:
+    """Потокобезпечний пул з'єднань з очікуванням, перевіркою з'єднань та метриками"""
+
+    def __init__(self, dsn: str = None, minconn: int = None, maxconn: int = None,
+                 timeout: float = None, health_check_interval: float = None):
+        self.dsn = dsn or CONNECTION_STRING
+        self.minconn = minconn if minconn is not None else POOL_CONFIG.get('minconn', 1)
+        self.maxconn = maxconn if maxconn is not None else POOL_CONFIG.get('maxconn', 10)
+        self.timeout = timeout if timeout is not None else POOL_CONFIG.get('timeout', 30.0)
+        self.health_check_interval = (health_check_interval if health_check_interval is not None
+                                      else POOL_CONFIG.get('health_check_interval', 30.0))
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._last_used = {}
+        self.stats = {
+            'checkouts': 0, 'waits': 0, 'wait_seconds': 0.0, 'timeouts': 0,
+            'in_use': 0, 'max_in_use': 0, 'health_checks': 0, 'reconnects': 0, 'discarded': 0
+        }
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = pg_pool.ThreadedConnectionPool(self.minconn, self.maxconn, self.dsn)
+        return self._pool
+
+    def _is_healthy(self, connection) -> bool:
+        """Перевірка з'єднання: закрите - зламане; давно не використане - SELECT 1"""
+        if connection.closed:
+            return False
+        last_used = self._last_used.get(id(connection))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+
+        self.stats['health_checks'] += 1
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, pool, connection):
+        """Закриття зламаного з'єднання (його місце в пулі звільняється)"""
+        self._last_used.pop(id(connection), None)
+        self.stats['discarded'] += 1
+        try:
+            pool.putconn(connection, close=True)
+        except pg_pool.PoolError:
+            pass
+
+    def getconn(self):
+        """Видача здорового з'єднання; чекає вільне не довше timeout секунд"""
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            self.stats['waits'] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                self.stats['timeouts'] += 1
+                raise PoolTimeout(f"Немає вільного з'єднання протягом {self.timeout} с "
+                                  f"(зайнято {self.stats['in_use']} з {self.maxconn})")
+            self.stats['wait_seconds'] += time.monotonic() - started
+
+        try:
+            pool = self._get_pool()
+            connection = pool.getconn()
+            if not self._is_healthy(connection):
+                self._discard(pool, connection)
+                self.stats['reconnects'] += 1
+                connection = pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.stats['checkouts'] += 1
+            self.stats['in_use'] += 1
+            self.stats['max_in_use'] = max(self.stats['max_in_use'], self.stats['in_use'])
+        return connection
+
+    def putconn(self, connection):
+        """Повернення з'єднання: незавершена транзакція відкочується, зламане закривається"""
+        pool = self._pool
+        try:
+            if pool is None:
+                connection.close()
+            elif connection.closed or connection.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN:
+                self._discard(pool, connection)
+            else:
+                try:
+                    connection.rollback()
+                    self._last_used[id(connection)] = time.monotonic()
+                    pool.putconn(connection)
+                except psycopg2.Error:
+                    self._discard(pool, connection)
+        finally:
+            with self._lock:
+                self.stats['in_use'] -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """З'єднання з пулу на час блоку with"""
+        connection = self.getconn()
+        try:
+            yield connection
+        finally:
+            self.putconn(connection)
+
+    @contextmanager
+    def cursor(self):
+        """Курсор на з'єднанні з пулу; з'єднання повертається після блоку with"""
+        with self.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                yield cursor
+            finally:
+                if not connection.closed:
+                    cursor.close()
+
+    def metrics(self) -> dict:
+        """Метрики пулу: розміри, зайняті з'єднання, очікування, перевірки"""
+        pool = self._pool
+        idle = len(pool._pool) if pool is not None else 0
+        return {
+            **self.stats,
+            'wait_seconds': round(self.stats['wait_seconds'], 3),
+            'minconn': self.minconn,
+            'maxconn': self.maxconn,
+            'idle': idle,
+            'open': idle + self.stats['in_use'] if pool is not None else 0,
+        }
+
+    def health_check(self) -> bool:
+        """Перевірка доступності БД через з'єднання з пулу"""
+        try:
+            with self.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                return cursor.fetchone()[0] == 1
+        except (psycopg2.Error, pg_pool.PoolError):
+            return False
+
+    def close(self):
+        """Закриття всіх з'єднань; наступний запит створить пул заново"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._last_used.clear()
+
+
+# Глобальний екземпляр (створюється при першому виклику get_connection_pool)
+connection_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    """Отримання глобального пулу з'єднань"""
+    global connection_pool
+    if connection_pool is None:
+        with _pool_lock:
+            if connection_pool is None:
+                connection_pool = ConnectionPool()
+    return connection_pool
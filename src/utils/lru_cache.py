@@ -0,0 +1,86 @@
+"""Обмежений LRU-кеш з лічильниками влучань
+
+Використовується для мемоізації результатів компаратора: повторні назви
+(ті самі вулиці та райони в кожному рядку джерела) коштують одного
+звернення до словника. При переповненні витісняється найдавніше
+використаний запис.
+
+Якщо задано ttl (секунд), запис старший за ttl вважається відсутнім
+(промах, лічильник expirations) і видаляється при зверненні. Окремий запис
+може мати власний ttl (put(..., ttl=...)), наприклад коротший для порожніх
+результатів пошуку.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Потокобезпечний LRU-кеш на OrderedDict з необов'язковим TTL та статистикою hits/misses/evictions"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        # Ключ -> момент (time.monotonic), після якого запис застарів (лише для записів з TTL)
+        self._expires = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Значення за ключем (запис стає найсвіжішим) або default"""
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING and key in self._expires and time.monotonic() >= self._expires[key]:
+                del self._data[key]
+                del self._expires[key]
+                self.stats['expirations'] += 1
+                value = _MISSING
+            if value is _MISSING:
+                self.stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, ttl: float = None):
+        """Збереження значення (ttl - власний строк запису) з витісненням найдавніших записів"""
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if ttl is not None:
+                self._expires[key] = time.monotonic() + ttl
+            else:
+                self._expires.pop(key, None)
+            while len(self._data) > self.maxsize:
+                evicted, _ = self._data.popitem(last=False)
+                self._expires.pop(evicted, None)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        """Очищення кешу (статистика зберігається)"""
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        """Частка влучань серед усіх звернень"""
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def info(self) -> dict:
+        """Статистика кешу разом з розміром та часткою влучань"""
+        return {**self.stats, 'size': len(self._data), 'maxsize': self.maxsize,
+                'hit_rate': round(self.hit_rate, 4)}
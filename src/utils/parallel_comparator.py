@@ -0,0 +1,189 @@
+"""Паралельний фронтенд UniversalAddressComparator для великих обсягів валідації
+
+Нечітке порівняння - чисто процесорна робота, тому великі списки назв
+розподіляються між процесами пулу частинами (chunk_size назв на задачу).
+Знімок кандидатів передається воркерам один раз при старті пулу, а не
+з кожною задачею:
+  - fork (Linux) - воркери успадковують уже завантажений знімок разом з
+    триграмним індексом, BK-деревом та підготовленими записами;
+  - spawn (Windows, macOS) - воркер отримує списки назв в initializer
+    і будує знімок сам, один раз.
+Воркери не мають з'єднання з БД (connect=False), тому знімки потрібних типів
+(і областей city / district) завантажуються в батьківському процесі до
+створення пулу. Пул пам'ятає версії знімків, з якими його запущено, і
+перезапускається, щойно версія змінилася (add() від міграторів після пачки,
+перечитування після TTL, bump_version()) - воркери не працюють зі старим знімком.
+
+API збігається з однопроцесним компаратором:
+find_similar_objects_universal, validate_object_universally та
+calculate_comprehensive_similarity (одна назва) виконуються локально,
+а *_many-методи розподіляють списки між воркерами.
+"""
+
+import multiprocessing
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from src.utils.candidate_snapshot import candidate_scope
+    from src.utils.validators import UniversalAddressComparator, get_universal_comparator
+except ImportError:
+    from candidate_snapshot import candidate_scope
+    from validators import UniversalAddressComparator, get_universal_comparator
+
+
+# Компаратор процесу-воркера (створюється в initializer)
+_worker_comparator = None
+
+
+def _init_worker(snapshot, names_by_key):
+    """Ініціалізація воркера: компаратор без БД зі знімком батьківського процесу"""
+    global _worker_comparator
+    comparator = UniversalAddressComparator(connect=False)
+    if snapshot is not None:
+        # fork: об'єкт знімка успадковано без серіалізації
+        comparator.snapshot = snapshot
+        snapshot.set_preparer(comparator.prepare_candidate)
+    for (object_type, scope), names in (names_by_key or {}).items():
+        comparator.snapshot.install(object_type, names, scope)
+    _worker_comparator = comparator
+
+
+def _find_chunk(task):
+    names, object_type, threshold, city, district = task
+    return [(name, _worker_comparator.find_similar_objects_universal(name, object_type, threshold,
+                                                                     city=city, district=district))
+            for name in names]
+
+
+def _validate_chunk(task):
+    names, object_type, city, district = task
+    return list(_worker_comparator.validate_many(names, object_type, city, district).items())
+
+
+def _pairs_chunk(task):
+    pairs, object_type = task
+    return [_worker_comparator.calculate_comprehensive_similarity(first, second, object_type)
+            for first, second in pairs]
+
+
+class ParallelComparator:
+    """Розподіл нечіткого порівняння між процесами зі спільним знімком кандидатів"""
+
+    def __init__(self, comparator: UniversalAddressComparator = None, workers: int = None,
+                 chunk_size: int = 50):
+        self.comparator = comparator or get_universal_comparator()
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._pool = None
+        # (тип, область) -> версія знімка, переданого воркерам пулу
+        self._pool_versions = {}
+        self.stats = {'pools_started': 0, 'tasks': 0, 'items': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Однопроцесні виклики - без накладних витрат пулу
+
+    def find_similar_objects_universal(self, target_name, object_type, threshold=0.8, city=None, district=None):
+        return self.comparator.find_similar_objects_universal(target_name, object_type, threshold,
+                                                              city=city, district=district)
+
+    def validate_object_universally(self, target_name, object_type, city=None, district=None):
+        return self.comparator.validate_object_universally(target_name, object_type, city=city, district=district)
+
+    def calculate_comprehensive_similarity(self, str1, str2, object_type=None):
+        return self.comparator.calculate_comprehensive_similarity(str1, str2, object_type)
+
+    # Пакетні виклики через пул
+
+    def _snapshot_versions(self, keys: Iterable[tuple]) -> Dict[tuple, int]:
+        """Поточні версії знімків пар (тип, область), за потреби перечитаних у батьківському процесі"""
+        versions = {}
+        for object_type, scope in keys:
+            # Знімки завантажуються тут: воркери не мають з'єднання
+            self.comparator._get_snapshot(object_type, scope)
+            versions[(object_type, scope)] = self.comparator.snapshot.version(object_type, scope)
+        return versions
+
+    def _get_pool(self, keys: Iterable[tuple]):
+        """Пул воркерів зі знімками потрібних пар (тип, область); перестворюється для нових пар та версій"""
+        versions = self._snapshot_versions(set(keys) | set(self._pool_versions))
+        if self._pool is not None and versions == self._pool_versions:
+            return self._pool
+
+        self.close()
+        keys = list(versions)
+
+        snapshot = self.comparator.snapshot
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+            initargs = (snapshot, None)
+        else:
+            context = multiprocessing.get_context()
+            initargs = (None, {(object_type, scope): list(snapshot.names(object_type, scope=scope))
+                               for object_type, scope in keys})
+
+        self._pool = context.Pool(self.workers, initializer=_init_worker, initargs=initargs)
+        self._pool_versions = versions
+        self.stats['pools_started'] += 1
+        return self._pool
+
+    def _chunks(self, items: list) -> List[list]:
+        return [items[start:start + self.chunk_size] for start in range(0, len(items), self.chunk_size)]
+
+    def _map(self, function, key: Optional[tuple], chunks: List[tuple]) -> list:
+        """key - пара (тип, область), знімок якої потрібен воркерам; None - знімок не потрібен"""
+        if self.workers <= 1 or len(chunks) <= 1:
+            # Немає сенсу запускати пул: виконуємо в поточному процесі
+            global _worker_comparator
+            previous, _worker_comparator = _worker_comparator, self.comparator
+            try:
+                return [function(chunk) for chunk in chunks]
+            finally:
+                _worker_comparator = previous
+
+        pool = self._get_pool([key] if key else [])
+        self.stats['tasks'] += len(chunks)
+        return pool.map(function, chunks)
+
+    def find_similar_many(self, names: Iterable[str], object_type: str, threshold: float = 0.8,
+                          city: str = None, district: str = None) -> Dict[str, List[Tuple[str, float]]]:
+        """find_similar_objects_universal для списку назв: назва -> схожі об'єкти (в області city / district)"""
+        unique_names = [name for name in dict.fromkeys(names) if name]
+        self.stats['items'] += len(unique_names)
+        chunks = [(chunk, object_type, threshold, city, district) for chunk in self._chunks(unique_names)]
+        key = (object_type, candidate_scope(object_type, city, district))
+        return {name: matches
+                for result in self._map(_find_chunk, key, chunks)
+                for name, matches in result}
+
+    def validate_many(self, names: Iterable[str], object_type: str,
+                      city: str = None, district: str = None) -> Dict[str, dict]:
+        """validate_many з розподілом унікальних назв між воркерами"""
+        unique_names = [name for name in dict.fromkeys(names) if name]
+        self.stats['items'] += len(unique_names)
+        chunks = [(chunk, object_type, city, district) for chunk in self._chunks(unique_names)]
+        key = (object_type, candidate_scope(object_type, city, district))
+        return {name: result
+                for results in self._map(_validate_chunk, key, chunks)
+                for name, result in results}
+
+    def calculate_many(self, pairs: List[Tuple[str, str]], object_type: Optional[str] = None) -> List[float]:
+        """Оцінки схожості для списку пар (у тому ж порядку)"""
+        pairs = list(pairs)
+        self.stats['items'] += len(pairs)
+        chunks = [(chunk, object_type) for chunk in self._chunks(pairs)]
+        # Парна оцінка не потребує знімка кандидатів
+        return [score for scores in self._map(_pairs_chunk, None, chunks) for score in scores]
+
+    def close(self):
+        """Зупинка пулу воркерів"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self._pool_versions = {}
@@ -0,0 +1,99 @@
+"""Фонетичний ключ для українських назв (блокування та пошук кандидатів)
+
+Ключ зводить до однакової форми варіанти написання, які розрізняються
+регістром, апострофом, м'яким знаком, подвоєними літерами та близькими
+за звучанням літерами (і/и/ї/й, є/е, ю/у, я/а, ґ/г). Правила замін ті самі,
+що й у UniversalAddressComparator.calculate_ukrainian_phonetic_similarity.
+
+Заміни окремих літер виконуються одним str.translate за заздалегідь
+побудованою таблицею, сполучення літер (кс, гз, ...) - після них.
+Ключ зберігається в колонці phonetic_key таблиць street_names, city_districts
+та cities, тож фонетично однакові назви знаходяться пошуком за рівністю.
+"""
+
+import re
+
+
+# Заміни окремих літер
+PHONETIC_LETTERS = {
+    'і': 'и', 'ї': 'и', 'є': 'е', 'ґ': 'г',
+    'й': 'и', 'ю': 'у', 'я': 'а',
+}
+
+# Заміни сполучень літер (виконуються після замін окремих літер, у цьому порядку)
+PHONETIC_COMBINATIONS = (
+    ('кс', 'х'), ('гз', 'з'), ('дз', 'з'), ('тц', 'ц'), ('дц', 'ц'),
+)
+
+# Символи, які не впливають на звучання
+SILENT_CHARACTERS = "ь'ʼ’`\""
+
+# Таблиці для str.translate: фонетична форма, видалення "німих" символів та ключ
+LETTERS_TABLE = str.maketrans(PHONETIC_LETTERS)
+SILENT_TABLE = str.maketrans({character: None for character in SILENT_CHARACTERS})
+KEY_TABLE = str.maketrans({**PHONETIC_LETTERS, **{character: None for character in SILENT_CHARACTERS}})
+
+DOUBLED_LETTERS = re.compile(r'(\w)\1+')
+WORDS = re.compile(r'\w+')
+KEY_WORDS = re.compile(r'[\w/]+')
+
+# Типи вулиць, які не входять до ключа назви
+STREET_TYPE_WORDS = {
+    'вулиця', 'вул', 'проспект', 'просп', 'бульвар', 'бул', 'провулок', 'пров',
+    'шосе', 'ш', 'тупик', 'туп', 'майдан', 'майд', 'алея', 'ал', 'площа', 'пл',
+    'набережна', 'наб', 'узвіз', 'проїзд', 'житловий', 'масив', 'ж/м',
+}
+
+# Службові слова, які не входять до ключа, для кожного типу об'єкта
+IGNORED_WORDS = {
+    'street': STREET_TYPE_WORDS,
+    'district': {'район', 'м'},
+    'city': {'м', 'місто', 'смт', 'с', 'село', 'селище'},
+}
+
+
+def _apply_combinations(text: str) -> str:
+    for old, new in PHONETIC_COMBINATIONS:
+        if old in text:
+            text = text.replace(old, new)
+    return text
+
+
+def apply_phonetic_rules(text: str) -> str:
+    """Фонетичні заміни без інших змін тексту (форма для метрик компаратора)"""
+    if not text:
+        return ""
+    return _apply_combinations(str(text).lower().translate(LETTERS_TABLE))
+
+
+def phonetic_form(text: str) -> str:
+    """Фонетична форма тексту (слова зберігаються, розділені пробілом)"""
+    if not text:
+        return ""
+
+    result = _apply_combinations(str(text).lower().translate(KEY_TABLE))
+    # Подвоєні літери звучать як одна (Мостова / Мосттова)
+    result = DOUBLED_LETTERS.sub(r'\1', result)
+    return ' '.join(WORDS.findall(result))
+
+
+def phonetic_key(text: str, object_type: str = 'street') -> str:
+    """Фонетичний ключ назви об'єкта: фонетична форма слів без службових, у відсортованому порядку
+
+    Порядок слів не враховується ('Старий Шлях' та 'ШЛЯХ СТАРИЙ' мають однаковий ключ).
+    """
+    if not text:
+        return ""
+
+    words = KEY_WORDS.findall(str(text).lower().translate(SILENT_TABLE))
+    ignored = IGNORED_WORDS.get(object_type)
+    if ignored:
+        words = [word for word in words if word.rstrip('.') not in ignored] or words
+
+    forms = (phonetic_form(word) for word in words)
+    return ' '.join(sorted(form for form in forms if form))
+
+
+def ukrainian_phonetic_key(text: str, drop_street_types: bool = True) -> str:
+    """Фонетичний ключ назви вулиці (drop_street_types=False - з типом вулиці)"""
+    return phonetic_key(text, 'street' if drop_street_types else None)
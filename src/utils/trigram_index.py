@@ -0,0 +1,72 @@
+"""Інвертований триграмний індекс назв для швидкого відбору кандидатів
+
+Для кожної триграми зберігається список назв, у яких вона є. Пошук рахує
+спільні триграми лише по спискам триграм запиту, тож вартість залежить від
+кількості назв, що мають спільні триграми з запитом, а не від розміру
+довідника. Дуже поширені триграми (наприклад '  в' у 'вулиця') не використовуються
+для відбору, якщо в запиті достатньо рідкісніших; схожість відібраних кандидатів
+рахується точно за повними множинами триграм.
+"""
+
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+try:
+    from src.utils.trigrams import set_similarity, trigrams
+except ImportError:
+    from trigrams import set_similarity, trigrams
+
+
+class TrigramIndex:
+    """Інвертований індекс: триграма -> номери назв"""
+
+    def __init__(self, names: Iterable[str] = (), common_fraction: float = 0.2,
+                 min_common_size: int = 100, min_rare_trigrams: int = 3):
+        self.names: List[str] = []
+        self.grams: List[FrozenSet[str]] = []
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        # Частка назв, після якої триграма вважається поширеною
+        self.common_fraction = common_fraction
+        # У малих довідниках поширених триграм не буває
+        self.min_common_size = min_common_size
+        self.min_rare_trigrams = min_rare_trigrams
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name: str):
+        """Додавання назви до індексу"""
+        position = len(self.names)
+        grams = trigrams(name)
+        self.names.append(name)
+        self.grams.append(grams)
+        for gram in grams:
+            self.postings[gram].append(position)
+
+    def search(self, query: str, limit: int = 50, min_similarity: float = 0.0) -> List[Tuple[str, float]]:
+        """Назви з найбільшою триграмною схожістю (pg_trgm similarity) до запиту"""
+        query_grams = trigrams(query)
+        if not query_grams or not self.names:
+            return []
+
+        grams = sorted((gram for gram in query_grams if gram in self.postings),
+                       key=lambda gram: len(self.postings[gram]))
+        common_limit = max(self.min_common_size, int(len(self.names) * self.common_fraction))
+        rare = [gram for gram in grams if len(self.postings[gram]) <= common_limit]
+        if len(rare) >= self.min_rare_trigrams:
+            grams = rare
+
+        candidates = set()
+        for gram in grams:
+            candidates.update(self.postings[gram])
+
+        scored = []
+        for position in candidates:
+            similarity = set_similarity(query_grams, self.grams[position])
+            if similarity >= min_similarity:
+                scored.append((similarity, position))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(self.names[position], similarity) for similarity, position in scored[:limit]]
@@ -0,0 +1,39 @@
+"""Триграми у форматі pg_trgm без звернення до БД
+
+Текст переводиться в нижній регістр і розбивається на слова з букв та цифр;
+кожне слово доповнюється двома пробілами спереду та одним ззаду
+('вул' -> '  вул ') і розкладається на триграми. Результат - множина,
+як у show_trgm() PostgreSQL.
+"""
+
+import re
+from typing import FrozenSet
+
+
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Множина триграм тексту (аналог show_trgm)"""
+    if not text:
+        return frozenset()
+
+    result = set()
+    for word in WORD_PATTERN.findall(str(text).lower()):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            result.add(padded[i:i + 3])
+    return frozenset(result)
+
+
+def trigram_similarity(first: str, second: str) -> float:
+    """Схожість як similarity() з pg_trgm: частка спільних триграм від об'єднання"""
+    return set_similarity(trigrams(first), trigrams(second))
+
+
+def set_similarity(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    """Схожість двох готових множин триграм"""
+    if not first or not second:
+        return 0.0
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared)
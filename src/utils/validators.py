@@ -1,21 +1,135 @@
-"""Універсальний компаратор для всіх типів адресних об'єктів"""
+"""Універсальний компаратор для всіх типів адресних об'єктів
+
+Імпорт модуля та створення компаратора не звертаються до БД: з'єднання
+відкривається лише при першому запиті, якому воно потрібне (завантаження
+знімка кандидатів, пошук за фонетичним ключем). Попарне та векторне
+порівняння працюють без з'єднання. Розширення PostgreSQL (pg_trgm,
+fuzzystrmatch) встановлюються один раз адміністратором - setup/Script-333.sql
+або UniversalAddressComparator().setup_extensions().
+"""
 
 import psycopg2
 import re
+import threading
 from fuzzywuzzy import fuzz, process
 import Levenshtein
 import jellyfish
 import textdistance
 from config.database import CONNECTION_STRING
 
+try:
+    import numpy as np
+    from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+    from rapidfuzz.distance import Indel, JaroWinkler
+    from rapidfuzz.utils import default_process
+    HAS_VECTOR_SCORING = True
+except ImportError:
+    HAS_VECTOR_SCORING = False
+
+try:
+    from src.utils.trigrams import trigram_similarity
+    from src.utils.candidate_snapshot import CandidateEntry, candidate_scope, get_candidate_snapshot
+    from src.utils.phonetics import apply_phonetic_rules, phonetic_key
+    from src.utils.lru_cache import LRUCache
+    from src.utils.building_numbers import canonical_building_number
+except ImportError:
+    from trigrams import trigram_similarity
+    from candidate_snapshot import CandidateEntry, candidate_scope, get_candidate_snapshot
+    from phonetics import apply_phonetic_rules, phonetic_key
+    from lru_cache import LRUCache
+    from building_numbers import canonical_building_number
+
 class UniversalAddressComparator:
-    def __init__(self):
-        self.connection = psycopg2.connect(CONNECTION_STRING)
-        self.cursor = self.connection.cursor()
-        self.setup_extensions()
+    # Кількість кандидатів з триграмного індексу, які проходять повну оцінку
+    CANDIDATE_LIMIT = 100
+    
+    # Максимальна кількість опечаток для кандидатів з BK-дерева (коротким назвам - менше)
+    MAX_TYPO_DISTANCE = 2
+    SHORT_NAME_LENGTH = 5
+    
+    # Специфічні ваги для різних типів об'єктів
+    SIMILARITY_WEIGHTS = {
+        'street': {'exact': 0.30, 'fuzzy': 0.25, 'phonetic': 0.20, 'levenshtein': 0.15, 'jaro': 0.10},
+        'district': {'exact': 0.40, 'fuzzy': 0.20, 'phonetic': 0.15, 'levenshtein': 0.15, 'jaro': 0.10},
+        'street_type': {'exact': 0.50, 'fuzzy': 0.20, 'phonetic': 0.15, 'levenshtein': 0.10, 'jaro': 0.05},
+        'city': {'exact': 0.35, 'fuzzy': 0.25, 'phonetic': 0.20, 'levenshtein': 0.10, 'jaro': 0.10},
+        'building': {'exact': 0.60, 'fuzzy': 0.15, 'phonetic': 0.10, 'levenshtein': 0.10, 'jaro': 0.05},
+        'default': {'exact': 0.30, 'fuzzy': 0.25, 'phonetic': 0.20, 'levenshtein': 0.15, 'jaro': 0.10}
+    }
+    
+    # Пошук назв з однаковим фонетичним ключем (індексована колонка phonetic_key)
+    PHONETIC_KEY_QUERIES = {
+        'street': """
+            SELECT DISTINCT name FROM addrinity.street_names
+            WHERE phonetic_key = %s AND is_current = TRUE
+        """,
+        'district': """
+            SELECT DISTINCT name_uk FROM addrinity.city_districts
+            WHERE phonetic_key = %s
+        """,
+        'city': """
+            SELECT DISTINCT name_uk FROM addrinity.cities
+            WHERE phonetic_key = %s
+        """
+    }
+    
+    # Максимальна розбіжність score_many з calculate_comprehensive_similarity
+    # (fuzzywuzzy округлює token_set_ratio до цілого відсотка)
+    SCORE_MANY_TOLERANCE = 0.005
+    
+    # Розміри кешів мемоізації: результати валідації та оцінки пар
+    VALIDATION_CACHE_SIZE = 10000
+    PAIR_CACHE_SIZE = 100000
+    
+    def __init__(self, connect=True, connection=None):
+        """
+        connect=True - з'єднання з БД відкривається ліниво, при першій потребі
+        connect=False - режим без БД: доступне лише порівняння (чистий CPU)
+        connection - готове з'єднання (наприклад, мігратора) замість власного
+        """
+        self._connect = connect
+        self._connection = connection
+        self._cursor = None
+        self._owns_connection = connection is None
+        # Один курсор на екземпляр: звернення до БД з різних потоків (API) по черзі
+        self._db_lock = threading.RLock()
+        # Назви-кандидати в пам'яті (TTL / версія) замість SELECT DISTINCT на кожен пошук
+        self.snapshot = get_candidate_snapshot()
+        # Нормалізовані та фонетичні форми кандидатів рахуються один раз при побудові знімка
+        self.snapshot.set_preparer(self.prepare_candidate)
+        # Мемоізація: (нормалізована назва, тип, версія знімка) -> результат валідації,
+        # (нормалізована пара, тип) -> оцінка схожості
+        self.validation_cache = LRUCache(self.VALIDATION_CACHE_SIZE)
+        self.pair_cache = LRUCache(self.PAIR_CACHE_SIZE)
+        # Каскад find_similar_objects_universal: скільки кандидатів відсіяно на кожному етапі
+        self.stats = {'cascade_candidates': 0, 'pruned_fuzzy': 0, 'pruned_bound': 0, 'fully_scored': 0}
+        # Пул воркерів validate_many(workers > 1), створюється при першому виклику
+        self._parallel = None
+    
+    @property
+    def connection(self):
+        """З'єднання з БД (відкривається при першому зверненні; None без БД)"""
+        if self._connection is None and self._connect:
+            self._connection = psycopg2.connect(CONNECTION_STRING)
+        return self._connection
+    
+    @property
+    def cursor(self):
+        """Курсор з'єднання (None у режимі без БД)"""
+        if self._cursor is None and self.connection is not None:
+            self._cursor = self.connection.cursor()
+        return self._cursor
+    
+    def close(self):
+        """Закриття власного з'єднання (якщо його було відкрито) та пулу воркерів"""
+        self.close_pool()
+        if self._owns_connection and self._connection is not None:
+            self._connection.close()
+        self._connection = None
+        self._cursor = None
     
     def setup_extensions(self):
-        """Налаштування розширень PostgreSQL"""
+        """Одноразове встановлення розширень PostgreSQL (крок адміністратора, не виконується при старті)"""
         try:
             extensions = ['fuzzystrmatch', 'pg_trgm']
             for ext in extensions:
@@ -24,6 +138,13 @@ class UniversalAddressComparator:
         except:
             pass
     
+    def _get_snapshot(self, object_type, scope=None):
+        """Знімок кандидатів типу (області); з'єднання потрібне лише для (пере)завантаження"""
+        if self.snapshot.is_fresh(object_type, scope):
+            return self.snapshot.get(object_type, None, scope)
+        with self._db_lock:
+            return self.snapshot.get(object_type, self.cursor, scope)
+    
     def normalize_text(self, text, object_type=None):
         """Нормалізація тексту з урахуванням типу об'єкта"""
         if not text:
@@ -58,6 +179,7 @@ class UniversalAddressComparator:
     def calculate_comprehensive_similarity(self, str1, str2, object_type=None):
         """
         Комплексний розрахунок схожості для будь-якого типу об'єкта
+        (оцінка кешується за нормалізованою парою та типом)
         """
         if not str1 or not str2:
             return 0.0
@@ -69,16 +191,18 @@ class UniversalAddressComparator:
         if not norm1 or not norm2:
             return 0.0
         
-        # Специфічні ваги для різних типів об'єктів
-        weights = {
-            'street': {'exact': 0.30, 'fuzzy': 0.25, 'phonetic': 0.20, 'levenshtein': 0.15, 'jaro': 0.10},
-            'district': {'exact': 0.40, 'fuzzy': 0.20, 'phonetic': 0.15, 'levenshtein': 0.15, 'jaro': 0.10},
-            'street_type': {'exact': 0.50, 'fuzzy': 0.20, 'phonetic': 0.15, 'levenshtein': 0.10, 'jaro': 0.05},
-            'city': {'exact': 0.35, 'fuzzy': 0.25, 'phonetic': 0.20, 'levenshtein': 0.10, 'jaro': 0.10},
-            'building': {'exact': 0.60, 'fuzzy': 0.15, 'phonetic': 0.10, 'levenshtein': 0.10, 'jaro': 0.05},
-            'default': {'exact': 0.30, 'fuzzy': 0.25, 'phonetic': 0.20, 'levenshtein': 0.15, 'jaro': 0.10}
-        }
+        cache_key = (norm1, norm2, object_type)
+        cached = self.pair_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
+        score = self._comprehensive_similarity(norm1, norm2, object_type)
+        self.pair_cache.put(cache_key, score)
+        return score
+    
+    def _comprehensive_similarity(self, norm1, norm2, object_type=None):
+        """Оцінка пари вже нормалізованих назв (без кешу)"""
+        weights = self.SIMILARITY_WEIGHTS
         current_weights = weights.get(object_type, weights['default'])
         
         similarities = {}
@@ -109,12 +233,8 @@ class UniversalAddressComparator:
             similarities['levenshtein'] = 0.0
             similarities['jaro_winkler'] = 0.0
         
-        # 5. PostgreSQL similarity (якщо доступно)
-        try:
-            self.cursor.execute("SELECT similarity(%s, %s)", (norm1, norm2))
-            similarities['pg_similarity'] = self.cursor.fetchone()[0]
-        except:
-            similarities['pg_similarity'] = similarities.get('fuzz_token_set', 0.0)
+        # 5. Триграмна схожість з семантикою pg_trgm similarity() - локально, без БД
+        similarities['pg_similarity'] = trigram_similarity(norm1, norm2)
         
         # Комбінована оцінка з оптимальними вагами
         combined_score = (
@@ -127,24 +247,113 @@ class UniversalAddressComparator:
         
         return min(combined_score, 1.0)
     
-    def calculate_ukrainian_phonetic_similarity(self, word1, word2):
-        """Фонетична схожість для українських слів"""
-        # Українські фонетичні заміни
-        phonetic_replacements = {
-            'і': 'и', 'ї': 'и', 'є': 'е', 'ґ': 'г',
-            'й': 'и', 'ю': 'у', 'я': 'а',
-            'кс': 'х', 'гз': 'з', 'дз': 'з',
-            'тц': 'ц', 'дц': 'ц'
-        }
+    def phonetic_form(self, text):
+        """Фонетична форма слова за українськими правилами замін"""
+        return apply_phonetic_rules(text)
+    
+    def prepare_candidate(self, name, object_type=None):
+        """Запис кандидата з нормалізованою та фонетичною формами, токенами і довжиною"""
+        normalized = self.normalize_text(name, object_type) if name else ""
+        phonetic = self.phonetic_form(normalized)
+        if HAS_VECTOR_SCORING:
+            processed = default_process(normalized)
+            phonetic_processed = default_process(phonetic)
+        else:
+            processed, phonetic_processed = normalized, phonetic
+        return CandidateEntry(name, normalized, phonetic, frozenset(processed.split()),
+                              processed, phonetic_processed, phonetic_key(name, object_type))
+    
+    def score_many(self, target, candidates, object_type=None):
+        """
+        Оцінка схожості однієї назви з багатьма кандидатами
+        
+        candidates - назви або підготовлені записи CandidateEntry зі знімка
+        (для них нормалізація не повторюється). Повертає numpy-вектор оцінок
+        у порядку candidates. Ціль нормалізується один раз, кожна метрика
+        рахується для всього масиву кандидатів (rapidfuzz cdist + numpy).
+        Відхилення від calculate_comprehensive_similarity не перевищує
+        SCORE_MANY_TOLERANCE.
+        """
+        entries = [candidate if isinstance(candidate, CandidateEntry)
+                   else self.prepare_candidate(candidate, object_type)
+                   for candidate in candidates]
+        
+        if not HAS_VECTOR_SCORING:
+            return [self.calculate_comprehensive_similarity(target, entry.name, object_type)
+                    for entry in entries]
+        
+        if not target or not entries:
+            return np.zeros(len(entries))
         
-        def apply_phonetic_rules(text):
-            result = text.lower()
-            for old, new in phonetic_replacements.items():
-                result = result.replace(old, new)
-            return result
+        query = self.prepare_candidate(target, object_type)
+        if not query.normalized:
+            return np.zeros(len(entries))
+        
+        normalized = [entry.normalized for entry in entries]
+        weights = self.SIMILARITY_WEIGHTS.get(object_type, self.SIMILARITY_WEIGHTS['default'])
+        
+        def metric(query_form, choices, scorer):
+            return rf_process.cdist([query_form], choices, scorer=scorer, dtype=np.float64)[0]
+        
+        # Рядки вже оброблені процесором при підготовці записів
+        exact = np.fromiter((name == query.normalized for name in normalized), dtype=np.float64,
+                            count=len(normalized))
+        token_set = metric(query.processed, [entry.processed for entry in entries],
+                           rf_fuzz.token_set_ratio) / 100.0
+        levenshtein = metric(query.normalized, normalized, Indel.normalized_similarity)
+        jaro_winkler = metric(query.normalized, normalized, JaroWinkler.similarity)
+        phonetic_score = (
+            metric(query.phonetic_processed, [entry.phonetic_processed for entry in entries],
+                   rf_fuzz.token_set_ratio) / 100.0 +
+            metric(query.phonetic, [entry.phonetic for entry in entries], Indel.normalized_similarity)
+        ) / 2.0
+        
+        scores = (
+            exact * weights['exact'] +
+            token_set * weights['fuzzy'] +
+            phonetic_score * weights['phonetic'] +
+            levenshtein * weights['levenshtein'] +
+            jaro_winkler * weights['jaro']
+        )
+        scores[np.fromiter((not name for name in normalized), dtype=bool, count=len(normalized))] = 0.0
+        return np.minimum(scores, 1.0)
+    
+    def score_upper_bound(self, query, entry, object_type=None):
+        """
+        Верхня межа calculate_comprehensive_similarity за дешевими ознаками
+        
+        Точний збіг відомий з нормалізованих форм; схожість Левенштейна
+        (Levenshtein.ratio) не перевищує 2*min(l1, l2)/(l1 + l2); решта метрик
+        оцінюється зверху одиницею.
+        """
+        if not query.normalized or not entry.normalized:
+            return 0.0
         
-        phonetic1 = apply_phonetic_rules(word1)
-        phonetic2 = apply_phonetic_rules(word2)
+        weights = self.SIMILARITY_WEIGHTS.get(object_type, self.SIMILARITY_WEIGHTS['default'])
+        
+        def length_bound(first, second):
+            return 2.0 * min(first, second) / (first + second) if first + second else 0.0
+        
+        exact = 1.0 if query.normalized == entry.normalized else 0.0
+        phonetic = (1.0 + length_bound(len(query.phonetic), len(entry.phonetic))) / 2.0
+        bound = (
+            exact * weights['exact'] +
+            weights['fuzzy'] +
+            phonetic * weights['phonetic'] +
+            length_bound(query.length, entry.length) * weights['levenshtein'] +
+            weights['jaro']
+        )
+        return min(bound, 1.0)
+    
+    def pruning_rate(self):
+        """Частка кандидатів, відсіяних каскадом без повного розрахунку метрик"""
+        total = self.stats['cascade_candidates']
+        return (self.stats['pruned_fuzzy'] + self.stats['pruned_bound']) / total if total else 0.0
+    
+    def calculate_ukrainian_phonetic_similarity(self, word1, word2):
+        """Фонетична схожість для українських слів"""
+        phonetic1 = self.phonetic_form(word1)
+        phonetic2 = self.phonetic_form(word2)
         
         # Використовуємо стандартні методи для фонетичної форми
         try:
@@ -153,68 +362,70 @@ class UniversalAddressComparator:
         except:
             return 0.0
     
-    def find_similar_objects_universal(self, target_name, object_type, threshold=0.8):
+    def find_similar_objects_universal(self, target_name, object_type, threshold=0.8, snapshot=None,
+                                       city=None, district=None):
         """
         Універсальний пошук схожих об'єктів будь-якого типу
         object_type: 'street', 'district', 'street_type', 'city', 'building'
+        snapshot - зафіксований знімок кандидатів (для пакетної валідації)
+        city, district - область пошуку: кандидатами є лише назви цього міста / району міста
         """
         if not target_name:
             return []
         
-        # Запити для різних типів об'єктів
-        queries = {
-            'street': """
-                SELECT DISTINCT name FROM addrinity.street_names 
-                WHERE is_current = TRUE AND name IS NOT NULL
-            """,
-            'district': """
-                SELECT DISTINCT name_uk FROM addrinity.city_districts 
-                WHERE name_uk IS NOT NULL
-                UNION
-                SELECT DISTINCT name_uk FROM addrinity.districts 
-                WHERE name_uk IS NOT NULL
-            """,
-            'street_type': """
-                SELECT DISTINCT name_uk FROM addrinity.street_types 
-                WHERE name_uk IS NOT NULL
-                UNION
-                SELECT DISTINCT short_name_uk FROM addrinity.street_types 
-                WHERE short_name_uk IS NOT NULL
-            """,
-            'city': """
-                SELECT DISTINCT name_uk FROM addrinity.cities 
-                WHERE name_uk IS NOT NULL
-            """,
-            'building': """
-                SELECT DISTINCT number FROM addrinity.buildings 
-                WHERE number IS NOT NULL AND number != ''
-            """
-        }
-        
-        if object_type not in queries:
-            return []
-        
         try:
-            self.cursor.execute(queries[object_type])
-            existing_objects = [row[0] for row in self.cursor.fetchall() if row[0]]
+            snapshot = snapshot or self._get_snapshot(object_type, candidate_scope(object_type, city, district))
         except Exception as e:
             return []
+        if snapshot is None:
+            return []
+        
+        if object_type == 'building':
+            # Номери будівель порівнюються за канонічною формою (12А, 12/3, 12 к2), а не нечітко
+            canonical_number = canonical_building_number(target_name)
+            return [(canonical_number, 1.0)] if canonical_number in snapshot else []
+        
+        # Короткий список кандидатів з триграмного індексу замість повного перебору
+        existing_objects = [name for name, _ in snapshot.index.search(target_name, limit=self.CANDIDATE_LIMIT)]
+        # Фонетично однакові назви та назви з опечатками - кандидати навіть без спільних триграм
+        listed = set(existing_objects)
+        for name in (snapshot.phonetic_matches(phonetic_key(target_name, object_type)) +
+                     snapshot.typo_matches(target_name, self.typo_distance(target_name))):
+            if name not in listed:
+                listed.add(name)
+                existing_objects.append(name)
+        entries = snapshot.entries
         
         # Використання fuzzywuzzy для швидкого пошуку
         if existing_objects:
             # Швидкий пошук топ-20 найсхожіших
             matches = process.extract(target_name, existing_objects, limit=20)
+            self.stats['cascade_candidates'] += len(matches)
             # Фільтрація за порогом та додаткова перевірка
             final_matches = []
-            for name, fuzzy_score in matches:
-                if fuzzy_score/100.0 >= threshold * 0.7:  # менший поріг для fuzzywuzzy
-                    our_score = self.calculate_comprehensive_similarity(
-                        target_name, name, object_type
-                    )
-                    # Комбінуємо оцінки
-                    combined_score = (fuzzy_score/100.0 * 0.6 + our_score * 0.4)
-                    if combined_score >= threshold:
-                        final_matches.append((name, combined_score))
+            fuzzy_passed = [(name, fuzzy_score) for name, fuzzy_score in matches
+                            if fuzzy_score/100.0 >= threshold * 0.7]  # менший поріг для fuzzywuzzy
+            self.stats['pruned_fuzzy'] += len(matches) - len(fuzzy_passed)
+            
+            # Каскад: кандидати, яким навіть верхня межа нашої оцінки не дає досягти порогу,
+            # відкидаються до розрахунку дорогих метрик (результат не змінюється)
+            query = self.prepare_candidate(target_name, object_type)
+            matches, candidates = [], []
+            for name, fuzzy_score in fuzzy_passed:
+                entry = entries.get(name) or self.prepare_candidate(name, object_type)
+                best = fuzzy_score/100.0 * 0.6 + self.score_upper_bound(query, entry, object_type) * 0.4
+                if best + 1e-9 >= threshold:
+                    matches.append((name, fuzzy_score))
+                    candidates.append(entry)
+            self.stats['pruned_bound'] += len(fuzzy_passed) - len(matches)
+            self.stats['fully_scored'] += len(matches)
+            
+            our_scores = self.score_many(target_name, candidates, object_type)
+            for (name, fuzzy_score), our_score in zip(matches, our_scores):
+                # Комбінуємо оцінки
+                combined_score = (fuzzy_score/100.0 * 0.6 + float(our_score) * 0.4)
+                if combined_score >= threshold:
+                    final_matches.append((name, combined_score))
             
             # Сортування
             final_matches.sort(key=lambda x: x[1], reverse=True)
@@ -222,10 +433,100 @@ class UniversalAddressComparator:
         
         return []
     
-    def validate_object_universally(self, target_name, object_type):
+    def typo_distance(self, target_name):
+        """Допустима кількість опечаток для назви"""
+        return 1 if len(target_name.strip()) <= self.SHORT_NAME_LENGTH else self.MAX_TYPO_DISTANCE
+    
+    def find_phonetic_matches(self, target_name, object_type):
+        """Назви з таким самим фонетичним ключем (пошук за рівністю в БД)"""
+        key = phonetic_key(target_name, object_type)
+        if not key or object_type not in self.PHONETIC_KEY_QUERIES:
+            return []
+        
+        try:
+            with self._db_lock:
+                if self.cursor is None:
+                    return []
+                self.cursor.execute(self.PHONETIC_KEY_QUERIES[object_type], (key,))
+                return [row[0] for row in self.cursor.fetchall()]
+        except Exception as e:
+            return []
+    
+    def validate_object_universally(self, target_name, object_type, snapshot=None, city=None, district=None):
         """
         Універсальна валідація будь-якого типу об'єкта
+        
+        Результат кешується за (нормалізована назва, тип, область, версія знімка кандидатів):
+        повторна назва коштує одного звернення до словника, а будь-яка зміна
+        знімка (перезавантаження, нові назви) робить старі записи недосяжними.
+        """
+        normalized = self.normalize_text(target_name, object_type)
+        scope = candidate_scope(object_type, city, district)
+        if snapshot is not None or self.snapshot.is_fresh(object_type, scope):
+            version = snapshot.version if snapshot is not None else self.snapshot.version(object_type, scope)
+            cached = self.validation_cache.get((normalized, object_type, scope, version))
+            if cached is not None:
+                return dict(cached, target_name=target_name)
+        
+        results = self._validate_object(target_name, object_type, snapshot, city, district)
+        # Версія - після пошуку, який міг (пере)завантажити знімок
+        version = snapshot.version if snapshot is not None else self.snapshot.version(object_type, scope)
+        self.validation_cache.put((normalized, object_type, scope, version), results)
+        return dict(results)
+    
+    def validate_many(self, names, object_type, city=None, district=None, workers=None):
         """
+        Пакетна валідація списку назв; повертає словник назва -> результат валідації
+        
+        Повтори та порожні назви відкидаються, кожна унікальна назва оцінюється
+        один раз проти одного й того самого знімка кандидатів (області city /
+        district, якщо задано). Призначено для валідації пачки до відкриття
+        транзакції запису.
+        workers > 1 - унікальні назви розподіляються між процесами пулу
+        (ParallelComparator); пул живе між викликами до close_pool() / close().
+        """
+        unique_names = [name for name in dict.fromkeys(names) if name]
+        if not unique_names:
+            return {}
+        
+        if workers and workers > 1:
+            return self._get_parallel(workers).validate_many(unique_names, object_type, city, district)
+        
+        try:
+            snapshot = self._get_snapshot(object_type, candidate_scope(object_type, city, district))
+        except Exception as e:
+            snapshot = None
+        
+        return {name: self.validate_object_universally(name, object_type, snapshot, city, district)
+                for name in unique_names}
+    
+    def _get_parallel(self, workers):
+        """Пул воркерів пакетної валідації (перестворюється при іншій кількості воркерів)"""
+        if self._parallel is None or self._parallel.workers != workers:
+            self.close_pool()
+            # Локальний імпорт: parallel_comparator сам імпортує цей модуль
+            try:
+                from src.utils.parallel_comparator import ParallelComparator
+            except ImportError:
+                from parallel_comparator import ParallelComparator
+            self._parallel = ParallelComparator(self, workers)
+        return self._parallel
+    
+    def close_pool(self):
+        """Зупинка пулу воркерів validate_many (якщо його було запущено)"""
+        if self._parallel is not None:
+            self._parallel.close()
+            self._parallel = None
+    
+    def cache_stats(self):
+        """Статистика кешів мемоізації (влучання, промахи, частка влучань)"""
+        return {
+            'validation': self.validation_cache.info(),
+            'pairs': self.pair_cache.info()
+        }
+    
+    def _validate_object(self, target_name, object_type, snapshot=None, city=None, district=None):
+        """Валідація без кешу"""
         results = {
             'target_name': target_name,
             'object_type': object_type,
@@ -236,7 +537,9 @@ class UniversalAddressComparator:
         }
         
         # Універсальний пошук
-        similar_objects = self.find_similar_objects_universal(target_name, object_type, 0.75)
+        similar_objects = self.find_similar_objects_universal(
+            target_name, object_type, 0.75, snapshot, city, district
+        )
         results['similar_objects'] = similar_objects
         results['detailed_scores'] = {
             'total_found': len(similar_objects),
@@ -280,10 +583,16 @@ class UniversalAddressComparator:
         
         return results
 
-# Глобальний екземпляр
-universal_comparator = UniversalAddressComparator()
+# Глобальний екземпляр (створюється при першому виклику get_universal_comparator)
+universal_comparator = None
+_comparator_lock = threading.Lock()
 
 def get_universal_comparator():
     """Отримання універсального компаратора"""
+    global universal_comparator
+    if universal_comparator is None:
+        with _comparator_lock:
+            if universal_comparator is None:
+                universal_comparator = UniversalAddressComparator()
     return universal_comparator
 
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Тести синхронної пошукової системи адрес (без підключення до БД)"""
+
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from fake_db import FakeDB, make_search_engine, run_tests
+from src.utils.address_search import BUILDING_SEARCH_QUERY, DISTRICT_DETAILS_QUERY, STREET_DETAILS_QUERY
+
+
+def test_building_search_is_one_query():
+    db = FakeDB({BUILDING_SEARCH_QUERY: [
+        (8, 'Старий Шлях 2', 80, '192', None, 'Дніпро', None, 'Дніпро, Старий Шлях 2 вул., 192'),
+        (7, 'Старий Шлях', 70, '192', 'А', 'Дніпро', 'Шевченківський', 'Дніпро, Старий Шлях вул., 192/А'),
+    ]})
+    engine = make_search_engine(db)
+
+    results = engine.search_building('Старий Шлях', '192', city='Дніпро')
+
+    assert db.queries == [(BUILDING_SEARCH_QUERY,
+                           {'street': 'Старий Шлях', 'number': '192', 'city': 'дніпро', 'district': None})]
+    # Точний збіг назви вулиці - першим
+    assert [result['street_id'] for result in results] == [7, 8]
+    assert results[0]['full_address'] == 'Дніпро, Старий Шлях вул., 192/А'
+    assert results[0]['district'] == 'Шевченківський' and results[0]['corpus'] == 'А'
+
+
+def test_street_and_district_details_are_one_query():
+    db = FakeDB({
+        STREET_DETAILS_QUERY: [('Старий Шлях', 7, 'вулиця', 'Дніпро', ['2', '10', '100'])],
+        DISTRICT_DETAILS_QUERY: [('Шевченківський', 3, 'район', 'Дніпро', 42)],
+    })
+    engine = make_search_engine(db, streets=['Старий Шлях', 'Старий Шлях 2', 'Стара'],
+                                districts=['Шевченківський', 'Шевченківський 2'])
+
+    streets = engine.search_street('Старий шлях')
+    assert db.executed() == [STREET_DETAILS_QUERY]
+    assert set(db.queries[0][1]['names']) >= {'Старий Шлях', 'Старий Шлях 2'}
+    # Кандидати без рядка в БД пропускаються
+    assert [street['id'] for street in streets] == [7]
+    assert streets[0]['sample_buildings'] == ['2', '10', '100'] and streets[0]['buildings_count'] == 3
+
+    districts = engine.search_district('Шевченківський')
+    assert db.executed() == [STREET_DETAILS_QUERY, DISTRICT_DETAILS_QUERY]
+    assert districts[0]['city'] == 'Дніпро' and districts[0]['streets_count'] == 42
+
+
+if __name__ == "__main__":
+    run_tests(globals())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Тести асинхронної пошукової системи з фіктивним пулом asyncpg"""
+
+import sys
+import os
+import asyncio
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from fake_db import make_async_search_engine, run_tests
+from src.utils import address_search_async as search_async
+
+
+def answer(query, args):
+    """Рядки БД для запитів пошуку вулиці та будівлі"""
+    if query is search_async.STREET_DETAILS:
+        return [(name, len(name), 'вулиця', 'Дніпро', ['2', '100']) for name in args[0]]
+    if query is search_async.BUILDING_SEARCH:
+        return [(street_id, name, street_id * 10, '192', None, 'Дніпро', 'Шевченківський',
+                 f"Дніпро, {name} вул., 192")
+                for street_id, name in ((7, 'Старий Шлях'), (8, 'Старий Шлях 2'))]
+    return []
+
+
+def make_engine(names=('Старий Шлях', 'Старий Шлях 2', 'Стара'), delay=0.01):
+    return make_async_search_engine(answer, streets=names, delay=delay)
+
+
+def test_street_details_are_fetched_in_one_query():
+    engine = make_engine()
+    matches = asyncio.run(engine.search_street('Старий шлях'))
+
+    assert [match['name'] for match in matches][:2] == ['Старий Шлях', 'Старий Шлях 2']
+    assert matches[0]['sample_buildings'] == ['2', '100']
+    assert matches[0]['buildings_count'] == 2
+    assert len(engine.pool.queries) == 1
+    query, args = engine.pool.queries[0]
+    assert query is search_async.STREET_DETAILS and 'Старий Шлях' in args[0]
+    assert engine.stats['offloaded'] == 1
+
+
+def test_building_search_matches_sync_result_shape():
+    engine = make_engine()
+    results = asyncio.run(engine.search_by_free_text('Дніпро, Старий Шлях 192'))
+
+    assert results['total_found'] == 2
+    first = results['matches'][0]
+    assert first['full_address'] == 'Дніпро, Старий Шлях вул., 192'
+    assert first['building'] == '192' and first['city'] == 'Дніпро'
+    assert first['district'] == 'Шевченківський'
+    # Один запит; місто, розпізнане з довідника, передається у фільтр
+    assert engine.pool.queries == [(search_async.BUILDING_SEARCH, ('Старий Шлях', '192', 'дніпро', None))]
+
+
+def test_repeated_free_text_search_uses_result_cache():
+    engine = make_engine()
+
+    async def scenario():
+        first = await engine.search_by_free_text('Дніпро, Старий Шлях 192')
+        second = await engine.search_by_free_text('старий шлях 192 Дніпро')
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert second['matches'] == first['matches']
+    assert len(engine.pool.queries) == 1
+    assert engine.cache_metrics()['hits'] == 1
+
+
+def test_slow_scoring_does_not_block_event_loop():
+    engine = make_engine(delay=0)
+    original = engine.comparator.find_similar_objects_universal
+
+    def slow_find(*args, **kwargs):
+        time.sleep(0.2)
+        return original(*args, **kwargs)
+
+    engine.comparator.find_similar_objects_universal = slow_find
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        await engine.search_street('Старий шлях')
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(scenario()) >= 5
+
+
+def test_suggestions_only_for_searches_without_matches():
+    engine = make_engine()
+    calls = []
+
+    def suggestions(query_text, city=None):
+        calls.append(query_text)
+        return [{'type': 'street', 'name': 'Старий Шлях', 'confidence': 0.7,
+                 'suggestion': "Можливо ви мали на увазі: Старий Шлях?"}]
+
+    engine._suggestions = suggestions
+
+    # Є збіги - спільний пул потоків не витрачається на підказки
+    results = asyncio.run(engine.search_by_free_text('Дніпро, Старий Шлях 100'))
+    assert results['total_found'] == 2 and results['suggestions'] == [] and calls == []
+
+    engine.pool.answer = lambda query, args: []
+    results = asyncio.run(engine.search_by_free_text('Дніпро, Старий Шлях 192'))
+    assert results['total_found'] == 0
+    assert results['suggestions'][0]['name'] == 'Старий Шлях' and len(calls) == 1
+
+
+def test_new_data_version_invalidates_candidate_snapshot():
+    engine = make_engine()
+    engine.data_version.check_interval = 0
+    engine.pool.answer = lambda query, args: [(1,)] if query is search_async.DATA_VERSION else []
+    asyncio.run(engine.current_data_version())
+    assert engine.comparator.snapshot.is_fresh('street')
+
+    # Міграція в іншому процесі: знімок перечитається при наступному пошуку
+    engine.pool.answer = lambda query, args: [(2,)] if query is search_async.DATA_VERSION else []
+    assert asyncio.run(engine.current_data_version()) == (2, 0)
+    assert not engine.comparator.snapshot.is_fresh('street')
+
+
+def test_autocomplete_uses_snapshot_in_executor():
+    engine = make_engine()
+    suggestions = asyncio.run(engine.fuzzy_search('Стар', 'street', limit=2))
+    assert len(suggestions) == 2
+    assert all(item['name'].startswith('Стар') for item in suggestions)
+    assert engine.pool.queries == []
+
+
+if __name__ == "__main__":
+    run_tests(globals())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Тести префіксного індексу автодоповнення (без підключення до БД)"""
+
+import sys
+import os
+import random
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from fake_db import run_tests
+from src.utils.autocomplete import Autocomplete, PrefixIndex
+from src.utils.candidate_snapshot import CandidateSnapshot
+from src.utils.validators import UniversalAddressComparator
+
+
+STREETS = ['Старий Шлях', 'Старокозацька', 'Січеславська Набережна', 'Шевченка',
+           'Героїв Сталінграду', 'Стара', 'Тараса Шевченка']
+
+
+def make_autocomplete(names=STREETS):
+    comparator = UniversalAddressComparator(connect=False)
+    comparator.snapshot = CandidateSnapshot(ttl=600, preparer=comparator.prepare_candidate)
+    comparator.snapshot.install('street', list(names))
+    comparator.snapshot.install('district', ['Шевченківський', 'Соборний'])
+    return Autocomplete(comparator)
+
+
+def names(suggestions):
+    return [suggestion['name'] for suggestion in suggestions]
+
+
+def test_prefix_from_name_start_ranks_first():
+    autocomplete = make_autocomplete()
+    # Збіг з початку назви вище за збіг з другого слова; коротші назви вище
+    assert names(autocomplete.complete('шевч')) == ['Шевченка', 'Тараса Шевченка']
+    assert names(autocomplete.complete('Стар', limit=2)) == ['Стара', 'Старий Шлях']
+    assert autocomplete.complete('Шевченка')[0]['score'] == 100
+    assert names(autocomplete.complete('Соб', 'district')) == ['Соборний']
+
+
+def test_precomputed_top_k_matches_range_scan():
+    keys = [(f"назва {i:04d}", (False, False, 10, f"Назва {i:04d}")) for i in range(500)]
+    random.Random(1).shuffle(keys)
+    index = PrefixIndex(keys, top_k=5)
+    # Короткий префікс - з заздалегідь порахованих, довгий - bisect по діапазону
+    assert index.lookup('на', 5) == index.lookup('назва', 5)
+    assert [rank[3] for rank in index.lookup('назва 01', 3)] == ['Назва 0100', 'Назва 0101', 'Назва 0102']
+
+
+def test_new_snapshot_names_are_added_incrementally():
+    autocomplete = make_autocomplete()
+    assert names(autocomplete.complete('Стара')) == ['Стара']
+
+    autocomplete.comparator.snapshot.add('street', ['Старачна'])
+    assert names(autocomplete.complete('Стара')) == ['Стара', 'Старачна']
+    assert autocomplete.stats['builds'] == 1
+    assert autocomplete.stats['incremental_adds'] == 1
+
+    # Перечитаний знімок - індекс перебудовується
+    autocomplete.comparator.snapshot.install('street', ['Старт'])
+    assert names(autocomplete.complete('Стар')) == ['Старт']
+    assert autocomplete.stats['builds'] == 2
+
+
+def test_typo_falls_back_to_fuzzy_search():
+    autocomplete = make_autocomplete()
+    assert 'Старокозацька' in names(autocomplete.complete('Старокозацкая'))
+    assert autocomplete.stats['fallbacks'] == 1
+
+
+def test_warm_lookup_is_sub_millisecond():
+    generator = random.Random(7)
+    letters = 'абвгдежзиклмнопрстуфхцчшщюя'
+    streets = list({''.join(generator.choice(letters) for _ in range(generator.randint(5, 14))).title()
+                    for _ in range(5000)})
+    autocomplete = make_autocomplete(streets)
+    autocomplete.load()
+    assert autocomplete.is_ready('street')
+
+    queries = [street[:length] for street in streets[:200] for length in (1, 2, 4, 6)]
+    started = time.perf_counter()
+    for query in queries:
+        assert autocomplete.complete(query)
+    elapsed = (time.perf_counter() - started) / len(queries)
+    assert elapsed < 0.001
+
+
+if __name__ == "__main__":
+    run_tests(globals())
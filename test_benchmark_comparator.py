@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Тести бенчмарку компаратора на розмічених парах з DATA-TrinitY-3.txt"""
+
+import sys
+import os
+import json
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from fake_db import run_tests
+from benchmark_comparator import (
+    DEFAULT_DATA_PATH, build_dataset, classification, compare_reports, create_comparator,
+    measure_parallel, name_key, percentiles, read_dump_sections, run_benchmark, save_report
+)
+
+
+def test_dump_sections_are_parsed():
+    sections = read_dump_sections(DEFAULT_DATA_PATH)
+    assert set(sections) == {'addr.rtg_addr', 'bld_local', 'ek_addr'}
+    assert all(sections.values())
+    assert sections['addr.rtg_addr'][0]['city'] == 'Дніпро'
+
+
+def test_dataset_has_both_labels_for_each_type():
+    dataset = build_dataset(read_dump_sections(DEFAULT_DATA_PATH))
+    for object_type in ('street', 'street_rename', 'district', 'building'):
+        labels = {pair.label for pair in dataset['pairs'] if pair.object_type == object_type}
+        assert labels == {True, False}, object_type
+
+    # Позитивна пара вулиці - та сама назва довідника, негативи - інші назви
+    for pair in dataset['pairs']:
+        if pair.object_type == 'street':
+            assert (name_key(pair.first) == name_key(pair.second)) == pair.label
+    assert any(case.expected is None for case in dataset['lookups'])
+
+
+def test_classification_and_percentiles():
+    assert classification(8, 2, 4) == {'tp': 8, 'fp': 2, 'fn': 4, 'precision': 0.8,
+                                       'recall': 0.6667, 'f1': 0.7273}
+    assert classification(0, 0, 0)['precision'] is None
+
+    latencies = [0.001 * value for value in range(1, 101)]
+    result = percentiles(latencies)
+    assert result['p50_ms'] == 51.0
+    assert result['p99_ms'] == 99.0
+    assert result['max_ms'] == 100.0
+
+
+def test_report_is_saved_and_compared():
+    report = run_benchmark(repeat=1)
+    assert report['pairs']['street']['pairs_per_sec'] > 0
+    assert report['lookups']['street']['p50_ms'] <= report['lookups']['street']['p99_ms']
+
+    with tempfile.TemporaryDirectory() as report_dir:
+        path = save_report(report, report_dir)
+        with open(path, encoding='utf-8') as file:
+            saved = json.load(file)
+    assert saved['meta']['threshold'] == report['meta']['threshold']
+
+    previous = json.loads(json.dumps(report))
+    previous['pairs']['street']['recall'] = 0.5
+    lines = compare_reports(report, previous)
+    assert f"pairs.street.recall: 0.5 -> {report['pairs']['street']['recall']}" in ' '.join(lines)
+
+
+def test_parallel_section_matches_single_process():
+    dataset = build_dataset(read_dump_sections(DEFAULT_DATA_PATH))
+    result = measure_parallel(create_comparator(), dataset['lookups'], dataset['references'], workers=2)
+    assert set(result) == {'street', 'district'}
+    for values in result.values():
+        assert values['same_results'] and values['workers'] == 2
+        assert values['serial_per_sec'] > 0 and values['parallel_per_sec'] > 0
+
+
+if __name__ == "__main__":
+    run_tests(globals())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Тести канонічної форми номерів будівель"""
+
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from fake_db import run_tests
+from src.utils.building_numbers import (
+    BuildingNumber, building_number_columns, canonical_building_number, parse_building_number
+)
+from src.processors.hierarchy_resolver import derived_columns
+from src.utils.validators import UniversalAddressComparator
+from src.utils.candidate_snapshot import CandidateSnapshot
+
+
+def test_parse_letter_fraction_and_corpus():
+    assert parse_building_number('12') == BuildingNumber(12)
+    assert parse_building_number('12А') == BuildingNumber(12, 'А')
+    assert parse_building_number('12-а') == BuildingNumber(12, 'А')
+    assert parse_building_number('12/3') == BuildingNumber(12, '', '3')
+    assert parse_building_number('102, корп.3') == BuildingNumber(102, '', '', '3')
+    assert parse_building_number('12 корп. 2') == BuildingNumber(12, '', '', '2')
+    assert parse_building_number('б/н') is None
+
+
+def test_canonical_form_ignores_spelling_variants():
+    assert canonical_building_number('12A') == canonical_building_number('12 а') == '12А'
+    assert canonical_building_number('12 к2') == canonical_building_number('12', corpus='корп. 2') == '12 к2'
+    assert canonical_building_number('буд. 5') == '5'
+    assert canonical_building_number('б/н') == 'Б/Н'
+
+
+def test_numeric_ordering():
+    numbers = ['100', '2', '12А', '12', '12/3', '3']
+    ordered = sorted(numbers, key=lambda number: parse_building_number(number))
+    assert ordered == ['2', '3', '12', '12/3', '12А', '100']
+
+
+def test_resolver_writes_canonical_columns():
+    columns = derived_columns('building', {'number': '12А/3', 'corpus': None})
+    assert columns == building_number_columns('12А/3')
+    assert columns['number_int'] == 12
+    assert columns['number_canonical'] == '12А/3'
+    assert derived_columns('premise', {'number': '5'}) == {}
+
+
+def test_building_validation_matches_by_equality():
+    comparator = UniversalAddressComparator(connect=False)
+    comparator.snapshot = CandidateSnapshot(ttl=600, preparer=comparator.prepare_candidate)
+    comparator.snapshot.install('building', ['12А', '12', '102 к3'])
+
+    assert comparator.find_similar_objects_universal('12a', 'building') == [('12А', 1.0)]
+    assert comparator.find_similar_objects_universal('102, корп.3', 'building') == [('102 к3', 1.0)]
+    assert comparator.find_similar_objects_universal('13', 'building') == []
+
+
+if __name__ == "__main__":
+    run_tests(globals())
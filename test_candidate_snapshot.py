@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Тести знімка назв-кандидатів (без підключення до БД)"""
+
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from fake_db import run_tests
+from src.utils.candidate_snapshot import CandidateEntry, CandidateSnapshot, Scope, candidate_scope
+from src.utils.trigram_index import TrigramIndex
+from src.utils.bk_tree import BKTree
+from src.utils.trigrams import trigram_similarity
+from src.utils.phonetics import phonetic_key
+from src.processors.hierarchy_resolver import HierarchyResolver
+
+
+class RecordingCursor:
+    """Курсор, що повертає фіксований набір назв і рахує запити"""
+
+    def __init__(self, names):
+        self.names = names
+        self.queries = 0
+
+    def execute(self, query, params=None):
+        self.queries += 1
+
+    def fetchall(self):
+        return [(name,) for name in self.names]
+
+
+def test_snapshot_is_loaded_once_within_ttl():
+    cursor = RecordingCursor(['Січеславська Набережна', 'Старий Шлях'])
+    snapshot = CandidateSnapshot(ttl=60)
+
+    assert snapshot.names('street', cursor) == ['Січеславська Набережна', 'Старий Шлях']
+    assert snapshot.names('street', cursor) == ['Січеславська Набережна', 'Старий Шлях']
+    assert cursor.queries == 1
+    assert snapshot.stats['hits'] == 1
+
+
+def test_expired_ttl_and_version_bump_reload():
+    cursor = RecordingCursor(['Старий Шлях'])
+    snapshot = CandidateSnapshot(ttl=0)
+    snapshot.names('street', cursor)
+    snapshot.names('street', cursor)
+    assert cursor.queries == 2
+
+    snapshot = CandidateSnapshot(ttl=60)
+    snapshot.names('city', cursor)
+    version = snapshot.version('city')
+    snapshot.bump_version('city')
+    assert snapshot.version('city') > version
+    snapshot.names('city', cursor)
+    assert cursor.queries == 4
+
+
+def test_incremental_add_changes_version_without_reload():
+    cursor = RecordingCursor(['Старий Шлях'])
+    snapshot = CandidateSnapshot(ttl=60)
+    snapshot.names('street', cursor)
+    version = snapshot.version('street')
+
+    assert snapshot.add('street', ['Ганни Швидько', 'Старий Шлях']) == 1
+    assert snapshot.version('street') > version
+    assert snapshot.names('street', cursor) == ['Старий Шлях', 'Ганни Швидько']
+    assert cursor.queries == 1
+
+
+def test_unknown_type_has_no_candidates():
+    assert CandidateSnapshot().names('premise', RecordingCursor(['1'])) == []
+
+
+def test_resolver_adds_created_names_after_commit():
+    snapshot = CandidateSnapshot(ttl=60)
+    snapshot.names('street', RecordingCursor([]))
+    snapshot.names('district', RecordingCursor([]))
+    resolver = HierarchyResolver(snapshot=snapshot)
+
+    key = ('rtg_street_id', '5'),
+    resolver._collect_snapshot_names('street', {key: 1}, {
+        key: ({}, {}, {'names': [('Січеславська Набережна', True, 'current'),
+                                 ('Набережна Леніна', False, 'old')]})
+    })
+    district_key = ('name_uk', 'шевченківський'),
+    resolver._collect_snapshot_names('city_district', {district_key: 2}, {
+        district_key: ({}, {'name_uk': 'шевченківський'}, {})
+    })
+    assert snapshot.names('street') == []
+
+    resolver.commit()
+    assert snapshot.names('street') == ['Січеславська Набережна']
+    assert snapshot.names('district') == ['шевченківський']
+
+
+def test_trigram_index_returns_closest_names_with_pg_similarity():
+    names = ['Січеславська Набережна', 'Сонячна Набережна', 'Старий Шлях', 'Ганни Швидько']
+    index = TrigramIndex(names)
+
+    results = index.search('Січеславська наб', limit=2)
+    assert results[0][0] == 'Січеславська Набережна'
+    assert results[0][1] == trigram_similarity('Січеславська наб', 'Січеславська Набережна')
+    assert len(results) == 2
+
+
+def test_trigram_index_only_touches_names_sharing_rare_trigrams():
+    names = [f"Набережна {number}" for number in range(1000)] + ['Січеславська Набережна']
+    index = TrigramIndex(names)
+
+    results = index.search('Січеславська Набережна', limit=1000)
+    # Спільна з рештою лише поширена частина - вона не використовується для відбору
+    assert [name for name, _ in results] == ['Січеславська Набережна']
+
+
+def test_snapshot_index_follows_incremental_adds():
+    snapshot = CandidateSnapshot(ttl=60)
+    snapshot.names('street', RecordingCursor(['Старий Шлях']))
+    snapshot.add('street', ['Ганни Швидько'])
+
+    assert snapshot.get('street').index.search('Швидько', limit=1)[0][0] == 'Ганни Швидько'
+
+
+class CountingPreparer:
+    """Підготовка записів для тестів: нижній регістр, рахує виклики"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, name, object_type=None):
+        self.calls += 1
+        normalized = name.lower()
+        return CandidateEntry(name, normalized, normalized.replace('і', 'и'), frozenset(normalized.split()))
+
+
+def test_entries_are_prepared_once_per_name():
+    preparer = CountingPreparer()
+    snapshot = CandidateSnapshot(ttl=60, preparer=preparer)
+    cursor = RecordingCursor(['Січеславська Набережна', 'Старий Шлях'])
+
+    for _ in range(3):
+        snapshot.get('street', cursor)
+    snapshot.add('street', ['Ганни Швидько', 'Старий Шлях'])
+
+    entry = snapshot.get('street').entry('Січеславська Набережна')
+    assert entry.normalized == 'січеславська набережна'
+    assert entry.phonetic == 'сичеславська набережна'
+    assert entry.tokens == {'січеславська', 'набережна'}
+    assert entry.length == len('січеславська набережна')
+    assert preparer.calls == 3
+
+
+def test_preparer_registered_later_prepares_loaded_snapshot():
+    snapshot = CandidateSnapshot(ttl=60)
+    snapshot.names('street', RecordingCursor(['Старий Шлях']))
+    assert snapshot.get('street').entry('Старий Шлях') is None
+
+    snapshot.set_preparer(CountingPreparer())
+    assert snapshot.get('street').entry('Старий Шлях').normalized == 'старий шлях'
+
+
+def test_phonetically_equal_names_share_bucket():
+    def preparer(name, object_type=None):
+        return CandidateEntry(name, name.lower(), name.lower(), frozenset(),
+                              phonetic_key=phonetic_key(name, object_type))
+
+    snapshot = CandidateSnapshot(ttl=60, preparer=preparer)
+    snapshot.names('street', RecordingCursor(['Старий Шлях', 'вул. Шлях Старий', 'Ганни Швидько']))
+
+    bucket = snapshot.get('street').phonetic_matches(phonetic_key('СТАРИЙ ШЛЯХ'))
+    assert bucket == ['Старий Шлях', 'вул. Шлях Старий']
+
+
+def test_bk_tree_finds_names_within_edit_distance():
+    names = ['Січеславська Набережна', 'Старий Шлях', 'Ганни Швидько', 'Мостова', 'Мостова']
+    tree = BKTree(names)
+
+    assert tree.search('Стари Шлях', 1) == [('Старий Шлях', 1)]
+    assert tree.search('МОСТОВА', 0) == [('Мостова', 0), ('Мостова', 0)]
+    assert tree.search('Шевченка', 2) == []
+
+
+def test_bk_tree_query_skips_distant_branches():
+    names = [f"{prefix} {number}" for prefix in ('Набережна', 'Шевченка', 'Гагаріна') for number in range(300)]
+    tree = BKTree(names)
+
+    assert [name for name, _ in tree.search('Шевченка 15', 0)] == ['Шевченка 15']
+    assert tree.stats['distance_calls'] < len(names)
+
+
+def test_snapshot_typo_index_only_for_named_types():
+    snapshot = CandidateSnapshot(ttl=60)
+    snapshot.names('street', RecordingCursor(['Старий Шлях']))
+    snapshot.names('building', RecordingCursor(['12']))
+    snapshot.add('street', ['Ганни Швидько'])
+
+    assert snapshot.get('street').typo_matches('Ганни Швидко', 2) == ['Ганни Швидько']
+    assert snapshot.get('building').typo_matches('13', 1) == []
+
+
+class ScopedCursor:
+    """Курсор з назвами вулиць по містах; повертає назви міста з параметрів запиту"""
+
+    def __init__(self, names_by_city):
+        self.names_by_city = names_by_city
+        self.params = []
+
+    def execute(self, query, params=None):
+        self.params.append(params)
+
+    def fetchall(self):
+        params = self.params[-1]
+        if params is None:
+            return [(name,) for names in self.names_by_city.values() for name in names]
+        return [(name,) for name in self.names_by_city.get(params['city'], [])]
+
+
+def test_candidate_scope_normalizes_and_skips_unscoped_types():
+    assert candidate_scope('street', '  Дніпро ', None) == Scope('дніпро', None)
+    assert candidate_scope('district', 'Дніпро', 'Шевченківський') == Scope('дніпро', None)
+    assert candidate_scope('district', None, 'Шевченківський') is None
+    assert candidate_scope('city', 'Дніпро') is None
+    assert candidate_scope('street') is None
+
+
+def test_scoped_snapshots_are_loaded_and_versioned_separately():
+    cursor = ScopedCursor({'дніпро': ['Старий Шлях'], 'київ': ['Хрещатик']})
+    snapshot = CandidateSnapshot(ttl=60)
+    dnipro = candidate_scope('street', 'Дніпро')
+
+    assert snapshot.names('street', cursor, dnipro) == ['Старий Шлях']
+    assert snapshot.names('street', cursor, dnipro) == ['Старий Шлях']
+    assert cursor.params == [{'city': 'дніпро', 'district': None}]
+    assert sorted(snapshot.names('street', cursor)) == ['Старий Шлях', 'Хрещатик']
+
+    # Нові назви типу роблять знімки областей застарілими
+    version = snapshot.version('street', dnipro)
+    snapshot.add('street', ['Нова'])
+    assert not snapshot.is_fresh('street', dnipro)
+    assert snapshot.version('street', dnipro) > version
+    snapshot.names('street', cursor, dnipro)
+    assert len(cursor.params) == 3
+
+
+def test_scoped_snapshots_are_bounded():
+    cursor = ScopedCursor({'дніпро': ['Старий Шлях'], 'київ': ['Хрещатик'], 'львів': ['Городоцька']})
+    snapshot = CandidateSnapshot(ttl=60, max_scoped=2)
+    for city in ('Дніпро', 'Київ', 'Львів'):
+        snapshot.get('street', cursor, candidate_scope('street', city))
+
+    assert snapshot.stats['scoped_evictions'] == 1
+    assert not snapshot.is_fresh('street', candidate_scope('street', 'Дніпро'))
+    assert snapshot.is_fresh('street', candidate_scope('street', 'Львів'))
+
+
+if __name__ == "__main__":
+    run_tests(globals())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Тести пулу з'єднань пошукової системи (без підключення до БД)"""
+
+import sys
+import os
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+import psycopg2
+from psycopg2 import extensions
+
+from fake_db import run_tests
+from src.utils import db_pool
+from src.utils.db_pool import ConnectionPool, PoolTimeout
+from src.utils.address_search import AddressSearchEngine
+from src.utils.validators import UniversalAddressComparator
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.queries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, query, params=None):
+        if self.connection.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.queries.append((query, params))
+
+    def fetchone(self):
+        return (1,)
+
+    def fetchall(self):
+        return self.connection.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.rollbacks = 0
+        self.cursors = []
+        self.rows = []
+
+    def cursor(self):
+        cursor = FakeCursor(self)
+        self.cursors.append(cursor)
+        return cursor
+
+    def rollback(self):
+        if self.broken:
+            raise psycopg2.OperationalError("connection already closed")
+        self.rollbacks += 1
+
+    def get_transaction_status(self):
+        return extensions.TRANSACTION_STATUS_UNKNOWN if self.broken else extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeThreadedPool:
+    """Заміна psycopg2.pool.ThreadedConnectionPool без БД"""
+
+    def __init__(self, minconn, maxconn, dsn):
+        self.maxconn = maxconn
+        self._pool = []
+        self.created = []
+
+    def getconn(self):
+        if self._pool:
+            return self._pool.pop()
+        connection = FakeConnection()
+        self.created.append(connection)
+        return connection
+
+    def putconn(self, connection, close=False):
+        if close:
+            connection.close()
+        else:
+            self._pool.append(connection)
+
+    def closeall(self):
+        for connection in self._pool:
+            connection.close()
+        self._pool = []
+
+
+def make_pool(**kwargs):
+    pool = ConnectionPool(dsn='postgresql://test', minconn=1, **kwargs)
+    pool._pool = FakeThreadedPool(1, pool.maxconn, pool.dsn)
+    return pool
+
+
+def test_connections_are_reused_and_rolled_back():
+    pool = make_pool(maxconn=2, health_check_interval=60)
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT 2")
+
+    assert len(pool._pool.created) == 1
+    assert pool._pool.created[0].rollbacks >= 2
+    metrics = pool.metrics()
+    assert metrics['checkouts'] == 2
+    assert metrics['in_use'] == 0
+    assert metrics['idle'] == 1
+
+
+def test_broken_connection_is_replaced():
+    pool = make_pool(maxconn=2, health_check_interval=0)
+    with pool.connection() as connection:
+        first = connection
+    first.broken = True
+
+    with pool.connection() as connection:
+        assert connection is not first
+    assert first.closed
+    assert pool.stats['reconnects'] == 1
+    assert pool.stats['discarded'] == 1
+
+
+def test_exhausted_pool_waits_then_times_out():
+    pool = make_pool(maxconn=1, timeout=0.05)
+    held = pool.getconn()
+    try:
+        pool.getconn()
+        assert False, "Очікувався PoolTimeout"
+    except PoolTimeout:
+        pass
+    pool.putconn(held)
+
+    assert pool.stats['timeouts'] == 1
+    with pool.connection():
+        assert pool.metrics()['in_use'] == 1
+    assert pool.metrics()['max_in_use'] == 1
+
+
+def test_pool_is_created_lazily_from_config():
+    original = db_pool.pg_pool.ThreadedConnectionPool
+    db_pool.pg_pool.ThreadedConnectionPool = FakeThreadedPool
+    try:
+        pool = ConnectionPool(minconn=1, maxconn=3)
+        assert pool._pool is None
+        assert pool.health_check()
+        assert isinstance(pool._pool, FakeThreadedPool)
+        pool.close()
+        assert pool._pool is None
+    finally:
+        db_pool.pg_pool.ThreadedConnectionPool = original
+
+
+def make_engine(pool):
+    engine = AddressSearchEngine.__new__(AddressSearchEngine)
+    engine.pool = pool
+    engine._local = threading.local()
+    engine.comparator = UniversalAddressComparator(connect=False)
+    return engine
+
+
+def test_concurrent_requests_use_separate_cursors():
+    pool = make_pool(maxconn=4, health_check_interval=60)
+    engine = make_engine(pool)
+
+    seen, barrier = [], threading.Barrier(3)
+
+    def request():
+        barrier.wait()
+        engine.get_full_address(1)
+        seen.append(engine.cursor)
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert seen == [None, None, None]
+    assert pool.stats['checkouts'] == 3
+    assert pool.metrics()['in_use'] == 0
+    cursors = [cursor for connection in pool._pool.created for cursor in connection.cursors]
+    # Без SELECT 1 перевірок нових з'єднань - по одному запиту адреси на потік
+    assert sum(1 for cursor in cursors for query, _ in cursor.queries if query != "SELECT 1") == 3
+
+
+if __name__ == "__main__":
+    run_tests(globals())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Тести дельта-міграції rtg_addr (без підключення до БД)"""
+
+import sys
+import os
+from datetime import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from fake_db import FakeDB, PgError, run_tests
+from src.processors.delta_sync import DeltaSync, parse_timestamp, record_modified_at
+from src.processors.hierarchy_resolver import HierarchyResolver
+from src.processors.source_adapters import RtgAddrAdapter
+from src.utils.building_numbers import building_number_columns
+from src.utils.candidate_snapshot import CandidateSnapshot
+from src.utils.data_version import BUMP_QUERY, DataVersion
+from src.utils.migration_data_parser import MigrationDataParser
+
+DATA_FILE = os.path.join(current_dir, 'migrations', 'DATA-TrinitY-3.txt')
+
+# Змінений запис: вулицю перейменовано, номер будівлі 15 -> 15А
+RTG_RECORD = {
+    'id': '1', 'path': '1.2.3.4.5.6.7',
+    'region': 'Дніпропетровська область', 'district': 'Дніпровський район',
+    'community': 'Дніпровська міська громада', 'city': 'Дніпро', 'city_type': 'м.',
+    'city_district': 'Шевченківський район', 'street': 'Січеславська Набережна',
+    'street_type': 'вул.', 'street_old': 'Набережна Леніна', 'building': '15А',
+    'corp': None, 'flat': None, 'room': None,
+    'date_created': '2020-01-01 00:00:00', 'date_modified': '2025-04-28 05:48:50.030',
+}
+
+# Стан у БД до дельти (ID довідників - з DRY RUN того ж запису, тобто 1)
+STORED_STREET = {'id': 7, 'rtg_street_id': 5, 'city_id': 1, 'city_district_id': 1, 'type_id': 1,
+                 'rtg_path': '1.2.3.4.5'}
+STORED_BUILDING = {'id': 70, 'rtg_building_id': 6, 'street_entity_id': 7, 'number': '15', 'corpus': None,
+                   **building_number_columns('15', None)}
+
+
+def stored_rows(query, params):
+    if query.startswith('SELECT * FROM addrinity.street_entities'):
+        return [STORED_STREET]
+    if query.startswith('SELECT * FROM addrinity.buildings'):
+        return [STORED_BUILDING]
+    if 'FROM addrinity.street_names' in query:
+        return [(700, 7, 'Набережна Леніна', True)]
+    return []
+
+
+def make_resolver(db, stats):
+    """Резолвер з довідниками в кеші: вулиця та будівля шукаються в БД"""
+    resolver = HierarchyResolver(db, stats=stats, snapshot=CandidateSnapshot(), data_version=DataVersion())
+    resolver.process_batch(RtgAddrAdapter(), [RTG_RECORD], 1, dry_run=True)
+    for level in ('street', 'building', 'premise'):
+        resolver.cache[level].clear()
+    resolver._preloaded = True
+    stats.clear()
+    return resolver
+
+
+def test_parse_timestamp_from_dump():
+    assert parse_timestamp('2025-04-28 05:48:50.030') == datetime(2025, 4, 28, 5, 48, 50, 30000)
+    assert parse_timestamp('[NULL]') is None
+    assert parse_timestamp(None) is None
+
+
+def test_modified_at_falls_back_to_date_created():
+    record = {'date_created': '2024-01-01 00:00:00', 'date_modified': '[NULL]'}
+    assert record_modified_at(record) == datetime(2024, 1, 1)
+
+
+def test_delta_selects_only_changed_dump_rows():
+    """У дампі дату зміни мають лише кілька рядків - дельта бере тільки їх"""
+    records = MigrationDataParser(DATA_FILE).parse_rtg_addr_section()
+    delta_sync = DeltaSync('rtg_addr')
+
+    assert len(delta_sync.filter_changed(records, None)) == len(records)
+
+    changed = delta_sync.filter_changed(records, datetime(2025, 1, 1))
+    assert 0 < len(changed) < len(records)
+    assert all(record_modified_at(record) > datetime(2025, 1, 1) for record in changed)
+
+    mark = delta_sync.latest(changed)
+    assert delta_sync.filter_changed(records, mark) == []
+
+
+def test_latest_never_moves_backwards():
+    since = datetime(2030, 1, 1)
+    records = [{'date_created': None, 'date_modified': '2025-04-28 05:48:50.030'}]
+    assert DeltaSync.latest(records, since) == since
+
+
+def test_update_renames_street_and_changes_building_in_place():
+    db = FakeDB({BUMP_QUERY: [(2,)]}, responder=stored_rows)
+    stats = {}
+    resolver = make_resolver(db, stats)
+
+    assert resolver.process_batch(RtgAddrAdapter(), [RTG_RECORD], 1, update=True) == 1
+
+    # Канонічні колонки номера оновлюються разом з номером; вулиця без змін колонок
+    assert ('UPDATE addrinity.buildings SET number = %s, number_canonical = %s, number_letter = %s '
+            'WHERE id = %s', ('15А', '15А', 'А', 70)) in db.batches
+    assert not any('UPDATE addrinity.street_entities' in query for query in db.executed())
+
+    # Нова поточна назва; попередня стає старою, а не створюється заново
+    assert ("UPDATE addrinity.street_names SET is_current = FALSE, name_type = 'old', "
+            "valid_to = CURRENT_DATE WHERE street_entity_id = %s AND is_current AND name <> %s",
+            (7, 'Січеславська Набережна')) in db.batches
+    inserted_names = [params[1] for query, params in db.batches if len(params or ()) == 6]
+    assert inserted_names == ['Січеславська Набережна']
+
+    assert any('UPDATE addrinity.object_sources' in query for query in db.executed())
+    assert db.events == ['commit']
+    assert stats['updated_buildings'] == 1 and stats['updated_street_names'] == 1
+    assert 'created_streets' not in stats and 'created_buildings' not in stats
+
+
+def test_failed_delta_run_keeps_high_water_mark():
+    def failing_rows(query, params):
+        if 'addrinity.buildings' in query:
+            raise PgError('deadlock detected')
+        return stored_rows(query, params)
+
+    db = FakeDB({BUMP_QUERY: [(2,)]}, responder=failing_rows)
+    stats = {}
+    resolver = make_resolver(db, stats)
+
+    assert resolver.process_batch(RtgAddrAdapter(), [RTG_RECORD], 1, update=True) == 0
+    assert stats['failed'] == 1 and db.events == ['rollback']
+
+    assert DeltaSync('rtg_addr', db).advance([RTG_RECORD], None, stats) is None
+    assert not any('high_water_mark' in query for query in db.executed())
+
+
+def test_batch_saved_row_by_row_advances_high_water_mark():
+    failures = ['deadlock detected']
+
+    def flaky_rows(query, params):
+        # Перша спроба пачки падає, поодинці рядки зберігаються
+        if 'addrinity.buildings' in query and failures:
+            raise PgError(failures.pop())
+        return stored_rows(query, params)
+
+    db = FakeDB({BUMP_QUERY: [(2,)]}, responder=flaky_rows)
+    stats = {}
+    resolver = make_resolver(db, stats)
+    later = dict(RTG_RECORD, date_modified='2025-05-01 00:00:00')
+
+    assert resolver.process_batch(RtgAddrAdapter(), [RTG_RECORD, later], 1, update=True) == 2
+    assert db.events[0] == 'rollback' and db.events[1:] == ['commit', 'commit']
+    assert 'failed' not in stats and 'errors' not in stats
+
+    mark = DeltaSync('rtg_addr', db).advance([RTG_RECORD, later], None, stats)
+    assert mark == datetime(2025, 5, 1)
+
+
+def test_invalid_rows_do_not_hold_high_water_mark():
+    db = FakeDB({BUMP_QUERY: [(2,)]}, responder=stored_rows)
+    stats = {}
+    resolver = make_resolver(db, stats)
+    invalid = dict(RTG_RECORD, id='2', region='[NULL]', date_modified='2025-05-01 00:00:00')
+
+    assert resolver.process_batch(RtgAddrAdapter(), [RTG_RECORD, invalid], 1, update=True) == 1
+    assert stats['invalid'] == 1 and stats['errors'] == 1 and 'failed' not in stats
+
+    mark = DeltaSync('rtg_addr', db).advance([RTG_RECORD, invalid], None, stats)
+    assert mark == datetime(2025, 5, 1)
+    query, params = db.queries[-1]
+    assert 'SET high_water_mark' in query and params == (mark, mark, 'rtg_addr')
+
+
+if __name__ == "__main__":
+    run_tests(globals())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Тести таблиці повних адрес: оновлення після міграції та пошук (без підключення до БД)"""
+
+import sys
+import os
+import asyncio
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from psycopg2 import errorcodes
+
+from fake_db import FakeDB, PgError, make_async_search_engine, make_search_engine, recorded_logs, run_tests
+from src.processors.full_address_index import FullAddressIndex
+from src.utils import address_search_async as search_async
+from src.utils.address_search import BUILDING_SEARCH_QUERY, FULL_ADDRESS_SEARCH_QUERY, logger
+from src.utils.data_version import BUMP_QUERY, DataVersion
+
+
+FULL_ADDRESS_ROWS = [
+    (70, None, 7, 'Старий Шлях', '192', None, None, 'Дніпро', None, 'Дніпро, Старий Шлях вул., 192', 0.61),
+    (70, 5, 7, 'Старий Шлях', '192', None, '5', 'Дніпро', None, 'Дніпро, Старий Шлях вул., 192, кв. 5', 0.48),
+]
+
+
+REFRESH = "REFRESH MATERIALIZED VIEW addrinity.mv_full_address"
+REFRESH_CONCURRENTLY = "REFRESH MATERIALIZED VIEW CONCURRENTLY addrinity.mv_full_address"
+COUNT = "SELECT COUNT(*) FROM addrinity.mv_full_address"
+
+
+def make_index(connection):
+    return FullAddressIndex(connection, data_version=DataVersion())
+
+
+def test_refresh_is_concurrent_and_bumps_data_version():
+    connection = FakeDB({COUNT: [(1200,)], BUMP_QUERY: [(3,)]})
+    index = make_index(connection)
+
+    assert index.refresh() is True
+    executed = connection.executed()
+    assert executed[0] == REFRESH_CONCURRENTLY
+    assert executed.index(BUMP_QUERY) < len(executed) - 1
+    assert connection.events == ['commit']
+    assert index.data_version.current() == (3, 1)
+    assert index.stats == {'refreshes': 1, 'concurrent': 1, 'rows': 1200}
+
+
+def test_unpopulated_view_is_refreshed_without_concurrently():
+    connection = FakeDB({COUNT: [(10,)], BUMP_QUERY: [(1,)]},
+                        {REFRESH_CONCURRENTLY: PgError(pgcode=errorcodes.OBJECT_NOT_IN_PREREQUISITE_STATE)})
+    index = make_index(connection)
+
+    assert index.refresh() is True
+    assert connection.executed()[:2] == [REFRESH_CONCURRENTLY, REFRESH]
+    assert connection.events == ['rollback', 'commit']
+    assert index.stats['concurrent'] == 0
+
+
+def test_missing_view_is_skipped():
+    connection = FakeDB(errors={REFRESH_CONCURRENTLY: PgError(pgcode=errorcodes.UNDEFINED_TABLE)})
+    index = make_index(connection)
+
+    assert index.refresh() is False
+    assert connection.events == ['rollback']
+    assert index.data_version.current() == (0, 0)
+    assert make_index(None).refresh() is False
+
+
+def test_unmatched_building_falls_back_to_full_address_table():
+    connection = FakeDB({FULL_ADDRESS_SEARCH_QUERY: FULL_ADDRESS_ROWS})
+    engine = make_search_engine(connection, data_version=1)
+
+    results = engine.search_by_free_text('Дніпро, Старий Шлях, буд. 192')
+    assert connection.executed() == [BUILDING_SEARCH_QUERY, FULL_ADDRESS_SEARCH_QUERY]
+    params = connection.queries[-1][1]
+    assert params['query'] == 'дніпро старий шлях буд 192'
+    assert params['phonetic'].endswith(' 192') and params['city'] == 'дніпро'
+
+    first, second = results['matches']
+    assert first['type'] == 'building' and first['id'] == 70 and first['confidence'] == 0.61
+    assert second['type'] == 'premise' and second['building_id'] == 70 and second['premise'] == '5'
+
+
+def test_missing_full_address_table_rolls_back_and_warns():
+    connection = FakeDB(errors={FULL_ADDRESS_SEARCH_QUERY: PgError('relation does not exist',
+                                                                   pgcode=errorcodes.UNDEFINED_TABLE)})
+    engine = make_search_engine(connection, data_version=1)
+
+    with recorded_logs(logger) as records:
+        assert engine.search_full_address('Дніпро, Старий Шлях, буд. 192') == []
+    # Перервана транзакція відкочується - з'єднання придатне для наступних запитів
+    assert connection.events == ['rollback']
+    assert [level for level, _ in records] == ['WARNING']
+    assert 'relation does not exist' in records[0][1]
+
+
+def test_async_full_address_error_is_logged():
+    def answer(query, args):
+        if query is search_async.FULL_ADDRESS_SEARCH:
+            raise RuntimeError('relation does not exist')
+        return []
+
+    engine = make_async_search_engine(answer)
+    with recorded_logs(logger) as records:
+        assert asyncio.run(engine.search_full_address('Дніпро, Старий Шлях, буд. 192')) == []
+    assert [level for level, _ in records] == ['WARNING']
+
+
+def test_async_full_address_query_uses_asyncpg_placeholders():
+    assert '%%' not in search_async.FULL_ADDRESS_SEARCH
+    assert 'normalized_address % $1' in search_async.FULL_ADDRESS_SEARCH
+    assert 'LIMIT $5' in search_async.FULL_ADDRESS_SEARCH
+
+
+if __name__ == "__main__":
+    run_tests(globals())
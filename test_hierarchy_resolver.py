@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Тести спільного резолвера ієрархії та адаптерів джерел (без підключення до БД)"""
+
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from fake_db import run_tests
+from src.processors.hierarchy_resolver import HierarchyResolver
+from src.processors.source_adapters import RtgAddrAdapter, BldLocalAdapter, EkAddrAdapter
+
+
+RTG_RECORD = {
+    'id': '1', 'path': '1.2.3.4.5.6.7',
+    'region': 'Дніпропетровська область', 'district': 'Дніпровський район',
+    'community': 'Дніпровська міська громада', 'city': 'Дніпро', 'city_type': 'м.',
+    'city_district': 'Шевченківський район', 'street': 'Січеславська Набережна',
+    'street_type': 'вул.', 'street_old': 'Набережна Леніна', 'building': '15',
+    'corp': None, 'flat': '3', 'room': None,
+}
+
+BLD_ROW = {
+    'objectid': '101', 'adres_n_uk': '192 СТАРИЙ ШЛЯХ ВУЛ.', 'adres_o_uk': '192 КІРОВА ВУЛ.',
+    'raion': 'ТАРОМСЬКЕ', 'street_ukr': 'СТАРИЙ ШЛЯХ', 'type_ukr': 'ВУЛ.', 'l': '192',
+    'id_street_rtg': '5', 'id_bld_rtg': '6',
+}
+
+EK_ROW = {
+    'district': 'Шевченківський', 'rada': None, 'nr': '1', 'street_type': 'вул.',
+    'street': 'Січеславська Набережна', 'build': '15', 'corp': None, 'flat': '3',
+}
+
+
+def test_rtg_path_hierarchy():
+    """Ідентифікатори rtg_addr.path розкладаються по рівнях ієрархії"""
+    hierarchy = RtgAddrAdapter().to_hierarchy(RTG_RECORD)
+
+    assert hierarchy['street']['key'] == {'rtg_street_id': 5}
+    assert hierarchy['street']['values']['rtg_path'] == '1.2.3.4.5'
+    assert hierarchy['building']['key'] == {'rtg_building_id': 6}
+    assert hierarchy['premise']['key'] == {'rtg_premise_id': 7}
+    assert hierarchy['city_district']['key'] == {'name_uk': 'Шевченківський'}
+    assert hierarchy['street_type']['key'] == {'name_uk': 'вулиця'}
+    assert ('Набережна Леніна', False, 'old') in hierarchy['street']['names']
+
+
+def test_rtg_record_without_city_is_skipped():
+    resolver = HierarchyResolver()
+    processed = resolver.process_batch(RtgAddrAdapter(), [dict(RTG_RECORD, city=None)], 1, dry_run=True)
+
+    assert processed == 0
+    assert resolver.stats['skipped'] == 1
+
+
+def test_dry_run_batch_counts_created_and_duplicates():
+    """Повторні вузли в межах пачки створюються один раз"""
+    resolver = HierarchyResolver()
+    second = dict(RTG_RECORD, id='2', path='1.2.3.4.5.6.8', flat='4')
+
+    processed = resolver.process_batch(RtgAddrAdapter(), [RTG_RECORD, second], 1, dry_run=True)
+
+    assert processed == 2
+    assert resolver.stats['created_cities'] == 1
+    assert resolver.stats['duplicate_cities'] == 1
+    assert resolver.stats['created_streets'] == 1
+    assert resolver.stats['duplicate_streets'] == 1
+    assert resolver.stats['created_premises'] == 2
+
+
+def test_sources_share_dictionary_levels():
+    """bld_local та ek_addr використовують спільні довідники з rtg_addr"""
+    resolver = HierarchyResolver()
+
+    resolver.process_batch(RtgAddrAdapter(), [RTG_RECORD], 1, dry_run=True)
+    resolver.process_batch(BldLocalAdapter(), [BLD_ROW], 2, dry_run=True)
+    resolver.process_batch(EkAddrAdapter(), [EK_ROW], 3, dry_run=True)
+
+    assert resolver.stats['processed'] == 3
+    assert resolver.stats['created_countries'] == 1
+    assert resolver.stats['duplicate_countries'] == 2
+    assert resolver.stats['created_street_types'] == 1
+    assert resolver.stats['duplicate_street_types'] == 2
+
+
+def test_invalid_bld_local_row_counts_error():
+    resolver = HierarchyResolver()
+    processed = resolver.process_batch(BldLocalAdapter(), [dict(BLD_ROW, street_ukr='[NULL]')], 2, dry_run=True)
+
+    assert processed == 0
+    assert resolver.stats['errors'] == 1
+
+
+def test_enrich_extends_original_data():
+    collected = []
+
+    def enrich(row, original_data):
+        original_data['validation_result'] = {'confidence': 'high'}
+        collected.append(original_data)
+
+    resolver = HierarchyResolver()
+    resolver.process_batch(BldLocalAdapter(), [BLD_ROW], 2, dry_run=True, enrich=enrich)
+
+    assert collected[0]['objectid'] == 101
+    assert collected[0]['validation_result'] == {'confidence': 'high'}
+
+
+if __name__ == "__main__":
+    run_tests(globals())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Тести паралельного компаратора (без підключення до БД)"""
+
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from fake_db import run_tests
+from src.utils.candidate_snapshot import CandidateSnapshot, candidate_scope
+from src.utils.parallel_comparator import ParallelComparator
+from src.utils.validators import UniversalAddressComparator
+
+
+NAMES = ['Січеславська Набережна', 'Сонячна Набережна', 'Старий Шлях', 'Старий Млин',
+         'Ганни Швидько', 'Шевченка', 'Яворницького', 'Мостова', 'Новий Шлях', 'Шляхова']
+
+QUERIES = ['Січеславська наб', 'Старий шлях', 'Яворнецкого', 'Шевченко', 'Мостова',
+           'Ганни Швидко', 'Новий Шлях', 'Шляхова', 'Старий Шлях', None, '']
+
+
+def make_comparator():
+    comparator = UniversalAddressComparator(connect=False)
+    comparator.snapshot = CandidateSnapshot(ttl=600, preparer=comparator.prepare_candidate)
+    comparator.snapshot.install('street', NAMES)
+    return comparator
+
+
+def test_parallel_results_match_single_process():
+    comparator = make_comparator()
+    expected = {name: comparator.find_similar_objects_universal(name, 'street', 0.7)
+                for name in QUERIES if name}
+
+    with ParallelComparator(make_comparator(), workers=2, chunk_size=3) as parallel:
+        assert parallel.find_similar_many(QUERIES, 'street', 0.7) == expected
+        validated = parallel.validate_many(QUERIES, 'street')
+        assert parallel.stats['pools_started'] == 1
+
+    assert list(validated) == list(expected)
+    assert validated['Старий Шлях']['recommendation'] == 'use_existing'
+
+
+def test_scope_is_passed_to_workers():
+    # Місто має лише частину довідника: кандидати поза областю не повертаються
+    city_names = NAMES[:4]
+
+    def scoped_comparator():
+        comparator = make_comparator()
+        comparator.snapshot.install('street', city_names, candidate_scope('street', 'Дніпро'))
+        return comparator
+
+    comparator = scoped_comparator()
+    expected = {name: comparator.find_similar_objects_universal(name, 'street', 0.7, city='Дніпро')
+                for name in QUERIES if name}
+    assert expected['Шевченко'] == [] and expected != {
+        name: comparator.find_similar_objects_universal(name, 'street', 0.7) for name in expected}
+
+    with ParallelComparator(scoped_comparator(), workers=2, chunk_size=3) as parallel:
+        assert parallel.find_similar_many(QUERIES, 'street', 0.7, city='Дніпро') == expected
+        validated = parallel.validate_many(QUERIES, 'street', city='Дніпро')
+
+    assert validated['Старий Шлях']['recommendation'] == 'use_existing'
+    assert validated['Шевченко']['similar_objects'] == []
+
+
+def test_comparator_validate_many_uses_worker_pool():
+    comparator = make_comparator()
+    expected = make_comparator().validate_many(QUERIES, 'street')
+
+    # Малі частини, щоб список розподілявся між воркерами, а не виконувався в процесі
+    comparator._get_parallel(2).chunk_size = 3
+    try:
+        assert comparator.validate_many(QUERIES, 'street', workers=2) == expected
+        assert comparator.validate_many(QUERIES[:4], 'street', workers=2) == \
+            {name: expected[name] for name in QUERIES[:4]}
+        # Пул створюється один раз і використовується повторно
+        assert comparator._parallel.stats['pools_started'] == 1
+    finally:
+        comparator.close_pool()
+    assert comparator._parallel is None
+
+
+def test_pool_restarts_when_snapshot_changes():
+    comparator = make_comparator()
+    queries = QUERIES + ['Калинова Балка']
+    comparator._get_parallel(2).chunk_size = 3
+    try:
+        assert comparator.validate_many(queries, 'street', workers=2)['Калинова Балка']['similar_objects'] == []
+
+        # Мігратор додав назву після пачки - наступна пачка бачить її і у воркерах
+        comparator.snapshot.add('street', ['Калинова Балка'])
+        pooled = comparator.validate_many(queries, 'street', workers=2)
+        assert pooled['Калинова Балка']['similar_objects'] == [('Калинова Балка', 1.0)]
+        assert pooled == comparator.validate_many(queries, 'street')
+        assert comparator._parallel.stats['pools_started'] == 2
+
+        # Без змін знімка пул використовується повторно
+        comparator.validate_many(queries, 'street', workers=2)
+        assert comparator._parallel.stats['pools_started'] == 2
+
+        comparator.snapshot.bump_version('street')
+        comparator.validate_many(queries, 'street', workers=2)
+        assert comparator._parallel.stats['pools_started'] == 3
+    finally:
+        comparator.close_pool()
+
+
+def test_calculate_many_keeps_pair_order():
+    comparator = make_comparator()
+    pairs = [(first, second) for first in NAMES[:4] for second in NAMES[4:8]]
+
+    with ParallelComparator(comparator, workers=2, chunk_size=5) as parallel:
+        scores = parallel.calculate_many(pairs, 'street')
+
+    assert scores == [comparator.calculate_comprehensive_similarity(a, b, 'street') for a, b in pairs]
+
+
+def test_single_worker_runs_in_process():
+    parallel = ParallelComparator(make_comparator(), workers=1)
+    assert parallel.find_similar_many(['Старий шлях'], 'street', 0.7)['Старий шлях'][0][0] == 'Старий Шлях'
+    assert parallel.stats['pools_started'] == 0
+
+
+if __name__ == "__main__":
+    run_tests(globals())
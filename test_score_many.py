@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Тести векторної оцінки score_many проти парної calculate_comprehensive_similarity"""
+
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from fake_db import run_tests
+from src.utils.validators import UniversalAddressComparator
+
+
+NAMES = ['Січеславська Набережна', 'Сонячна Набережна', 'Старий Шлях', 'Ганни Швидько',
+         'вул. Шевченка', 'Шевченківський район', 'просп. Яворницького', 'Мостова', '']
+
+
+def test_score_many_matches_pairwise_within_tolerance():
+    comparator = UniversalAddressComparator(connect=False)
+    for target in ('Січеславська наб.', 'Шевченко', 'Старий шлях'):
+        for object_type in ('street', 'district', None):
+            scores = comparator.score_many(target, NAMES, object_type)
+            for name, score in zip(NAMES, scores):
+                pairwise = comparator.calculate_comprehensive_similarity(target, name, object_type)
+                assert abs(score - pairwise) <= comparator.SCORE_MANY_TOLERANCE
+
+
+def test_score_many_accepts_prepared_entries():
+    comparator = UniversalAddressComparator(connect=False)
+    entries = [comparator.prepare_candidate(name, 'street') for name in NAMES]
+    assert list(comparator.score_many('Старий шлях', entries, 'street')) == \
+        list(comparator.score_many('Старий шлях', NAMES, 'street'))
+
+
+def test_score_many_empty_inputs():
+    comparator = UniversalAddressComparator(connect=False)
+    assert len(comparator.score_many('Старий шлях', [], 'street')) == 0
+    assert list(comparator.score_many('', NAMES, 'street')) == [0.0] * len(NAMES)
+
+
+if __name__ == "__main__":
+    run_tests(globals())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Тести кешу результатів пошуку та версії даних (без підключення до БД)"""
+
+import sys
+import os
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from fake_db import FakeDB, PgError, make_search_engine, run_tests
+from src.utils.address_search import BUILDING_SEARCH_QUERY, STREET_DETAILS_QUERY
+from src.utils.candidate_snapshot import CANDIDATE_QUERIES, CandidateSnapshot
+from src.utils.data_version import BUMP_QUERY, DATA_VERSION_QUERY, DataVersion
+from src.utils.lru_cache import LRUCache
+from src.processors.hierarchy_resolver import HierarchyResolver
+
+
+BUILDING_ROW = (7, 'Старий Шлях', 70, '192', None, 'Дніпро', None, 'Дніпро, Старий Шлях вул., 192')
+
+
+def make_engine(rows=None, check_interval=600, negative_ttl=60):
+    engine = make_search_engine(FakeDB(rows), streets=['Старий Шлях'], check_interval=check_interval)
+    engine.result_cache = LRUCache(100, ttl=300)
+    engine.negative_ttl = negative_ttl
+    return engine
+
+
+def test_lru_cache_entries_expire_after_ttl():
+    cache = LRUCache(maxsize=10, ttl=0.05)
+    cache.put('short', 1)
+    cache.put('long', 2, ttl=60)
+    time.sleep(0.06)
+
+    assert cache.get('short') is None
+    assert cache.get('long') == 2
+    assert cache.stats['expirations'] == 1
+    assert len(cache) == 1
+
+
+def test_repeated_query_is_served_from_cache():
+    engine = make_engine({BUILDING_SEARCH_QUERY: [BUILDING_ROW]})
+    first = engine.search_by_free_text('Дніпро, Старий Шлях 192')
+    # Інший запис того ж запиту: той самий розібраний ключ
+    second = engine.search_by_free_text('старий шлях, буд. 192, Дніпро')
+
+    assert engine.pool.db.count(BUILDING_SEARCH_QUERY) == 1
+    assert second['matches'] == first['matches'] and second['total_found'] == 1
+    assert second['query'] == 'старий шлях, буд. 192, Дніпро'
+    assert engine.cache_metrics()['hits'] == 1
+
+    # Інший ліміт - інший ключ
+    engine.search_by_free_text('Дніпро, Старий Шлях 192', limit=5)
+    assert engine.pool.db.count(BUILDING_SEARCH_QUERY) == 2
+
+
+def test_empty_results_are_cached_with_shorter_ttl():
+    engine = make_engine(negative_ttl=0.05)
+    assert engine.search_by_free_text('Дніпро, Старий Шлях 999')['total_found'] == 0
+    engine.search_by_free_text('Дніпро, Старий Шлях 999')
+    assert engine.pool.db.count(BUILDING_SEARCH_QUERY) == 1
+
+    time.sleep(0.06)
+    engine.search_by_free_text('Дніпро, Старий Шлях 999')
+    assert engine.pool.db.count(BUILDING_SEARCH_QUERY) == 2
+
+
+def test_data_version_change_invalidates_cache():
+    engine = make_engine({BUILDING_SEARCH_QUERY: [BUILDING_ROW], DATA_VERSION_QUERY: [(1,)]}, check_interval=0)
+    engine.search_by_free_text('Дніпро, Старий Шлях 192')
+    engine.search_by_free_text('Дніпро, Старий Шлях 192')
+    assert engine.pool.db.count(BUILDING_SEARCH_QUERY) == 1
+
+    # Мігратор іншого процесу зафіксував зміни
+    engine.pool.db.rows[DATA_VERSION_QUERY] = [(2,)]
+    engine.search_by_free_text('Дніпро, Старий Шлях 192')
+    assert engine.pool.db.count(BUILDING_SEARCH_QUERY) == 2
+    assert engine.data_version.current() == (2, 0)
+
+    # Зміна в тому ж процесі - без очікування перевірки БД
+    engine.data_version.bump()
+    engine.search_by_free_text('Дніпро, Старий Шлях 192')
+    assert engine.pool.db.count(BUILDING_SEARCH_QUERY) == 3
+
+
+def test_data_version_change_reloads_candidate_snapshot():
+    db = FakeDB({DATA_VERSION_QUERY: [(1,)], CANDIDATE_QUERIES['street']: [('Старий Шлях',)],
+                 STREET_DETAILS_QUERY: [('Калинова Балка', 9, 'вулиця', 'Дніпро', [])]})
+    engine = make_search_engine(db, streets=['Старий Шлях'], check_interval=0)
+    engine.comparator._connection = db
+    engine.autocomplete.comparator = engine.comparator
+    assert engine.search_by_free_text('Калинова Балка')['total_found'] == 0
+    assert 'Калинова Балка' not in [item['name'] for item in engine.fuzzy_search('Калин')]
+
+    # Мігратор іншого процесу додав вулицю - знімок кандидатів перечитується з БД,
+    # а не лише змінюється ключ кешу результатів
+    db.rows[CANDIDATE_QUERIES['street']] = [('Старий Шлях',), ('Калинова Балка',)]
+    db.rows[DATA_VERSION_QUERY] = [(2,)]
+    results = engine.search_by_free_text('Калинова Балка')
+    assert [match['id'] for match in results['matches']] == [9]
+    assert [item['name'] for item in engine.fuzzy_search('Калин')][0] == 'Калинова Балка'
+
+    # Без зміни версії знімок не перечитується
+    loads = db.count(CANDIDATE_QUERIES['street'])
+    engine.search_by_free_text('Старий Шлях')
+    assert db.count(CANDIDATE_QUERIES['street']) == loads
+
+
+def test_data_version_is_checked_at_most_once_per_interval():
+    engine = make_engine({DATA_VERSION_QUERY: [(4,)]}, check_interval=600)
+    for _ in range(3):
+        engine.search_by_free_text('Дніпро, Старий Шлях')
+    assert engine.pool.db.count(DATA_VERSION_QUERY) == 1
+    assert engine.data_version.current() == (4, 0)
+
+
+def test_bump_without_table_keeps_migration_transaction():
+    db = FakeDB(errors={BUMP_QUERY: PgError('relation "addrinity.data_versions" does not exist')})
+    version = DataVersion()
+
+    assert version.bump(db.cursor()) == (0, 1)
+    assert db.executed() == ["SAVEPOINT data_version_bump", BUMP_QUERY, "ROLLBACK TO SAVEPOINT data_version_bump"]
+    assert version.stats['errors'] == 1
+
+
+def test_resolver_commit_bumps_version_in_same_transaction():
+    db = FakeDB({BUMP_QUERY: [(8,)]})
+    committed = []
+    db.commit = lambda: committed.append(db.executed())
+    version = DataVersion()
+    resolver = HierarchyResolver(db, snapshot=CandidateSnapshot(), data_version=version)
+    resolver.commit()
+
+    assert committed == [["SAVEPOINT data_version_bump", BUMP_QUERY, "RELEASE SAVEPOINT data_version_bump"]]
+    assert version.current() == (8, 1)
+
+
+if __name__ == "__main__":
+    run_tests(globals())
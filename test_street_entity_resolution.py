@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Тести зіставлення вулиць між джерелами (без підключення до БД)"""
+
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+import Levenshtein
+
+from fake_db import FakeDB, run_tests
+from src.processors.street_entity_resolution import (
+    DELETE_MERGES_QUERY, REPOINT_QUERIES, StreetEntityResolver
+)
+from src.utils.data_version import BUMP_QUERY, DataVersion
+from src.utils.phonetics import apply_phonetic_rules, phonetic_key, ukrainian_phonetic_key
+from src.utils.trigrams import trigram_similarity, trigrams
+
+
+class RatioComparator:
+    """Компаратор для тестів: лише Levenshtein.ratio нормалізованих назв"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def calculate_comprehensive_similarity(self, first, second, object_type=None):
+        self.calls += 1
+        return Levenshtein.ratio(first.lower(), second.lower())
+
+
+class ScriptedComparator:
+    """Компаратор для тестів: оцінки пар назв задані наперед"""
+
+    def __init__(self, scores):
+        self.scores = {frozenset(pair): score for pair, score in scores.items()}
+
+    def calculate_comprehensive_similarity(self, first, second, object_type=None):
+        return self.scores.get(frozenset((first, second)), 0.0)
+
+
+STREETS = [
+    {'id': 1, 'city_id': 1, 'type_id': 1, 'source': 'rtg_addr', 'name': 'Січеславська Набережна'},
+    {'id': 2, 'city_id': 1, 'type_id': 1, 'source': 'bld_local', 'name': 'СІЧЕСЛАВСЬКА НАБЕРЕЖНА'},
+    {'id': 3, 'city_id': 1, 'type_id': 1, 'source': 'ek_addr', 'name': "Січеславська набережна"},
+    {'id': 4, 'city_id': 1, 'type_id': 2, 'source': 'bld_local', 'name': 'Старий Шлях'},
+    {'id': 5, 'city_id': 1, 'type_id': 1, 'source': 'rtg_addr', 'name': 'Старий Шлях'},
+    {'id': 6, 'city_id': 1, 'type_id': 1, 'source': 'rtg_addr', 'name': 'Ганни Швидько'},
+    {'id': 7, 'city_id': 2, 'type_id': 1, 'source': 'ek_addr', 'name': 'Ганни Швидько'},
+]
+
+
+def test_phonetic_key_ignores_case_order_and_street_type():
+    assert ukrainian_phonetic_key('СТАРИЙ ШЛЯХ') == ukrainian_phonetic_key('вул. Шлях Старий')
+    assert ukrainian_phonetic_key("Від'їзна") == ukrainian_phonetic_key('Видизна')
+
+
+def test_phonetic_key_per_object_type():
+    assert phonetic_key('Шевченківський район', 'district') == phonetic_key('ШЕВЧЕНКИВСЬКИЙ', 'district')
+    assert phonetic_key('м. Дніпро', 'city') == phonetic_key('ДНИПРО', 'city') == 'днипро'
+    assert phonetic_key('') == ''
+
+
+def test_phonetic_rules_keep_comparator_replacement_order():
+    # Спершу окремі літери, потім сполучення: ґз -> гз -> з
+    assert apply_phonetic_rules('Ґзюкс') == 'зух'
+    assert apply_phonetic_rules("Від'їзна") == "вид'изна"
+
+
+def test_trigrams_match_pg_trgm_format():
+    assert trigrams('Cat') == {'  c', ' ca', 'cat', 'at '}
+    assert trigrams('') == frozenset()
+
+
+def test_trigram_similarity_matches_pg_trgm():
+    # SELECT similarity('word', 'two words') -> 0.36363637
+    assert abs(trigram_similarity('word', 'two words') - 4 / 11) < 1e-9
+    assert trigram_similarity('Січеславська', 'СІЧЕСЛАВСЬКА') == 1.0
+    assert trigram_similarity('', 'вулиця') == 0.0
+
+
+def test_cross_source_duplicates_merge_into_rtg_street():
+    resolver = StreetEntityResolver(comparator=RatioComparator())
+    merges = resolver.resolve(STREETS)
+
+    assert merges[2][0] == 1
+    assert merges[3][0] == 1
+    assert set(merges) == {2, 3}
+
+
+def test_blocking_skips_other_types_cities_and_same_source():
+    comparator = RatioComparator()
+    resolver = StreetEntityResolver(comparator=comparator)
+    pairs = {(STREETS[a]['id'], STREETS[b]['id']) for a, b in resolver.candidate_pairs(STREETS)}
+
+    assert (4, 5) not in pairs          # різні типи вулиць
+    assert (6, 7) not in pairs          # різні міста
+    assert all(STREETS[a - 1]['source'] != STREETS[b - 1]['source'] for a, b in pairs)
+    # Порівнюються лише пари з блоків, а не всі 21 пара
+    assert len(pairs) < len(STREETS) * (len(STREETS) - 1) // 2
+
+
+def test_chain_through_other_source_never_merges_same_source_streets():
+    # rtg A ~ bld X ~ rtg B: X - до найсхожішої rtg-вулиці, A та B залишаються окремими
+    streets = [
+        {'id': 11, 'city_id': 1, 'type_id': 1, 'source': 'rtg_addr', 'name': 'Старий Шлях'},
+        {'id': 12, 'city_id': 1, 'type_id': 1, 'source': 'bld_local', 'name': 'СТАРИЙ ШЛЯХ'},
+        {'id': 13, 'city_id': 1, 'type_id': 1, 'source': 'rtg_addr', 'name': 'Шлях Старий'},
+    ]
+    comparator = ScriptedComparator({
+        ('Старий Шлях', 'СТАРИЙ ШЛЯХ'): 0.92,
+        ('СТАРИЙ ШЛЯХ', 'Шлях Старий'): 0.96,
+    })
+    resolver = StreetEntityResolver(comparator=comparator)
+    merges = resolver.resolve(streets)
+
+    assert merges == {12: (13, 0.96)}
+    assert resolver.stats['matched_pairs'] == 2
+    assert resolver.stats['conflicting_pairs'] == 1
+
+
+def test_per_building_streets_collapse_before_blocking():
+    # bld_local: сутність вулиці на кожну будівлю - 60 однойменних сутностей однієї вулиці
+    streets = [{'id': 1, 'city_id': 1, 'type_id': 1, 'source': 'rtg_addr', 'name': 'Старий Шлях'}]
+    streets += [{'id': 100 + number, 'city_id': 1, 'type_id': 1, 'source': 'bld_local', 'name': 'СТАРИЙ  ШЛЯХ'}
+                for number in range(60)]
+    # Провулок з тією ж назвою - окрема вулиця, не згортається
+    streets.append({'id': 200, 'city_id': 1, 'type_id': 2, 'source': 'bld_local', 'name': 'СТАРИЙ ШЛЯХ'})
+
+    comparator = RatioComparator()
+    resolver = StreetEntityResolver(comparator=comparator)
+    merges = resolver.resolve(streets)
+
+    assert {street_id: canonical for street_id, (canonical, _) in merges.items()} == \
+        {100 + number: 1 for number in range(60)}
+    assert resolver.stats['collapsed_streets'] == 59
+    assert resolver.stats['oversized_blocks'] == 0
+    # Пара rtg - bld_local оцінюється один раз, а не для кожної будівлі
+    assert comparator.calls == 1
+
+
+def test_same_name_streets_without_other_source_merge_into_one():
+    streets = [{'id': 300 + number, 'city_id': 1, 'type_id': 1, 'source': 'bld_local', 'name': 'Мостова'}
+               for number in range(3)]
+    streets.append({'id': 400, 'city_id': 2, 'type_id': 1, 'source': 'bld_local', 'name': 'Мостова'})
+    merges = StreetEntityResolver(comparator=RatioComparator()).resolve(streets)
+    assert merges == {301: (300, 1.0), 302: (300, 1.0)}
+
+
+def test_save_merges_repoints_loaded_buildings_and_names():
+    db = FakeDB({BUMP_QUERY: [(5,)]})
+    resolver = StreetEntityResolver(db, comparator=RatioComparator(), data_version=DataVersion())
+    resolver.save_merges({2: (1, 1.0), 3: (1, 0.95)})
+
+    executed = db.executed()
+    # Записи вулиць, перенесених раніше (без назв), не видаляються
+    assert executed[0] == DELETE_MERGES_QUERY
+    assert 'INSERT INTO addrinity.street_entity_merges' in executed[1]
+    assert [params for _, params in db.batches] == [(2, 1, 1.0), (3, 1, 0.95)]
+    assert [query for query in executed if query in REPOINT_QUERIES] == list(REPOINT_QUERIES)
+    # Версія даних - в тій самій транзакції, після перенесення
+    assert executed.index(BUMP_QUERY) > executed.index(REPOINT_QUERIES[-1])
+    assert db.events == ['commit']
+
+
+def test_save_merges_in_dry_run_does_not_need_connection():
+    resolver = StreetEntityResolver(comparator=RatioComparator())
+    resolver.save_merges({2: (1, 1.0)}, dry_run=True)
+
+
+if __name__ == "__main__":
+    run_tests(globals())
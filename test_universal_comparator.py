@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Тести універсального компаратора без підключення до БД"""
+
+import sys
+import os
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+import psycopg2
+
+from fake_db import run_tests
+from src.utils import validators
+from src.utils.lru_cache import LRUCache
+from src.utils.validators import UniversalAddressComparator, get_universal_comparator
+from src.utils.candidate_snapshot import CandidateSnapshot, candidate_scope
+from src.utils.address_search import AddressSearchEngine
+
+
+NAMES = ['Січеславська Набережна', 'Сонячна Набережна', 'Старий Шлях', 'Ганни Швидько',
+         'вул. Шевченка', 'Шевченківський район', 'просп. Яворницького', 'Мостова', '']
+
+
+class RecordingCursor:
+    """Курсор, що повертає фіксований набір назв і рахує запити"""
+
+    def __init__(self, names):
+        self.names = names
+        self.queries = 0
+
+    def execute(self, query, params=None):
+        self.queries += 1
+
+    def fetchall(self):
+        return [(name,) for name in self.names]
+
+
+def forbid_connect(*args, **kwargs):
+    raise AssertionError("Компаратор не повинен підключатися до БД")
+
+
+def test_import_and_creation_do_not_connect():
+    original = psycopg2.connect
+    psycopg2.connect = forbid_connect
+    try:
+        validators.universal_comparator = None
+        comparator = get_universal_comparator()
+        assert comparator is get_universal_comparator()
+        assert comparator.calculate_comprehensive_similarity('Старий Шлях', 'СТАРИЙ ШЛЯХ', 'street') > 0.9
+    finally:
+        psycopg2.connect = original
+        validators.universal_comparator = None
+
+
+def test_offline_comparator_has_no_cursor():
+    comparator = UniversalAddressComparator(connect=False)
+    assert comparator.cursor is None
+    assert comparator.find_phonetic_matches('Старий Шлях', 'street') == []
+
+
+def test_find_similar_reloads_snapshot_only_when_stale():
+    comparator = UniversalAddressComparator(connect=False)
+    cursor = RecordingCursor(['Січеславська Набережна', 'Старий Шлях'])
+    comparator.snapshot.bump_version('street')
+    comparator._cursor = cursor
+
+    first = comparator.find_similar_objects_universal('Січеславська набережна', 'street')
+    second = comparator.find_similar_objects_universal('Січеславська набережна', 'street')
+    assert first == second
+    assert first[0][0] == 'Січеславська Набережна'
+    assert cursor.queries == 1
+
+
+def test_repeated_validation_is_served_from_cache():
+    comparator = UniversalAddressComparator(connect=False)
+    comparator.snapshot.bump_version('street')
+    comparator._cursor = RecordingCursor(['Січеславська Набережна', 'Старий Шлях'])
+
+    first = comparator.validate_object_universally('Старий Шлях', 'street')
+    second = comparator.validate_object_universally('  Старий   Шлях', 'street')
+    assert second['target_name'] == '  Старий   Шлях'
+    assert second['similar_objects'] == first['similar_objects']
+    assert comparator.validation_cache.stats['hits'] == 1
+
+    # Нова назва в знімку змінює версію - результат рахується заново
+    comparator.snapshot.add('street', ['Старий Шлях 2'])
+    comparator.validate_object_universally('Старий Шлях', 'street')
+    assert comparator.validation_cache.stats['hits'] == 1
+
+
+def test_pair_scores_are_memoized_on_normalized_names():
+    comparator = UniversalAddressComparator(connect=False)
+    score = comparator.calculate_comprehensive_similarity('Старий Шлях', 'Старий шлях', 'street')
+    assert comparator.calculate_comprehensive_similarity('СТАРИЙ ШЛЯХ', 'старий  шлях', 'street') == score
+    assert comparator.cache_stats()['pairs']['hits'] == 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.stats['evictions'] == 1
+    assert cache.info()['hit_rate'] == round(2 / 3, 4)
+
+
+def test_typo_candidates_come_from_bk_tree():
+    comparator = UniversalAddressComparator(connect=False)
+    comparator.snapshot.bump_version('street')
+    comparator._cursor = RecordingCursor(['Яворницького', 'Січеславська Набережна'])
+
+    # Дві опечатки: назва в межах MAX_TYPO_DISTANCE правок
+    matches = comparator.find_similar_objects_universal('Яворнецкого', 'street', 0.6)
+    assert matches and matches[0][0] == 'Яворницького'
+
+
+def test_upper_bound_never_below_actual_score():
+    comparator = UniversalAddressComparator(connect=False)
+    for target in ('Січеславська наб.', 'Шевченко', 'Старий шлях', 'Мостова'):
+        for object_type in ('street', 'district', 'city'):
+            query = comparator.prepare_candidate(target, object_type)
+            for name in NAMES:
+                entry = comparator.prepare_candidate(name, object_type)
+                actual = comparator.calculate_comprehensive_similarity(target, name, object_type)
+                assert comparator.score_upper_bound(query, entry, object_type) + 1e-9 >= actual
+
+
+def test_cascade_prunes_without_changing_results():
+    names = NAMES[:-1] + ['Старий Шлях 2', 'Старий Млин', 'Новий Шлях', 'Старий Парк', 'Шляхова']
+    comparator = UniversalAddressComparator(connect=False)
+    comparator.snapshot.bump_version('street')
+    comparator._cursor = RecordingCursor(names)
+
+    pruned = comparator.find_similar_objects_universal('Старий Шлях', 'street', 0.75)
+    comparator.score_upper_bound = lambda *args: 1.0
+    unpruned = comparator.find_similar_objects_universal('Старий Шлях', 'street', 0.75)
+
+    assert pruned == unpruned
+    assert comparator.stats['pruned_bound'] > 0
+    assert 0 < comparator.pruning_rate() < 1
+
+
+def test_validate_many_scores_each_unique_name_once():
+    comparator = UniversalAddressComparator(connect=False)
+    comparator.snapshot.bump_version('street')
+    cursor = RecordingCursor(['Січеславська Набережна', 'Старий Шлях'])
+    comparator._cursor = cursor
+
+    names = ['Старий Шлях', None, 'Старий Шлях', 'Січеславська наб', '', 'Старий Шлях']
+    results = comparator.validate_many(names, 'street')
+
+    assert list(results) == ['Старий Шлях', 'Січеславська наб']
+    assert results['Старий Шлях']['similar_objects'][0][0] == 'Старий Шлях'
+    assert results['Старий Шлях'] == comparator.validate_object_universally('Старий Шлях', 'street')
+    assert comparator.validation_cache.stats['misses'] == 2
+    assert cursor.queries == 1
+
+
+def test_scoped_search_only_scans_city_names():
+    comparator = UniversalAddressComparator(connect=False)
+    comparator.snapshot = CandidateSnapshot(ttl=600, preparer=comparator.prepare_candidate)
+    comparator.snapshot.install('street', ['Старий Шлях', 'Старий Шлях 2'])
+    comparator.snapshot.install('street', ['Старий Шлях 2'], candidate_scope('street', 'Київ'))
+
+    assert [name for name, _ in comparator.find_similar_objects_universal('Старий Шлях', 'street', 0.7)] == \
+        ['Старий Шлях', 'Старий Шлях 2']
+    assert [name for name, _ in comparator.find_similar_objects_universal('Старий Шлях', 'street', 0.7,
+                                                                           city='київ')] == ['Старий Шлях 2']
+    scoped = comparator.validate_object_universally('Старий Шлях', 'street', city='Київ')
+    assert scoped['similar_objects'][0][0] == 'Старий Шлях 2'
+    assert comparator.validate_object_universally('Старий Шлях', 'street')['similar_objects'][0][0] == 'Старий Шлях'
+
+
+def test_free_text_city_comes_from_directory():
+    comparator = UniversalAddressComparator(connect=False)
+    comparator.snapshot = CandidateSnapshot(ttl=600, preparer=comparator.prepare_candidate)
+    comparator.snapshot.install('city', ['Дніпро', 'Кривий Ріг'])
+    engine = AddressSearchEngine.__new__(AddressSearchEngine)
+    engine.comparator = comparator
+
+    parsed = engine.parse_free_text('Кривий Ріг, вул. Старий Шлях 192')
+    assert parsed['city'] == 'Кривий Ріг'
+    assert parsed['street'] == 'Старий Шлях'
+    assert parsed['building'] == '192'
+    assert engine.parse_free_text('Старий Шлях 192')['city'] is None
+    assert AddressSearchEngine.scope_params(' Дніпро ', None, street='Старий Шлях') == \
+        {'street': 'Старий Шлях', 'city': 'дніпро', 'district': None}
+
+
+if __name__ == "__main__":
+    run_tests(globals())